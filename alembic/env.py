@@ -12,12 +12,20 @@ from bot.config import config as app_config
 
 config = context.config
 
-if config.config_file_name is not None:
+# Database.init_db hands over its own connection; the application has already
+# configured logging in that case and fileConfig would disable its loggers.
+connection = config.attributes.get('connection')
+
+if config.config_file_name is not None and connection is None:
     fileConfig(config.config_file_name)
 
 target_metadata = Base.metadata
 
-config.set_main_option('sqlalchemy.url', app_config.DATABASE_URL.replace('+asyncpg', ''))
+if not config.get_main_option('sqlalchemy.url'):
+    config.set_main_option(
+        'sqlalchemy.url',
+        app_config.DATABASE_URL.replace('+asyncpg', '').replace('+aiosqlite', '')
+    )
 
 
 def run_migrations_offline() -> None:
@@ -27,6 +35,18 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
     )
 
     with context.begin_transaction():
@@ -34,19 +54,18 @@ def run_migrations_offline() -> None:
 
 
 def run_migrations_online() -> None:
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+    with connectable.connect() as own_connection:
+        do_run_migrations(own_connection)
 
 
 if context.is_offline_mode():
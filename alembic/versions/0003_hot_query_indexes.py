@@ -0,0 +1,37 @@
+"""indexes for hot query predicates
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_cards_status_created_at_id', 'cards', ['status', 'created_at', 'id'])
+    op.create_index('ix_cards_user_id', 'cards', ['user_id'])
+    op.create_index('ix_purchases_user_id', 'purchases', ['user_id'])
+    op.create_index('ix_purchases_card_id', 'purchases', ['card_id'])
+    op.create_index('ix_purchases_seller_id', 'purchases', ['seller_id'])
+    op.create_index('ix_withdrawals_status_created_at_id', 'withdrawals', ['status', 'created_at', 'id'])
+    op.create_index('ix_withdrawals_user_id', 'withdrawals', ['user_id'])
+    op.create_index('ix_fsm_states_expires_at', 'fsm_states', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_fsm_states_expires_at', table_name='fsm_states')
+    op.drop_index('ix_withdrawals_user_id', table_name='withdrawals')
+    op.drop_index('ix_withdrawals_status_created_at_id', table_name='withdrawals')
+    op.drop_index('ix_purchases_seller_id', table_name='purchases')
+    op.drop_index('ix_purchases_card_id', table_name='purchases')
+    op.drop_index('ix_purchases_user_id', table_name='purchases')
+    op.drop_index('ix_cards_user_id', table_name='cards')
+    op.drop_index('ix_cards_status_created_at_id', table_name='cards')
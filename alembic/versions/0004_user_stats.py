@@ -0,0 +1,59 @@
+"""materialized per-user statistics
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_stats',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('total_cards', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('approved_cards', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('rejected_cards', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('sales_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute(
+        """
+        INSERT INTO user_stats (user_id, total_cards, approved_cards, rejected_cards, sales_count, revenue)
+        SELECT users.id,
+               COALESCE(cards.total_cards, 0),
+               COALESCE(cards.approved_cards, 0),
+               COALESCE(cards.rejected_cards, 0),
+               COALESCE(sales.sales_count, 0),
+               COALESCE(sales.revenue, 0)
+        FROM users
+        LEFT JOIN (
+            SELECT user_id,
+                   COUNT(*) AS total_cards,
+                   SUM(CASE WHEN status = 'APPROVED' THEN 1 ELSE 0 END) AS approved_cards,
+                   SUM(CASE WHEN status = 'REJECTED' THEN 1 ELSE 0 END) AS rejected_cards
+            FROM cards
+            GROUP BY user_id
+        ) AS cards ON cards.user_id = users.id
+        LEFT JOIN (
+            SELECT seller_id, COUNT(*) AS sales_count, SUM(amount) AS revenue
+            FROM purchases
+            GROUP BY seller_id
+        ) AS sales ON sales.seller_id = users.id
+        WHERE cards.user_id IS NOT NULL OR sales.seller_id IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_stats')
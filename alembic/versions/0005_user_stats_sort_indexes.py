@@ -0,0 +1,27 @@
+"""indexes for sorted statistics pages
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_user_stats_revenue_user_id', 'user_stats', ['revenue', 'user_id'])
+    op.create_index('ix_user_stats_total_cards_user_id', 'user_stats', ['total_cards', 'user_id'])
+    op.create_index('ix_user_stats_rejected_cards_user_id', 'user_stats', ['rejected_cards', 'user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_stats_rejected_cards_user_id', table_name='user_stats')
+    op.drop_index('ix_user_stats_total_cards_user_id', table_name='user_stats')
+    op.drop_index('ix_user_stats_revenue_user_id', table_name='user_stats')
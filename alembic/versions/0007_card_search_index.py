@@ -0,0 +1,35 @@
+"""full-text search index on cards
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # SQLite has no tsvector; the bot keeps an in-process index there instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    op.execute(
+        "CREATE INDEX ix_cards_search ON cards USING gin ("
+        "tsvector_concat("
+        "setweight(to_tsvector('russian'::regconfig, title), 'A'), "
+        "setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'B')))"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    
+    op.drop_index('ix_cards_search', table_name='cards')
@@ -0,0 +1,45 @@
+"""broadcasts with resumable progress and blocked users
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('is_blocked', sa.Boolean(), server_default=sa.false(), nullable=False))
+    
+    op.create_table(
+        'broadcasts',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('admin_id', sa.BigInteger(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('RUNNING', 'COMPLETED', 'CANCELLED', name='broadcaststatus'), nullable=False),
+        sa.Column('last_user_id', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('sent_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('failed_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('blocked_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_broadcasts_status', 'broadcasts', ['status'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_broadcasts_status', table_name='broadcasts')
+    op.drop_table('broadcasts')
+    sa.Enum(name='broadcaststatus').drop(op.get_bind(), checkfirst=True)
+    
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_blocked')
@@ -0,0 +1,48 @@
+"""payments ledger keyed by telegram_payment_charge_id
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'payments',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('telegram_payment_charge_id', sa.String(length=255), nullable=False),
+        sa.Column('provider_payment_charge_id', sa.String(length=255), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('card_id', sa.BigInteger(), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('invoice_payload', sa.String(length=128), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['card_id'], ['cards.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('telegram_payment_charge_id', name='uq_payments_telegram_payment_charge_id')
+    )
+    
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.add_column(sa.Column('payment_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_purchases_payment_id', 'payments', ['payment_id'], ['id'])
+        batch_op.create_index('ix_purchases_payment_id', ['payment_id'], unique=True)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('purchases') as batch_op:
+        batch_op.drop_index('ix_purchases_payment_id')
+        batch_op.drop_constraint('fk_purchases_payment_id', type_='foreignkey')
+        batch_op.drop_column('payment_id')
+    
+    op.drop_table('payments')
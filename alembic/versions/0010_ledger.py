@@ -0,0 +1,86 @@
+"""append-only balance ledger replacing users.balance
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ledger_entries',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('transaction_id', sa.String(length=32), nullable=False),
+        sa.Column('account', sa.Enum('USER', 'PAYMENTS', 'PAYOUTS', 'ADJUSTMENTS', name='ledgeraccount'), nullable=False),
+        sa.Column('user_id', sa.BigInteger(), nullable=True),
+        sa.Column('amount', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('reference', sa.String(length=64), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ledger_entries_user_id_id', 'ledger_entries', ['user_id', 'id'])
+    op.create_index('ix_ledger_entries_transaction_id', 'ledger_entries', ['transaction_id'])
+    
+    op.create_table(
+        'balance_snapshots',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('balance', sa.Numeric(precision=12, scale=2), server_default='0', nullable=False),
+        sa.Column('last_entry_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index('ix_balance_snapshots_last_entry_id', 'balance_snapshots', ['last_entry_id'])
+    
+    # Existing balances become opening transactions against the adjustments account;
+    # the compaction job folds them into snapshots on its first runs
+    account_type = sa.Enum('USER', 'PAYMENTS', 'PAYOUTS', 'ADJUSTMENTS', name='ledgeraccount')
+    users = sa.table('users', sa.column('id', sa.BigInteger()), sa.column('balance', sa.Numeric(10, 2)))
+    ledger_entries = sa.table(
+        'ledger_entries',
+        sa.column('transaction_id', sa.String()),
+        sa.column('account', account_type),
+        sa.column('user_id', sa.BigInteger()),
+        sa.column('amount', sa.Numeric(12, 2)),
+        sa.column('reference', sa.String())
+    )
+    transaction_id = sa.literal('opening') + sa.cast(users.c.id, sa.String())
+    
+    for account, user_id, amount in (('USER', users.c.id, users.c.balance),
+                                     ('ADJUSTMENTS', sa.null(), -users.c.balance)):
+        op.execute(ledger_entries.insert().from_select(
+            ['transaction_id', 'account', 'user_id', 'amount', 'reference'],
+            sa.select(transaction_id, sa.literal(account, account_type), user_id, amount, sa.literal('opening'))
+            .where(users.c.balance != 0)
+            .order_by(users.c.id)
+        ))
+    
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('balance')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('balance', sa.Numeric(precision=10, scale=2), server_default='0', nullable=False))
+    
+    op.execute(
+        "UPDATE users SET balance = COALESCE("
+        "(SELECT SUM(amount) FROM ledger_entries WHERE ledger_entries.user_id = users.id), 0)"
+    )
+    
+    op.drop_index('ix_balance_snapshots_last_entry_id', table_name='balance_snapshots')
+    op.drop_table('balance_snapshots')
+    op.drop_index('ix_ledger_entries_transaction_id', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_user_id_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
+    sa.Enum(name='ledgeraccount').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,149 @@
+"""Run a broadcast against a fake Bot API that enforces flood limits and report sustained throughput.
+
+The fake API answers 429 when the global rate is exceeded and 403 for users who
+blocked the bot. Halfway through, the broadcaster is shut down and resumed from its
+checkpoint, as during a deploy:
+    
+    python -m benchmarks.broadcast_sim --users 3000 --rate 30
+
+Uses a temporary SQLite file unless BENCHMARK_DATABASE_URL points at Postgres.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from sqlalchemy import insert
+
+from bot.config import config
+from bot.database.database import Database
+from bot.database.models import Base, User
+from bot.utils.broadcast import Broadcaster
+from bot.utils.throttle import SendScheduler, ThrottlingMiddleware, TokenBucket
+
+ADMIN_ID = 1
+
+
+class FakeBotAPI(BaseSession):
+    def __init__(self, rate: float, latency: float, blocked: set):
+        super().__init__()
+        self.latency = latency
+        self.blocked = blocked
+        self.limit = TokenBucket(rate, rate)
+        self.delivered = Counter()
+        self.flood_errors = 0
+    
+    async def make_request(self, bot, method, timeout=None):
+        await asyncio.sleep(self.latency * random.uniform(0.5, 1.5))
+        
+        if self.limit.wait_time() > 0:
+            self.flood_errors += 1
+            raise TelegramRetryAfter(method, "Too Many Requests: retry after 1", 1)
+        self.limit.consume()
+        
+        if method.chat_id in self.blocked:
+            raise TelegramForbiddenError(method, "Forbidden: bot was blocked by the user")
+        
+        self.delivered[method.chat_id] += 1
+        return True
+    
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+    
+    async def close(self):
+        pass
+
+
+async def seed(db: Database, users: int):
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        
+        for start in range(1, users + 1, 10000):
+            await conn.execute(insert(User), [
+                {'id': user_id, 'username': f"user{user_id}", 'first_name': "User"}
+                for user_id in range(start, min(start + 10000, users + 1))
+            ])
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"broadcast_sim_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    await seed(db, args.users)
+    
+    blocked = set(random.sample(range(2, args.users + 1), int(args.users * args.blocked)))
+    api = FakeBotAPI(args.rate, args.latency, blocked)
+    scheduler = SendScheduler(
+        global_rate=args.rate,
+        chat_rate=config.SEND_CHAT_RATE,
+        chat_burst=config.SEND_CHAT_BURST,
+        group_rate=config.SEND_GROUP_RATE,
+        max_retries=config.SEND_MAX_RETRIES
+    )
+    api.middleware(ThrottlingMiddleware(scheduler))
+    bot = Bot(token=os.environ["BOT_TOKEN"], session=api)
+    
+    broadcast = await db.create_broadcast(ADMIN_ID, "Новости магазина")
+    started = time.monotonic()
+    
+    # The first runner is shut down halfway through, like a deploy in the middle of a broadcast
+    first = Broadcaster(db, args.batch_size, args.concurrency)
+    first.start(bot, broadcast)
+    await asyncio.sleep(args.users / args.rate / 2)
+    await first.close()
+    interrupted = await db.get_broadcast(broadcast.id)
+    print(f"interrupted after user {interrupted.last_user_id} ({interrupted.sent_count} sent)")
+    
+    second = Broadcaster(db, args.batch_size, args.concurrency)
+    await second.resume(bot)
+    await asyncio.gather(*second.tasks.values())
+    elapsed = time.monotonic() - started
+    
+    finished = await db.get_broadcast(broadcast.id)
+    api.delivered[ADMIN_ID] -= 1
+    duplicates = sum(count - 1 for count in api.delivered.values() if count > 1)
+    delivered = sum(api.delivered.values())
+    
+    print(f"{args.users} users, {len(blocked)} blocked the bot, limit {args.rate:.0f} msg/s, "
+          f"latency {args.latency * 1000:.0f} ms")
+    print(f"status {finished.status.value}: sent {finished.sent_count}, blocked {finished.blocked_count}, "
+          f"failed {finished.failed_count}")
+    print(f"{delivered} messages in {elapsed:.1f}s = {delivered / elapsed:.1f} msg/s sustained, "
+          f"{api.flood_errors} flood errors, {duplicates} duplicates re-sent after the restart")
+    print(f"send queue: {scheduler.stats()}")
+    
+    await scheduler.close()
+    await db.engine.dispose()
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=3000)
+    parser.add_argument("--rate", type=float, default=config.SEND_GLOBAL_RATE)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--blocked", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=config.BROADCAST_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=config.BROADCAST_CONCURRENCY)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""Measure peak RSS of exporting a large table, streamed versus loaded at once.
+    
+    python -m benchmarks.export_rss --rows 1000000
+
+Seeds a temporary SQLite file (or BENCHMARK_DATABASE_URL) with cards and runs
+every export mode in its own process, so each peak RSS is measured in isolation.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from sqlalchemy import insert, select
+
+from bot.database.database import Database, EXPORT_TABLES
+from bot.database.models import Base, User, Card, ModerationStatus
+from bot.utils.export import write_csv, write_parquet
+
+
+MODES = ("load-all-csv", "stream-csv", "stream-parquet")
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(db: Database, rows: int):
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        
+        await conn.execute(insert(User), [
+            {'id': user_id, 'username': f"user{user_id}", 'first_name': "User"}
+            for user_id in range(1, 1001)
+        ])
+        
+        statuses = list(ModerationStatus)
+        for start in range(0, rows, 20000):
+            await conn.execute(insert(Card), [
+                {
+                    'user_id': random.randint(1, 1000),
+                    'title': f"Card {index}",
+                    'description': "Description of the card that is long enough to matter " * 3,
+                    'price': 10,
+                    'status': random.choice(statuses)
+                }
+                for index in range(start, min(start + 20000, rows))
+            ])
+
+
+async def load_all(db: Database):
+    # What a naive export does: fetch every row before writing any of them
+    async with db.session_maker() as session:
+        result = await session.execute(select(*EXPORT_TABLES["cards"].columns))
+        yield result.all()
+
+
+async def worker(url: str, mode: str, batch_size: int):
+    db = Database(url)
+    baseline = peak_rss_mb()
+    path = os.path.join(tempfile.gettempdir(), f"export_rss_{os.getpid()}")
+    columns = list(EXPORT_TABLES["cards"].columns)
+    
+    if mode == "load-all-csv":
+        writer, batches = write_csv, load_all(db)
+    elif mode == "stream-csv":
+        writer, batches = write_csv, db.stream_table("cards", batch_size)
+    else:
+        writer, batches = write_parquet, db.stream_table("cards", batch_size)
+    
+    started = time.perf_counter()
+    rows = await writer(path, columns, batches)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path) / 1024 / 1024
+    
+    print(f"{mode:<15} {rows} rows in {elapsed:6.1f}s, file {size:7.1f} MB, "
+          f"peak RSS {peak_rss_mb():7.1f} MB (+{peak_rss_mb() - baseline:.1f} MB over baseline)")
+    
+    os.remove(path)
+    await db.engine.dispose()
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"export_rss_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    started = time.perf_counter()
+    await seed(db, args.rows)
+    await db.engine.dispose()
+    print(f"seeded {args.rows} cards in {time.perf_counter() - started:.1f}s")
+    
+    for mode in args.modes:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.export_rss", "--worker", mode,
+             "--url", url, "--batch-size", str(args.batch_size)],
+            check=True
+        )
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        asyncio.run(worker(args.url, args.worker, args.batch_size))
+    else:
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
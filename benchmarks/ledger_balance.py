@@ -0,0 +1,117 @@
+"""Measure concurrent sales to one hot seller and balance reads before and after compaction.
+    
+    python -m benchmarks.ledger_balance --history 200000 --sales 2000
+
+Uses a temporary SQLite file unless BENCHMARK_DATABASE_URL points at Postgres.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from sqlalchemy import insert
+
+from bot.database.database import Database
+from bot.database.models import Base, User, Card, LedgerEntry, LedgerAccount
+
+SELLER_ID = 1
+BUYER_ID = 2
+
+
+async def seed(db: Database, history: int):
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        
+        await conn.execute(insert(User), [
+            {'id': SELLER_ID, 'username': "seller", 'first_name': "Seller"},
+            {'id': BUYER_ID, 'username': "buyer", 'first_name': "Buyer"}
+        ])
+        await conn.execute(insert(Card), [
+            {'user_id': SELLER_ID, 'title': "Hot card", 'description': "Description", 'price': 10}
+        ])
+        
+        # Years of sales that were never compacted
+        for start in range(0, history, 10000):
+            rows = []
+            for _ in range(start, min(start + 10000, history)):
+                transaction_id = uuid.uuid4().hex
+                rows.append({'transaction_id': transaction_id, 'account': LedgerAccount.USER,
+                             'user_id': SELLER_ID, 'amount': 10, 'reference': "history"})
+                rows.append({'transaction_id': transaction_id, 'account': LedgerAccount.PAYMENTS,
+                             'user_id': None, 'amount': -10, 'reference': "history"})
+            await conn.execute(insert(LedgerEntry.__table__), rows)
+
+
+async def measure_reads(name: str, db: Database, repeat: int):
+    timings = []
+    
+    for _ in range(repeat):
+        started = time.perf_counter()
+        balance = await db.get_balance(SELLER_ID)
+        timings.append(time.perf_counter() - started)
+    
+    timings.sort()
+    print(f"{name:<28} balance {balance}: p50 {timings[len(timings) // 2] * 1000:7.2f} ms, "
+          f"p95 {timings[int(len(timings) * 0.95)] * 1000:7.2f} ms")
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"ledger_balance_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    await seed(db, args.history)
+    
+    await measure_reads("uncompacted history", db, args.repeat)
+    
+    started = time.perf_counter()
+    compacted = await db.compact_balances(await db.get_last_ledger_entry_id())
+    print(f"compacted {args.history * 2} entries into {compacted} snapshots in {time.perf_counter() - started:.2f}s")
+    await measure_reads("after compaction", db, args.repeat)
+    
+    semaphore = asyncio.Semaphore(args.concurrency)
+    
+    async def sell():
+        async with semaphore:
+            await db.add_purchase(BUYER_ID, 1, Decimal('10.00'), SELLER_ID)
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(sell() for _ in range(args.sales)))
+    elapsed = time.perf_counter() - started
+    print(f"{args.sales} concurrent sales to one seller in {elapsed:.2f}s = {args.sales / elapsed:.0f}/s")
+    
+    await measure_reads(f"{args.sales} entries past snapshot", db, args.repeat)
+    
+    report = await db.reconcile_ledger()
+    expected = Decimal(10 * (args.history + args.sales)).quantize(Decimal('0.01'))
+    print(f"reconciliation: {report}")
+    print(f"seller balance matches the sales: {await db.get_balance(SELLER_ID) == expected}")
+    
+    await db.engine.dispose()
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--history", type=int, default=200000)
+    parser.add_argument("--sales", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
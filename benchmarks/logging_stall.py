@@ -0,0 +1,172 @@
+"""Measure event loop stalls caused by logging at a steady update rate, synchronous vs queued.
+    
+    python -m benchmarks.logging_stall --rate 1000 --seconds 5 --sink-delay-ms 0.2
+
+Both pipelines write the same lines to a console file and a log file in a temporary directory.
+--sink-delay-ms adds a pause to every write, like a stdout pipe the log collector drains slowly.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from bot.utils.logger import TEXT_FORMAT, LogQueueHandler, create_file_handler, create_listener
+
+TICK = 0.001
+
+
+class SlowSinkMixin:
+    delay = 0.0
+    
+    def emit(self, record):
+        super().emit(record)
+        if self.delay:
+            time.sleep(self.delay)
+
+
+class SlowStreamHandler(SlowSinkMixin, logging.StreamHandler):
+    pass
+
+
+def make_sinks(directory: str, delay: float):
+    console = SlowStreamHandler(open(os.path.join(directory, "console.log"), "a", encoding="utf-8"))
+    console.delay = delay
+    log_file = create_file_handler(os.path.join(directory, "bot.log"), max_bytes=10 * 1024 * 1024, backup_count=2)
+    return [console, log_file]
+
+
+async def handle_update(log: logging.Logger, lazy: bool, update_id: int, stats: dict):
+    await asyncio.sleep(0)
+    
+    # A typical update: two info lines and a debug line that is filtered out
+    if lazy:
+        log.info("User %s started the bot", update_id)
+        log.debug("Update %s state: %s", update_id, stats)
+        log.info("User %s viewing cards", update_id)
+    else:
+        log.info(f"User {update_id} started the bot")
+        log.debug(f"Update {update_id} state: {stats}")
+        log.info(f"User {update_id} viewing cards")
+
+
+async def drive(log: logging.Logger, lazy: bool, rate: int, seconds: float) -> list:
+    lags = []
+    stop = asyncio.Event()
+    stats = {'cards': list(range(50)), 'page': 1}
+    
+    async def monitor():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+    
+    monitor_task = asyncio.create_task(monitor())
+    tasks = set()
+    started = time.perf_counter()
+    sent = 0
+    
+    while time.perf_counter() - started < seconds:
+        due = int((time.perf_counter() - started) * rate)
+        for update_id in range(sent, due):
+            task = asyncio.create_task(handle_update(log, lazy, update_id, stats))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        sent = due
+        await asyncio.sleep(TICK)
+    
+    await asyncio.gather(*tasks)
+    stop.set()
+    await monitor_task
+    return lags
+
+
+def report(name: str, lags: list, elapsed: float):
+    lags.sort()
+    print(f"{name:<22} loop lag p50 {lags[len(lags) // 2] * 1000:6.2f} ms, "
+          f"p99 {lags[int(len(lags) * 0.99)] * 1000:6.2f} ms, max {lags[-1] * 1000:6.2f} ms, "
+          f"stalled {sum(lags) / elapsed * 100:5.1f}% of the time")
+
+
+async def run_sync(args, directory: str):
+    log = logging.getLogger("benchmark.sync")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    
+    for handler in make_sinks(directory, args.sink_delay_ms / 1000):
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        log.addHandler(handler)
+    
+    started = time.perf_counter()
+    lags = await drive(log, False, args.rate, args.seconds)
+    report("sync handlers", lags, time.perf_counter() - started)
+    
+    for handler in log.handlers:
+        handler.close()
+
+
+async def run_queued(args, directory: str):
+    log = logging.getLogger("benchmark.queued")
+    log.propagate = False
+    log.setLevel(logging.INFO)
+    
+    listener = create_listener(make_sinks(directory, args.sink_delay_ms / 1000), args.format)
+    log.addHandler(LogQueueHandler(listener.queue))
+    listener.start()
+    
+    started = time.perf_counter()
+    lags = await drive(log, True, args.rate, args.seconds)
+    report("queue listener", lags, time.perf_counter() - started)
+    
+    drain_started = time.perf_counter()
+    listener.stop()
+    print(f"{'':<22} writer drained the backlog {time.perf_counter() - drain_started:.2f}s after the load stopped")
+    
+    for handler in listener.handlers:
+        handler.close()
+
+
+def measure_disabled(repeat: int):
+    log = logging.getLogger("benchmark.disabled")
+    log.setLevel(logging.INFO)
+    stats = {'cards': list(range(50)), 'page': 1}
+    
+    started = time.perf_counter()
+    for update_id in range(repeat):
+        log.debug(f"Update {update_id} state: {stats}")
+    eager = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for update_id in range(repeat):
+        log.debug("Update %s state: %s", update_id, stats)
+    lazy = time.perf_counter() - started
+    
+    print(f"disabled debug line: f-string {eager / repeat * 1e6:.2f} us, %-style {lazy / repeat * 1e6:.2f} us")
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        await run_sync(args, directory)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        await run_queued(args, directory)
+    
+    measure_disabled(args.repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0)
+    parser.add_argument("--format", choices=("text", "json"), default="text")
+    parser.add_argument("--repeat", type=int, default=200000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
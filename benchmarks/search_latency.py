@@ -0,0 +1,125 @@
+"""Measure ranked search latency over a large approved catalog.
+    
+    python -m benchmarks.search_latency --cards 100000
+
+Uses a temporary SQLite file (in-process inverted index) unless
+BENCHMARK_DATABASE_URL points at Postgres (tsvector GIN index).
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from sqlalchemy import insert
+
+from bot.database.database import Database
+from bot.database.models import User, Card, ModerationStatus
+
+SYLLABLES = ["ка", "ро", "ви", "на", "те", "ле", "фон", "ма", "ши", "зо", "лу", "пра", "ст", "ор", "ди"]
+
+
+def make_vocabulary(size: int) -> list:
+    words = set()
+    while len(words) < size:
+        words.add("".join(random.choice(SYLLABLES) for _ in range(random.randint(2, 4))))
+    
+    words = list(words)
+    random.shuffle(words)
+    return words
+
+
+def zipf_weights(size: int) -> list:
+    # Word frequencies in natural text: a handful of words are everywhere, most are rare
+    weights = []
+    total = 0.0
+    for rank in range(1, size + 1):
+        total += 1 / rank
+        weights.append(total)
+    return weights
+
+
+def sentence(vocabulary: list, length: int, weights: list) -> str:
+    return " ".join(random.choices(vocabulary, cum_weights=weights, k=length))
+
+
+async def seed(db: Database, cards: int, vocabulary: list, weights: list):
+    async with db.engine.begin() as conn:
+        await conn.execute(insert(User), [{'id': 1, 'username': "seller", 'first_name': "Seller"}])
+        
+        for start in range(0, cards, 10000):
+            await conn.execute(insert(Card), [
+                {
+                    'user_id': 1,
+                    'title': sentence(vocabulary, 3, weights),
+                    'description': sentence(vocabulary, 25, weights),
+                    'price': 10,
+                    'status': ModerationStatus.APPROVED
+                }
+                for _ in range(start, min(start + 10000, cards))
+            ])
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"search_latency_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    await db.init_db()
+    
+    vocabulary = make_vocabulary(args.vocabulary)
+    weights = zipf_weights(len(vocabulary))
+    await seed(db, args.cards, vocabulary, weights)
+    db.search_index = None
+    
+    if not db.uses_tsvector:
+        started = time.perf_counter()
+        await db.ensure_search_index()
+        print(f"in-process index built in {time.perf_counter() - started:.1f}s")
+    
+    queries = []
+    for _ in range(args.queries):
+        words = sentence(vocabulary, random.randint(1, 3), weights).split()
+        # Half of the queries are still being typed, which exercises prefix matching
+        if random.random() < 0.5:
+            words[-1] = words[-1][:max(2, len(words[-1]) - 2)]
+        queries.append(" ".join(words))
+    
+    timings = []
+    for query in queries:
+        db.card_cache.clear()
+        started = time.perf_counter()
+        await db.search_cards(query, offset=random.choice([0, 0, 10]), limit=10)
+        timings.append((time.perf_counter() - started) * 1000)
+    
+    timings.sort()
+    print(f"{len(queries)} queries over {args.cards} cards ({db.engine.dialect.name})")
+    print(f"p50 {statistics.median(timings):6.1f} ms   "
+          f"p95 {timings[int(len(timings) * 0.95) - 1]:6.1f} ms   "
+          f"max {timings[-1]:6.1f} ms")
+    
+    await db.engine.dispose()
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cards", type=int, default=100000)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
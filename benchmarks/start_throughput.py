@@ -0,0 +1,101 @@
+"""Compare /start registration throughput of the old read-modify-write path and the upsert.
+    
+    python -m benchmarks.start_throughput --users 2000 --presses 5
+
+Uses a temporary SQLite file unless BENCHMARK_DATABASE_URL points at Postgres.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from sqlalchemy import select
+
+from bot.database.database import Database
+from bot.database.models import Base, User
+
+
+async def legacy_add_user(db: Database, user_id: int, username, first_name) -> User:
+    async with db.session_maker() as session:
+        result = await session.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+        
+        if not user:
+            user = User(id=user_id, username=username, first_name=first_name)
+            session.add(user)
+        else:
+            user.username = username
+            user.first_name = first_name
+        
+        await session.commit()
+        await session.refresh(user)
+        return user
+
+
+async def run_case(db: Database, name: str, register, presses: list, concurrency: int) -> float:
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    
+    db.user_cache.clear()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def press(user_id):
+        async with semaphore:
+            await register(db, user_id, f"user{user_id}", f"User {user_id}")
+    
+    started = time.perf_counter()
+    await asyncio.gather(*[press(user_id) for user_id in presses])
+    elapsed = time.perf_counter() - started
+    
+    rate = len(presses) / elapsed
+    print(f"{name:<10} {len(presses)} presses in {elapsed:6.2f}s -> {rate:8.0f} /start per second")
+    return rate
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"start_throughput_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    
+    # Every user presses /start several times; later presses carry an unchanged profile,
+    # which is the common case during a marketing push.
+    presses = [user_id for user_id in range(1, args.users + 1) for _ in range(args.presses)]
+    random.shuffle(presses)
+    
+    # Users are keyed by id, so concurrent first presses of one user only conflict in the
+    # legacy path; keep its concurrency at 1 to measure throughput instead of errors.
+    legacy = await run_case(db, "legacy", legacy_add_user, presses, 1)
+    upsert = await run_case(db, "upsert", Database.add_user, presses, 1)
+    upsert_concurrent = await run_case(
+        db, f"upsert x{args.concurrency}", Database.add_user, presses, args.concurrency
+    )
+    
+    print(f"speedup: {upsert / legacy:.1f}x sequential, {upsert_concurrent / legacy:.1f}x concurrent")
+    
+    await db.engine.dispose()
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--presses", type=int, default=5, help="/start presses per user")
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
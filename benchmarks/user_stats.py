@@ -0,0 +1,134 @@
+"""Compare the admin statistics query against the live GROUP BY aggregate.
+    
+    python -m benchmarks.user_stats --users 5000 --cards 500000
+
+Uses a temporary SQLite file unless BENCHMARK_DATABASE_URL points at Postgres.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+from sqlalchemy import insert, select, func, case
+
+from bot.database.database import Database, live_user_stats_query
+from bot.database.models import Base, User, Card, ModerationStatus, Purchase
+
+
+async def seed(db: Database, users: int, cards: int, purchases: int):
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        
+        await conn.execute(insert(User), [
+            {'id': user_id, 'username': f"user{user_id}", 'first_name': "User"}
+            for user_id in range(1, users + 1)
+        ])
+        
+        statuses = list(ModerationStatus)
+        for start in range(0, cards, 10000):
+            await conn.execute(insert(Card), [
+                {
+                    'user_id': random.randint(1, users),
+                    'title': f"Card {index}",
+                    'description': "Description",
+                    'price': 10,
+                    'status': random.choice(statuses)
+                }
+                for index in range(start, min(start + 10000, cards))
+            ])
+        
+        for start in range(0, purchases, 10000):
+            await conn.execute(insert(Purchase), [
+                {
+                    'user_id': random.randint(1, users),
+                    'card_id': random.randint(1, cards),
+                    'amount': 10,
+                    'seller_id': random.randint(1, users)
+                }
+                for _ in range(start, min(start + 10000, purchases))
+            ])
+    
+    await db.rebuild_user_stats()
+
+
+async def legacy_statistics(db: Database):
+    # The query get_user_statistics ran before the user_stats table existed
+    async with db.session_maker() as session:
+        result = await session.execute(
+            select(
+                User.id,
+                User.username,
+                User.first_name,
+                func.count(Card.id).label('total_cards'),
+                func.sum(case((Card.status == ModerationStatus.APPROVED, 1), else_=0)).label('approved'),
+                func.sum(case((Card.status == ModerationStatus.REJECTED, 1), else_=0)).label('rejected')
+            )
+            .outerjoin(Card, User.id == Card.user_id)
+            .group_by(User.id)
+        )
+        return result.all()
+
+
+async def live_statistics(db: Database):
+    async with db.session_maker() as session:
+        result = await session.execute(live_user_stats_query())
+        return result.all()
+
+
+async def measure(name: str, query, db: Database, repeat: int) -> float:
+    timings = []
+    
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await query(db)
+        timings.append(time.perf_counter() - started)
+    
+    best = min(timings)
+    print(f"{name:<22} best of {repeat}: {best * 1000:9.1f} ms")
+    return best
+
+
+async def run(args):
+    url = os.getenv("BENCHMARK_DATABASE_URL")
+    path = None
+    
+    if not url:
+        path = os.path.join(tempfile.gettempdir(), f"user_stats_{os.getpid()}.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    
+    db = Database(url)
+    
+    started = time.perf_counter()
+    await seed(db, args.users, args.cards, args.purchases)
+    print(f"seeded {args.users} users, {args.cards} cards, {args.purchases} purchases "
+          f"in {time.perf_counter() - started:.1f}s")
+    
+    legacy = await measure("GROUP BY users x cards", legacy_statistics, db, args.repeat)
+    await measure("live aggregate", live_statistics, db, args.repeat)
+    materialized = await measure("user_stats", Database.get_user_statistics, db, args.repeat)
+    
+    print(f"speedup over GROUP BY: {legacy / materialized:.1f}x")
+    
+    await db.engine.dispose()
+    
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--cards", type=int, default=200000)
+    parser.add_argument("--purchases", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""Replay synthetic updates against the webhook endpoint and report latency percentiles.
+
+By default the bot runs in-process on a temporary SQLite database with a fake
+Telegram session, so only handler and database time is measured:
+    
+    python -m benchmarks.webhook_load --updates 5000 --concurrency 100
+
+Pass --url to fire the same updates at an already running webhook instead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("BOT_TOKEN", "42:BENCHMARK")
+os.environ.setdefault("ADMIN_IDS", "1")
+DATABASE_FILE = os.path.join(tempfile.gettempdir(), f"webhook_load_{os.getpid()}.db")
+os.environ["DATABASE_URL"] = os.environ.get("BENCHMARK_DATABASE_URL", f"sqlite+aiosqlite:///{DATABASE_FILE}")
+
+from aiohttp import ClientSession, web
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from decimal import Decimal
+
+from bot.config import config
+from bot.database.database import db
+from bot.database.models import ModerationStatus
+
+
+class FakeSession(BaseSession):
+    def __init__(self, api_latency: float):
+        super().__init__()
+        self.api_latency = api_latency
+    
+    async def make_request(self, bot, method, timeout=None):
+        if self.api_latency:
+            await asyncio.sleep(self.api_latency)
+        return True
+    
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+    
+    async def close(self):
+        pass
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def build_updates(count: int, card_ids: list, users: int) -> list:
+    updates = []
+    
+    for update_id in range(1, count + 1):
+        user_id = 1000 + random.randrange(users)
+        sender = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+        chat = {"id": user_id, "type": "private"}
+        kind = random.random()
+        
+        if kind < 0.2:
+            updates.append({
+                "update_id": update_id,
+                "message": {"message_id": update_id, "date": 0, "chat": chat, "from": sender, "text": "/start"}
+            })
+        elif kind < 0.4:
+            updates.append({
+                "update_id": update_id,
+                "message": {"message_id": update_id, "date": 0, "chat": chat, "from": sender,
+                            "text": "📋 Посмотреть карточки"}
+            })
+        else:
+            index = random.randrange(len(card_ids) - 1)
+            updates.append({
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "from": sender,
+                    "chat_instance": "load",
+                    "data": f"card_next:{index}:{card_ids[index]}",
+                    "message": {"message_id": 1, "date": 0, "chat": chat, "text": "card"}
+                }
+            })
+    
+    return updates
+
+
+async def seed(cards: int) -> list:
+    await db.init_db()
+    await db.add_user(user_id=1, username="seller", first_name="Seller")
+    
+    card_ids = []
+    for i in range(cards):
+        card = await db.add_card(
+            user_id=1,
+            title=f"Product {i}",
+            description=f"Synthetic product number {i} for the webhook load test",
+            price=Decimal('100.00')
+        )
+        await db.update_card_status(card.id, ModerationStatus.APPROVED)
+        card_ids.append(card.id)
+    
+    return card_ids[::-1]
+
+
+async def fire(url: str, updates: list, concurrency: int, secret: str) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    
+    async with ClientSession() as session:
+        async def post(update):
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=update, headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        raise RuntimeError(f"Webhook answered {response.status}")
+                latencies.append(time.perf_counter() - started)
+        
+        await asyncio.gather(*[post(update) for update in updates])
+    
+    return latencies
+
+
+def report(title: str, latencies: list):
+    print(
+        f"{title:<18} n={len(latencies):<6} "
+        f"p50={percentile(latencies, 50) * 1000:8.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.2f}ms "
+        f"mean={statistics.fmean(latencies) * 1000 if latencies else 0:8.2f}ms"
+    )
+
+
+async def run(args):
+    updates_total = args.updates
+    
+    if args.url:
+        card_ids = list(range(1, args.cards + 1))
+        updates = build_updates(updates_total, card_ids, args.users)
+        started = time.perf_counter()
+        http_latencies = await fire(args.url, updates, args.concurrency, config.WEBHOOK_SECRET)
+        elapsed = time.perf_counter() - started
+        report("HTTP", http_latencies)
+        print(f"Throughput: {updates_total / elapsed:.0f} updates/s")
+        return
+    
+    from bot.main import create_dispatcher
+    from bot.webhook import create_app
+    
+    card_ids = await seed(args.cards)
+    updates = build_updates(updates_total, card_ids, args.users)
+    
+    handler_latencies = []
+    
+    dp = create_dispatcher()
+    
+    @dp.update.outer_middleware()
+    async def measure(handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            handler_latencies.append(time.perf_counter() - started)
+    
+    config.WEBHOOK_MAX_CONCURRENCY = args.max_concurrency
+    bot = Bot(token=config.BOT_TOKEN, session=FakeSession(args.api_latency))
+    app = create_app(dp, bot)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", args.port)
+    await site.start()
+    
+    try:
+        started = time.perf_counter()
+        http_latencies = await fire(
+            f"http://127.0.0.1:{args.port}{config.WEBHOOK_PATH}",
+            updates, args.concurrency, config.WEBHOOK_SECRET
+        )
+        await app["webhook_handler"].drain()
+        elapsed = time.perf_counter() - started
+    finally:
+        await runner.cleanup()
+        await db.engine.dispose()
+    
+    report("HTTP ack", http_latencies)
+    report("Handler", handler_latencies)
+    print(f"Throughput: {updates_total / elapsed:.0f} updates/s (max concurrency {args.max_concurrency})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50, help="parallel HTTP requests")
+    parser.add_argument("--max-concurrency", type=int, default=config.WEBHOOK_MAX_CONCURRENCY,
+                        help="WEBHOOK_MAX_CONCURRENCY for the in-process server")
+    parser.add_argument("--cards", type=int, default=200)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--api-latency", type=float, default=0.0, help="simulated Bot API latency, seconds")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--url", help="existing webhook endpoint to load instead of the in-process bot")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(run(args))
+    finally:
+        if os.path.exists(DATABASE_FILE):
+            os.remove(DATABASE_FILE)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,62 +1,434 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy import select, func, case
-from typing import Optional, List
+from sqlalchemy import select, insert, update, delete, func, case, or_, tuple_, literal, inspect, text
+from sqlalchemy.orm import aliased, joinedload
+from alembic import command
+from alembic.config import Config as AlembicConfig
+import asyncio
+import uuid
+from typing import Optional, List, Tuple, Dict, AsyncIterator
+from collections import Counter
+from pathlib import Path
 from datetime import datetime
 from decimal import Decimal
 
-from bot.database.models import Base, User, Card, ModerationStatus, Purchase, Withdrawal, WithdrawalStatus
+from bot.database.models import (
+    Base, User, Card, ModerationStatus, Purchase, Withdrawal, WithdrawalStatus, UserStats, card_search_vector,
+    Broadcast, BroadcastStatus, Payment, LedgerEntry, LedgerAccount, BalanceSnapshot
+)
 from bot.config import config
 from bot.utils.logger import logger
+from bot.utils.cache import TTLCache
+from bot.utils.search import InvertedIndex, tsquery_text
+
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def keyset_page(query, model, anchor_id: Optional[int], limit: int,
+                backward: bool = False, descending: bool = False):
+    # Pages over (created_at, id); the anchor row's created_at is resolved inside
+    # the same statement so callbacks only have to carry the item id. If the anchor
+    # was deleted meanwhile, each row is compared with its own created_at, which
+    # leaves an id-only comparison instead of a NULL that matches nothing.
+    less = descending != backward
+    order_key = tuple_(model.created_at, model.id)
+    
+    if anchor_id is not None:
+        anchor_model = aliased(model)
+        anchor = tuple_(
+            func.coalesce(
+                select(anchor_model.created_at).where(anchor_model.id == anchor_id).scalar_subquery(),
+                model.created_at
+            ),
+            literal(anchor_id)
+        )
+        query = query.where(order_key < anchor if less else order_key > anchor)
+    
+    if less:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    
+    return query.limit(limit)
+
+
+def dialect_insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upserts are not supported for dialect '{dialect_name}'")
+    
+    return insert
+
+
+STATUS_COUNTERS = {
+    ModerationStatus.APPROVED: 'approved_cards',
+    ModerationStatus.REJECTED: 'rejected_cards'
+}
+
+STATS_SORT_COLUMNS = {
+    'revenue': UserStats.revenue,
+    'cards': UserStats.total_cards,
+    'rejected': UserStats.rejected_cards
+}
+
+EXPORT_TABLES = {
+    'users': User.__table__,
+    'cards': Card.__table__,
+    'purchases': Purchase.__table__,
+    'withdrawals': Withdrawal.__table__,
+    'ledger_entries': LedgerEntry.__table__
+}
+
+LEDGER_COLUMNS = ('transaction_id', 'account', 'user_id', 'amount', 'reference')
+
+USER_STATS_COLUMNS = ('total_cards', 'approved_cards', 'rejected_cards', 'sales_count', 'revenue')
+
+
+def live_user_stats_query():
+    cards = (
+        select(
+            Card.user_id,
+            func.count(Card.id).label('total_cards'),
+            func.sum(case((Card.status == ModerationStatus.APPROVED, 1), else_=0)).label('approved_cards'),
+            func.sum(case((Card.status == ModerationStatus.REJECTED, 1), else_=0)).label('rejected_cards')
+        )
+        .group_by(Card.user_id)
+        .subquery()
+    )
+    sales = (
+        select(
+            Purchase.seller_id,
+            func.count(Purchase.id).label('sales_count'),
+            func.sum(Purchase.amount).label('revenue')
+        )
+        .group_by(Purchase.seller_id)
+        .subquery()
+    )
+    
+    return (
+        select(
+            User.id.label('user_id'),
+            func.coalesce(cards.c.total_cards, 0).label('total_cards'),
+            func.coalesce(cards.c.approved_cards, 0).label('approved_cards'),
+            func.coalesce(cards.c.rejected_cards, 0).label('rejected_cards'),
+            func.coalesce(sales.c.sales_count, 0).label('sales_count'),
+            func.coalesce(sales.c.revenue, 0).label('revenue')
+        )
+        .outerjoin(cards, cards.c.user_id == User.id)
+        .outerjoin(sales, sales.c.seller_id == User.id)
+        .where(or_(cards.c.user_id.is_not(None), sales.c.seller_id.is_not(None)))
+    )
+
+
+def user_balance_expression():
+    # The snapshot plus whatever was posted after it; the tail is a range scan on
+    # (user_id, id) that compaction keeps short. Expects users and balance_snapshots
+    # in the enclosing FROM.
+    tail = (
+        select(func.sum(LedgerEntry.amount))
+        .where(LedgerEntry.user_id == User.id, LedgerEntry.id > func.coalesce(BalanceSnapshot.last_entry_id, 0))
+        .scalar_subquery()
+    )
+    return func.coalesce(BalanceSnapshot.balance, 0) + func.coalesce(tail, 0)
+
+
+def snapshot_entries_total():
+    # What a snapshot should hold: every entry of its user up to last_entry_id. Expects
+    # balance_snapshots in the enclosing statement.
+    return (
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .where(LedgerEntry.user_id == BalanceSnapshot.user_id, LedgerEntry.id <= BalanceSnapshot.last_entry_id)
+        .scalar_subquery()
+    )
+
+
+def user_balance_query(user_id: int):
+    return (
+        select(user_balance_expression())
+        .select_from(User)
+        .outerjoin(BalanceSnapshot, BalanceSnapshot.user_id == User.id)
+        .where(User.id == user_id)
+    )
+
+
+def build_alembic_config(connection=None) -> AlembicConfig:
+    alembic_config = AlembicConfig(str(PROJECT_ROOT / "alembic.ini"))
+    alembic_config.set_main_option("script_location", str(PROJECT_ROOT / "alembic"))
+    alembic_config.attributes['connection'] = connection
+    return alembic_config
+
+
+def run_migrations(connection):
+    alembic_config = build_alembic_config(connection)
+    tables = set(inspect(connection).get_table_names())
+    
+    # Databases created by the old create_all bootstrap have no alembic_version table;
+    # stamp the revision their schema matches so upgrade only adds what is missing.
+    if "users" in tables and "alembic_version" not in tables:
+        legacy_revision = "0002" if "fsm_states" in tables else "0001"
+        logger.info("Stamping unversioned database at revision %s", legacy_revision)
+        command.stamp(alembic_config, legacy_revision)
+    
+    command.upgrade(alembic_config, "head")
 
 
 class Database:
     def __init__(self, url: str):
-        self.engine = create_async_engine(url, echo=False, pool_pre_ping=True)
+        connect_args = {"timeout": 30} if url.startswith("sqlite") else {}
+        self.engine = create_async_engine(url, echo=False, pool_pre_ping=True, connect_args=connect_args)
         self.session_maker = async_sessionmaker(
             self.engine, 
             class_=AsyncSession, 
             expire_on_commit=False
         )
+        self.card_cache = TTLCache(config.CARD_CACHE_SIZE, config.CARD_CACHE_TTL)
+        self.catalog_cache = TTLCache(config.CARD_CACHE_SIZE, config.CARD_CACHE_TTL)
+        self.user_cache = TTLCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+        # Moderation and payout queue lengths, dropped whenever this process changes a queue
+        self.queue_cache = TTLCache(16, config.CATALOG_COUNT_TTL)
+        self.search_index: Optional[InvertedIndex] = None
+        self._search_index_lock = asyncio.Lock()
     
     async def init_db(self):
         async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(run_migrations)
+        
+        if not self.uses_tsvector:
+            await self.ensure_search_index()
+        
         logger.info("Database initialized successfully")
     
+    @property
+    def uses_tsvector(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+    
     async def add_user(self, user_id: int, username: Optional[str], first_name: Optional[str]) -> User:
+        cached = self.user_cache.get(user_id)
+        
+        if cached is not None and (cached.username, cached.first_name) == (username, first_name):
+            return cached
+        
+        insert = dialect_insert(self.engine.dialect.name)
+        statement = insert(User).values(
+            id=user_id,
+            username=username,
+            first_name=first_name
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.id],
+            set_={
+                'username': statement.excluded.username,
+                'first_name': statement.excluded.first_name,
+                # A user talking to the bot again has unblocked it
+                'is_blocked': False
+            },
+            where=or_(
+                User.username.is_distinct_from(statement.excluded.username),
+                User.first_name.is_distinct_from(statement.excluded.first_name),
+                User.is_blocked.is_(True)
+            )
+        ).returning(User)
+        
         async with self.session_maker() as session:
-            result = await session.execute(select(User).where(User.id == user_id))
+            result = await session.execute(statement, execution_options={"populate_existing": True})
             user = result.scalar_one_or_none()
+            await session.commit()
             
-            if not user:
-                user = User(id=user_id, username=username, first_name=first_name, balance=Decimal('0.00'))
-                session.add(user)
-                logger.info(f"New user added: {user_id} (@{username})")
+            if user:
+                logger.info("User %s (@%s) saved", user_id, username)
             else:
-                user.username = username
-                user.first_name = first_name
-            
-            await session.commit()
-            await session.refresh(user)
-            return user
+                # The conflict WHERE skipped the write: the stored profile is already current
+                result = await session.execute(select(User).where(User.id == user_id))
+                user = result.scalar_one()
+        
+        self.user_cache.set(user_id, user)
+        return user
     
     async def get_user(self, user_id: int) -> Optional[User]:
         async with self.session_maker() as session:
             result = await session.execute(select(User).where(User.id == user_id))
             return result.scalar_one_or_none()
     
-    async def update_user_balance(self, user_id: int, amount: Decimal) -> Optional[User]:
+    async def get_balance(self, user_id: int) -> Optional[Decimal]:
         async with self.session_maker() as session:
-            result = await session.execute(select(User).where(User.id == user_id))
-            user = result.scalar_one_or_none()
+            result = await session.execute(user_balance_query(user_id))
+            balance = result.scalar_one_or_none()
+        
+        return None if balance is None else Decimal(balance).quantize(Decimal('0.01'))
+    
+    def _user_leg(self, transaction_id: str, user_id: int, amount: Decimal, reference: str,
+                  require_funds: bool = False):
+        # The user's leg is an INSERT ... SELECT from users, so it is skipped for an unknown
+        # user and, for debits, when the balance does not cover the amount
+        query = (
+            select(
+                literal(transaction_id),
+                literal(LedgerAccount.USER, LedgerEntry.account.type),
+                User.id,
+                literal(amount, LedgerEntry.amount.type),
+                literal(reference)
+            )
+            .select_from(User)
+            .where(User.id == user_id)
+        )
+        
+        if require_funds:
+            query = (
+                query
+                .outerjoin(BalanceSnapshot, BalanceSnapshot.user_id == User.id)
+                .where(user_balance_expression() >= -amount)
+            )
+        
+        return insert(LedgerEntry).from_select(LEDGER_COLUMNS, query).returning(LedgerEntry.id)
+    
+    async def _post_counter_leg(self, session, transaction_id: str, account: LedgerAccount, amount: Decimal,
+                                reference: str):
+        await session.execute(
+            insert(LedgerEntry).values(
+                transaction_id=transaction_id,
+                account=account,
+                user_id=None,
+                amount=amount,
+                reference=reference
+            )
+        )
+    
+    async def _post_transfer(self, session, user_id: int, account: LedgerAccount, amount: Decimal, reference: str):
+        # A credit needs no balance check, so both legs are one plain append that never
+        # waits on other writers to the same user
+        transaction_id = uuid.uuid4().hex
+        await session.execute(insert(LedgerEntry.__table__), [
+            {'transaction_id': transaction_id, 'account': LedgerAccount.USER, 'user_id': user_id,
+             'amount': amount, 'reference': reference},
+            {'transaction_id': transaction_id, 'account': account, 'user_id': None,
+             'amount': -amount, 'reference': reference}
+        ])
+    
+    async def _lock_balance(self, session, user_id: int):
+        # Debits of one user are serialized on the user's row so two of them cannot both
+        # pass the funds check; FOR NO KEY UPDATE still lets credits insert their entries.
+        # SQLite takes the database write lock with the first insert instead.
+        if self.engine.dialect.name == "postgresql":
+            await session.execute(select(User.id).where(User.id == user_id).with_for_update(key_share=True))
+    
+    async def update_user_balance(self, user_id: int, amount: Decimal) -> Optional[Decimal]:
+        transaction_id = uuid.uuid4().hex
+        
+        async with self.session_maker() as session:
+            result = await session.execute(self._user_leg(transaction_id, user_id, amount, "adjustment"))
             
-            if user:
-                user.balance += amount
-                await session.commit()
-                await session.refresh(user)
-                logger.info(f"User {user_id} balance updated: {amount}")
+            if result.scalar_one_or_none() is None:
+                await session.rollback()
+                return None
             
-            return user
+            await self._post_counter_leg(session, transaction_id, LedgerAccount.ADJUSTMENTS, -amount, "adjustment")
+            result = await session.execute(user_balance_query(user_id))
+            balance = Decimal(result.scalar_one()).quantize(Decimal('0.01'))
+            await session.commit()
+        
+        logger.info("User %s balance adjusted by %s", user_id, amount)
+        return balance
+    
+    async def get_last_ledger_entry_id(self) -> int:
+        async with self.session_maker() as session:
+            result = await session.execute(select(func.coalesce(func.max(LedgerEntry.id), 0)))
+            return result.scalar_one()
+    
+    async def compact_balances(self, up_to_id: int) -> int:
+        # Folds entries in (watermark, up_to_id] into absolute per-user snapshots. Every
+        # compaction covers a contiguous id range, so the highest last_entry_id is how far
+        # all users are compacted. The caller passes an id seen one interval earlier so
+        # that transactions which allocated lower ids have almost certainly committed. One
+        # that commits later still is left out of the snapshot; reconcile_ledger reports
+        # the snapshot as drifted and repair_snapshots folds the entry in.
+        watermark_snapshot = aliased(BalanceSnapshot)
+        watermark = select(func.coalesce(func.max(watermark_snapshot.last_entry_id), 0)).scalar_subquery()
+        folded = (
+            select(
+                LedgerEntry.user_id,
+                func.coalesce(func.max(BalanceSnapshot.balance), 0) + func.sum(LedgerEntry.amount),
+                func.max(LedgerEntry.id),
+                func.now()
+            )
+            .outerjoin(BalanceSnapshot, BalanceSnapshot.user_id == LedgerEntry.user_id)
+            .where(
+                LedgerEntry.id > watermark,
+                LedgerEntry.id <= up_to_id,
+                LedgerEntry.id > func.coalesce(BalanceSnapshot.last_entry_id, 0),
+                LedgerEntry.user_id.is_not(None)
+            )
+            .group_by(LedgerEntry.user_id)
+        )
+        
+        insert = dialect_insert(self.engine.dialect.name)
+        statement = insert(BalanceSnapshot).from_select(
+            ('user_id', 'balance', 'last_entry_id', 'updated_at'), folded
+        )
+        # Snapshots are absolute totals, so of two overlapping compactions the one that
+        # reached further wins and the other is a no-op
+        statement = statement.on_conflict_do_update(
+            index_elements=[BalanceSnapshot.user_id],
+            set_={
+                'balance': statement.excluded.balance,
+                'last_entry_id': statement.excluded.last_entry_id,
+                'updated_at': statement.excluded.updated_at
+            },
+            where=BalanceSnapshot.last_entry_id < statement.excluded.last_entry_id
+        )
+        
+        async with self.session_maker() as session:
+            result = await session.execute(statement)
+            await session.commit()
+        
+        return result.rowcount
+    
+    async def reconcile_ledger(self) -> dict:
+        unbalanced = (
+            select(LedgerEntry.transaction_id)
+            .group_by(LedgerEntry.transaction_id)
+            .having(func.round(func.sum(LedgerEntry.amount), 2) != 0)
+            .subquery()
+        )
+        snapshot_total = snapshot_entries_total()
+        
+        async with self.session_maker() as session:
+            entries = (await session.execute(select(func.count(LedgerEntry.id)))).scalar_one()
+            unbalanced_count = (await session.execute(select(func.count()).select_from(unbalanced))).scalar_one()
+            drifted = (await session.execute(
+                select(func.count())
+                .select_from(BalanceSnapshot)
+                .where(func.round(BalanceSnapshot.balance - snapshot_total, 2) != 0)
+            )).scalar_one()
+            accounts = await session.execute(
+                select(LedgerEntry.account, func.sum(LedgerEntry.amount)).group_by(LedgerEntry.account)
+            )
+        
+        return {
+            'entries': entries,
+            'unbalanced_transactions': unbalanced_count,
+            'drifted_snapshots': drifted,
+            'accounts': {
+                account.value: Decimal(total).quantize(Decimal('0.01')) for account, total in accounts
+            }
+        }
+    
+    async def repair_snapshots(self) -> int:
+        # Entries are the source of truth, so a drifted snapshot is rebuilt from them
+        snapshot_total = snapshot_entries_total()
+        statement = (
+            update(BalanceSnapshot)
+            .where(func.round(BalanceSnapshot.balance - snapshot_total, 2) != 0)
+            .values(balance=snapshot_total, updated_at=func.now())
+        )
+        
+        async with self.session_maker() as session:
+            result = await session.execute(statement)
+            await session.commit()
+        
+        return result.rowcount
     
     async def add_card(self, user_id: int, title: str, description: str, 
                        price: Decimal, photo_id: Optional[str] = None) -> Card:
@@ -70,19 +442,144 @@ class Database:
                 status=ModerationStatus.PENDING
             )
             session.add(card)
+            await session.flush()
+            await self._bump_user_stats(session, user_id, total_cards=1)
             await session.commit()
-            await session.refresh(card)
-            logger.info(f"Card added: {card.id} by user {user_id}")
+            self.invalidate_queue(Card)
+            logger.info("Card added: %s by user %s", card.id, user_id)
             return card
     
+    async def _bump_user_stats(self, session, user_id: int, **deltas):
+        insert = dialect_insert(self.engine.dialect.name)
+        statement = insert(UserStats).values(user_id=user_id, **deltas)
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={
+                    column: getattr(UserStats, column) + getattr(statement.excluded, column)
+                    for column in deltas
+                }
+            )
+        )
+    
+    async def _bump_user_stats_bulk(self, session, column: str, counts: Dict[int, int]):
+        insert = dialect_insert(self.engine.dialect.name)
+        statement = insert(UserStats)
+        await session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserStats.user_id],
+                set_={column: getattr(UserStats, column) + getattr(statement.excluded, column)}
+            ),
+            [{'user_id': user_id, column: count} for user_id, count in counts.items()]
+        )
+    
+    async def ensure_search_index(self) -> InvertedIndex:
+        async with self._search_index_lock:
+            if self.search_index is not None:
+                return self.search_index
+            
+            index = InvertedIndex()
+            query = (
+                select(Card.id, Card.title, Card.description)
+                .where(Card.status == ModerationStatus.APPROVED)
+                .execution_options(yield_per=5000)
+            )
+            
+            async with self.session_maker() as session:
+                result = await session.stream(query)
+                async for card_id, title, description in result:
+                    index.add(card_id, title, description)
+            
+            self.search_index = index
+            logger.info("Search index built for %s cards", len(index))
+            return index
+    
+    def _reindex_card(self, card: Card):
+        if self.search_index is None:
+            return
+        
+        if card.status == ModerationStatus.APPROVED:
+            self.search_index.add(card.id, card.title, card.description)
+        else:
+            self.search_index.remove(card.id)
+    
+    def invalidate_card(self, card_id: int, catalog: bool = True):
+        self.card_cache.pop(card_id)
+        
+        if catalog:
+            self.catalog_cache.clear()
+    
+    def invalidate_queue(self, model):
+        self.queue_cache.pop(model.__tablename__)
+    
+    def cache_stats(self) -> dict:
+        return {
+            'cards': self.card_cache.stats(),
+            'catalog': self.catalog_cache.stats(),
+            'queues': self.queue_cache.stats(),
+            'users': self.user_cache.stats()
+        }
+    
+    def _cache_cards(self, cards: List[Card]):
+        for card in cards:
+            self.card_cache.set(card.id, card)
+    
     async def get_approved_cards(self) -> List[Card]:
+        cards = self.catalog_cache.get(('all',))
+        
+        if cards is not None:
+            return list(cards)
+        
         async with self.session_maker() as session:
             result = await session.execute(
                 select(Card)
                 .where(Card.status == ModerationStatus.APPROVED)
                 .order_by(Card.created_at.desc())
             )
-            return list(result.scalars().all())
+            cards = list(result.scalars().all())
+        
+        self.catalog_cache.set(('all',), cards)
+        self._cache_cards(cards)
+        return list(cards)
+    
+    async def get_approved_cards_page(self, anchor_id: Optional[int] = None, limit: int = 1,
+                                      backward: bool = False) -> List[Card]:
+        key = ('page', anchor_id, limit, backward)
+        cards = self.catalog_cache.get(key)
+        
+        if cards is not None:
+            return list(cards)
+        
+        async with self.session_maker() as session:
+            result = await session.execute(
+                keyset_page(
+                    select(Card).where(Card.status == ModerationStatus.APPROVED),
+                    Card, anchor_id, limit, backward=backward, descending=True
+                )
+            )
+            cards = list(result.scalars().all())
+        
+        if backward:
+            cards.reverse()
+        
+        self.catalog_cache.set(key, cards)
+        self._cache_cards(cards)
+        return list(cards)
+    
+    async def count_approved_cards(self) -> int:
+        count = self.catalog_cache.get(('count',))
+        
+        if count is not None:
+            return count
+        
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(func.count(Card.id)).where(Card.status == ModerationStatus.APPROVED)
+            )
+            count = result.scalar_one()
+        
+        self.catalog_cache.set(('count',), count, ttl=config.CATALOG_COUNT_TTL)
+        return count
     
     async def get_pending_cards(self) -> List[Card]:
         async with self.session_maker() as session:
@@ -93,80 +590,316 @@ class Database:
             )
             return list(result.scalars().all())
     
+    async def get_pending_cards_page(self, anchor_id: Optional[int] = None, limit: int = 1,
+                                     backward: bool = False) -> List[Card]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                keyset_page(
+                    select(Card)
+                    .options(joinedload(Card.user))
+                    .where(Card.status == ModerationStatus.PENDING),
+                    Card, anchor_id, limit, backward=backward
+                )
+            )
+            cards = list(result.scalars().all())
+        
+        if backward:
+            cards.reverse()
+        
+        return cards
+    
+    async def _count_queue(self, session, model, status) -> int:
+        count = self.queue_cache.get(model.__tablename__)
+        
+        if count is None:
+            result = await session.execute(select(func.count(model.id)).where(model.status == status))
+            count = result.scalar_one()
+            self.queue_cache.set(model.__tablename__, count)
+        
+        return count
+    
+    async def _first_in_queue(self, model, status, anchor_id: Optional[int], backward: bool) -> Tuple:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                keyset_page(
+                    select(model)
+                    .options(joinedload(model.user))
+                    .where(model.status == status),
+                    model, anchor_id, 1, backward=backward
+                )
+            )
+            item = result.scalar_one_or_none()
+            
+            if item is None:
+                return None, 0
+            
+            # Another instance may have changed the queue within the TTL; never report
+            # an empty queue next to the item we are showing
+            return item, max(await self._count_queue(session, model, status), 1)
+    
+    async def get_pending_card_for_review(self, anchor_id: Optional[int] = None,
+                                          backward: bool = False) -> Tuple[Optional[Card], int]:
+        return await self._first_in_queue(Card, ModerationStatus.PENDING, anchor_id, backward)
+    
     async def get_card(self, card_id: int) -> Optional[Card]:
+        card = self.card_cache.get(card_id)
+        
+        if card is not None:
+            return card
+        
         async with self.session_maker() as session:
             result = await session.execute(select(Card).where(Card.id == card_id))
-            return result.scalar_one_or_none()
+            card = result.scalar_one_or_none()
+        
+        if card:
+            self.card_cache.set(card_id, card)
+        
+        return card
+    
+    async def get_cards(self, card_ids: List[int]) -> List[Card]:
+        cards = {card_id: self.card_cache.get(card_id) for card_id in card_ids}
+        missing = [card_id for card_id, card in cards.items() if card is None]
+        
+        if missing:
+            async with self.session_maker() as session:
+                result = await session.execute(select(Card).where(Card.id.in_(missing)))
+                for card in result.scalars():
+                    cards[card.id] = card
+                    self.card_cache.set(card.id, card)
+        
+        return [cards[card_id] for card_id in card_ids if cards[card_id] is not None]
+    
+    async def search_cards(self, query: str, offset: int = 0, limit: int = 10) -> Tuple[List[Card], bool]:
+        if self.uses_tsvector:
+            terms = tsquery_text(query)
+            
+            if not terms:
+                return [], False
+            
+            vector = card_search_vector(Card.title, Card.description)
+            ts_query = func.to_tsquery(text("'russian'::regconfig"), terms)
+            rank = func.ts_rank_cd(vector, ts_query)
+            
+            async with self.session_maker() as session:
+                result = await session.execute(
+                    select(Card)
+                    .where(Card.status == ModerationStatus.APPROVED, vector.op('@@')(ts_query))
+                    .order_by(rank.desc(), Card.id.desc())
+                    .offset(offset)
+                    .limit(limit + 1)
+                )
+                cards = list(result.scalars().all())
+        else:
+            index = await self.ensure_search_index()
+            ranked = index.search(query, offset + limit + 1)[offset:]
+            cards = await self.get_cards([card_id for card_id, _ in ranked])
+        
+        return cards[:limit], len(cards) > limit
     
     async def update_card_status(self, card_id: int, status: ModerationStatus) -> Optional[Card]:
         async with self.session_maker() as session:
-            result = await session.execute(select(Card).where(Card.id == card_id))
-            card = result.scalar_one_or_none()
+            while True:
+                result = await session.execute(
+                    select(Card.status).where(Card.id == card_id).with_for_update()
+                )
+                old_status = result.scalar_one_or_none()
+                
+                # A double tap or a second moderator who got there first changes nothing
+                if old_status is None or old_status == status:
+                    return None
+                
+                # Compare-and-set on the status we read: if another moderator changed it
+                # in between, the counters below would be wrong, so read again.
+                result = await session.execute(
+                    update(Card)
+                    .where(Card.id == card_id, Card.status == old_status)
+                    .values(status=status, moderated_at=datetime.now())
+                    .returning(Card)
+                )
+                card = result.scalar_one_or_none()
+                
+                if card is not None:
+                    break
+                
+                await session.rollback()
             
-            if card:
-                card.status = status
-                card.moderated_at = datetime.now()
-                await session.commit()
-                await session.refresh(card)
-                logger.info(f"Card {card_id} status updated to {status.value}")
+            deltas = {}
+            if old_status in STATUS_COUNTERS:
+                deltas[STATUS_COUNTERS[old_status]] = -1
+            if status in STATUS_COUNTERS:
+                deltas[STATUS_COUNTERS[status]] = 1
+            
+            if deltas:
+                await self._bump_user_stats(session, card.user_id, **deltas)
+            
+            await session.commit()
             
+            self.invalidate_card(
+                card_id,
+                catalog=ModerationStatus.APPROVED in (old_status, status)
+            )
+            if ModerationStatus.PENDING in (old_status, status):
+                self.invalidate_queue(Card)
+            self._reindex_card(card)
+            logger.info("Card %s status updated to %s", card_id, status.value)
             return card
     
+    async def bulk_update_card_status(self, status: ModerationStatus, card_ids: Optional[List[int]] = None,
+                                      seller_id: Optional[int] = None) -> List[Card]:
+        if card_ids is None and seller_id is None:
+            raise ValueError("Either card_ids or seller_id must be given")
+        
+        if card_ids is not None and not card_ids:
+            return []
+        
+        # Only pending cards are touched, so every returned row moved out of PENDING
+        # and the counters can be adjusted without reading the old statuses.
+        query = update(Card).where(Card.status == ModerationStatus.PENDING)
+        
+        if card_ids is not None:
+            query = query.where(Card.id.in_(card_ids))
+        
+        if seller_id is not None:
+            query = query.where(Card.user_id == seller_id)
+        
+        async with self.session_maker() as session:
+            result = await session.execute(
+                query
+                .values(status=status, moderated_at=datetime.now())
+                .returning(Card),
+                execution_options={'synchronize_session': False}
+            )
+            cards = list(result.scalars().all())
+            
+            if cards and status in STATUS_COUNTERS:
+                await self._bump_user_stats_bulk(
+                    session, STATUS_COUNTERS[status], Counter(card.user_id for card in cards)
+                )
+            
+            await session.commit()
+        
+        for card in cards:
+            self.invalidate_card(card.id, catalog=False)
+            self._reindex_card(card)
+        
+        if cards:
+            self.invalidate_queue(Card)
+        
+        if status == ModerationStatus.APPROVED and cards:
+            self.catalog_cache.clear()
+        
+        logger.info("%s cards status updated to %s", len(cards), status.value)
+        return cards
+    
     async def update_card_field(self, card_id: int, field: str, value: any) -> Optional[Card]:
         async with self.session_maker() as session:
-            result = await session.execute(select(Card).where(Card.id == card_id))
+            result = await session.execute(
+                update(Card)
+                .where(Card.id == card_id)
+                .values({field: value, 'version': Card.version + 1})
+                .returning(Card)
+            )
             card = result.scalar_one_or_none()
+            await session.commit()
             
             if card:
-                setattr(card, field, value)
-                await session.commit()
-                await session.refresh(card)
-                logger.info(f"Card {card_id} field '{field}' updated")
+                self.invalidate_card(card_id, catalog=card.status == ModerationStatus.APPROVED)
+                self._reindex_card(card)
+                logger.info("Card %s field '%s' updated", card_id, field)
             
             return card
     
     async def delete_card(self, card_id: int) -> bool:
         async with self.session_maker() as session:
-            result = await session.execute(select(Card).where(Card.id == card_id))
-            card = result.scalar_one_or_none()
+            result = await session.execute(
+                delete(Card).where(Card.id == card_id).returning(Card.status, Card.user_id)
+            )
+            row = result.one_or_none()
             
-            if card:
-                await session.delete(card)
-                await session.commit()
-                logger.info(f"Card {card_id} deleted")
-                return True
+            if row is None:
+                return False
+            
+            status, user_id = row
+            deltas = {'total_cards': -1}
+            if status in STATUS_COUNTERS:
+                deltas[STATUS_COUNTERS[status]] = -1
+            
+            await self._bump_user_stats(session, user_id, **deltas)
+            await session.commit()
             
-            return False
+            self.invalidate_card(card_id, catalog=status == ModerationStatus.APPROVED)
+            if status == ModerationStatus.PENDING:
+                self.invalidate_queue(Card)
+            if self.search_index is not None:
+                self.search_index.remove(card_id)
+            logger.info("Card %s deleted", card_id)
+            return True
+    
+    async def _create_purchase(self, session, user_id: int, card_id: int, amount: Decimal, seller_id: int,
+                               payment_id: Optional[int] = None) -> Purchase:
+        purchase = Purchase(
+            user_id=user_id,
+            card_id=card_id,
+            amount=amount,
+            seller_id=seller_id,
+            payment_id=payment_id
+        )
+        session.add(purchase)
+        await session.flush()
+        
+        await self._post_transfer(session, seller_id, LedgerAccount.PAYMENTS, amount, f"purchase:{purchase.id}")
+        await self._bump_user_stats(session, seller_id, sales_count=1, revenue=amount)
+        return purchase
     
     async def add_purchase(self, user_id: int, card_id: int, amount: Decimal, seller_id: int) -> Purchase:
         async with self.session_maker() as session:
-            purchase = Purchase(
+            purchase = await self._create_purchase(session, user_id, card_id, amount, seller_id)
+            
+            await session.commit()
+            logger.info("Purchase created: user %s bought card %s for %s", user_id, card_id, amount)
+            return purchase
+    
+    async def record_payment(self, telegram_payment_charge_id: str, provider_payment_charge_id: str,
+                             user_id: int, card_id: int, amount: Decimal, currency: str, invoice_payload: str,
+                             seller_id: int) -> Optional[Purchase]:
+        # The payment row is claimed first with insert-if-absent on the charge id. A redelivered
+        # update loses the race on the unique key and stops after this one statement, so the
+        # purchase and the seller credit happen exactly once per charge.
+        insert = dialect_insert(self.engine.dialect.name)
+        statement = (
+            insert(Payment)
+            .values(
+                telegram_payment_charge_id=telegram_payment_charge_id,
+                provider_payment_charge_id=provider_payment_charge_id,
                 user_id=user_id,
                 card_id=card_id,
                 amount=amount,
-                seller_id=seller_id
+                currency=currency,
+                invoice_payload=invoice_payload
             )
-            session.add(purchase)
+            .on_conflict_do_nothing(index_elements=[Payment.telegram_payment_charge_id])
+            .returning(Payment.id)
+        )
+        
+        async with self.session_maker() as session:
+            payment_id = (await session.execute(statement)).scalar_one_or_none()
             
-            result = await session.execute(select(User).where(User.id == seller_id))
-            seller = result.scalar_one_or_none()
-            if seller:
-                seller.balance += amount
+            if payment_id is None:
+                await session.rollback()
+                logger.info("Payment %s already recorded, skipping", telegram_payment_charge_id)
+                return None
             
+            purchase = await self._create_purchase(session, user_id, card_id, amount, seller_id, payment_id)
             await session.commit()
-            await session.refresh(purchase)
-            logger.info(f"Purchase created: user {user_id} bought card {card_id} for {amount}")
-            return purchase
+        
+        logger.info("Payment %s recorded: user %s bought card %s for %s", telegram_payment_charge_id, user_id, card_id, amount)
+        return purchase
     
     async def create_withdrawal(self, user_id: int, amount: Decimal, requisites: str) -> Optional[Withdrawal]:
+        transaction_id = uuid.uuid4().hex
+        
         async with self.session_maker() as session:
-            result = await session.execute(select(User).where(User.id == user_id))
-            user = result.scalar_one_or_none()
-            
-            if not user or user.balance < amount:
-                return None
-            
-            user.balance -= amount
+            await self._lock_balance(session, user_id)
             
             withdrawal = Withdrawal(
                 user_id=user_id,
@@ -175,34 +908,159 @@ class Database:
                 status=WithdrawalStatus.PENDING
             )
             session.add(withdrawal)
+            await session.flush()
+            
+            # The funds check and the debit are one conditional insert
+            reference = f"withdrawal:{withdrawal.id}"
+            result = await session.execute(
+                self._user_leg(transaction_id, user_id, -amount, reference, require_funds=True)
+            )
+            
+            if result.scalar_one_or_none() is None:
+                await session.rollback()
+                return None
+            
+            await self._post_counter_leg(session, transaction_id, LedgerAccount.PAYOUTS, amount, reference)
             await session.commit()
-            await session.refresh(withdrawal)
-            logger.info(f"Withdrawal created: user {user_id}, amount {amount}")
+            self.invalidate_queue(Withdrawal)
+            logger.info("Withdrawal created: user %s, amount %s", user_id, amount)
             return withdrawal
     
     async def get_pending_withdrawals(self) -> List[Withdrawal]:
         async with self.session_maker() as session:
             result = await session.execute(
                 select(Withdrawal)
+                .options(joinedload(Withdrawal.user))
                 .where(Withdrawal.status == WithdrawalStatus.PENDING)
                 .order_by(Withdrawal.created_at.asc())
             )
             return list(result.scalars().all())
     
+    async def get_pending_withdrawals_page(self, anchor_id: Optional[int] = None, limit: int = 20,
+                                          backward: bool = False) -> List[Withdrawal]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                keyset_page(
+                    select(Withdrawal)
+                    .options(joinedload(Withdrawal.user))
+                    .where(Withdrawal.status == WithdrawalStatus.PENDING),
+                    Withdrawal, anchor_id, limit, backward=backward
+                )
+            )
+            withdrawals = list(result.scalars().all())
+        
+        if backward:
+            withdrawals.reverse()
+        
+        return withdrawals
+    
+    async def get_pending_withdrawal_for_review(self, anchor_id: Optional[int] = None,
+                                                backward: bool = False) -> Tuple[Optional[Withdrawal], int]:
+        return await self._first_in_queue(Withdrawal, WithdrawalStatus.PENDING, anchor_id, backward)
+    
     async def complete_withdrawal(self, withdrawal_id: int) -> Optional[Withdrawal]:
         async with self.session_maker() as session:
-            result = await session.execute(select(Withdrawal).where(Withdrawal.id == withdrawal_id))
+            result = await session.execute(
+                update(Withdrawal)
+                .where(Withdrawal.id == withdrawal_id, Withdrawal.status == WithdrawalStatus.PENDING)
+                .values(status=WithdrawalStatus.COMPLETED, completed_at=datetime.now())
+                .returning(Withdrawal)
+            )
             withdrawal = result.scalar_one_or_none()
+            await session.commit()
             
             if withdrawal:
-                withdrawal.status = WithdrawalStatus.COMPLETED
-                withdrawal.completed_at = datetime.now()
-                await session.commit()
-                await session.refresh(withdrawal)
-                logger.info(f"Withdrawal {withdrawal_id} completed")
+                self.invalidate_queue(Withdrawal)
+                logger.info("Withdrawal %s completed", withdrawal_id)
             
             return withdrawal
     
+    async def create_broadcast(self, admin_id: int, text: str) -> Broadcast:
+        async with self.session_maker() as session:
+            broadcast = Broadcast(admin_id=admin_id, text=text)
+            session.add(broadcast)
+            await session.flush()
+            await session.commit()
+            
+            logger.info("Broadcast %s created by admin %s", broadcast.id, admin_id)
+            return broadcast
+    
+    async def get_broadcast(self, broadcast_id: int) -> Optional[Broadcast]:
+        async with self.session_maker() as session:
+            return await session.get(Broadcast, broadcast_id)
+    
+    async def get_running_broadcasts(self) -> List[Broadcast]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Broadcast)
+                .where(Broadcast.status == BroadcastStatus.RUNNING)
+                .order_by(Broadcast.id)
+            )
+            return list(result.scalars().all())
+    
+    async def count_broadcast_recipients(self) -> int:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(func.count()).select_from(User).where(User.is_blocked.is_(False))
+            )
+            return result.scalar_one()
+    
+    async def get_broadcast_recipients(self, after_user_id: int, limit: int) -> List[int]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(User.id)
+                .where(User.id > after_user_id, User.is_blocked.is_(False))
+                .order_by(User.id)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+    
+    async def save_broadcast_progress(self, broadcast_id: int, last_user_id: int, sent: int, failed: int,
+                                      blocked_ids: List[int]) -> Optional[Broadcast]:
+        # Blocked users and the checkpoint are written together, so a resumed
+        # broadcast never re-reads a batch whose outcome was already recorded
+        async with self.session_maker() as session:
+            if blocked_ids:
+                await session.execute(
+                    update(User).where(User.id.in_(blocked_ids)).values(is_blocked=True),
+                    execution_options={'synchronize_session': False}
+                )
+            
+            result = await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id)
+                .values(
+                    last_user_id=last_user_id,
+                    sent_count=Broadcast.sent_count + sent,
+                    failed_count=Broadcast.failed_count + failed,
+                    blocked_count=Broadcast.blocked_count + len(blocked_ids)
+                )
+                .returning(Broadcast)
+            )
+            broadcast = result.scalar_one_or_none()
+            await session.commit()
+        
+        for user_id in blocked_ids:
+            self.user_cache.pop(user_id)
+        
+        return broadcast
+    
+    async def finish_broadcast(self, broadcast_id: int, status: BroadcastStatus) -> Optional[Broadcast]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status == BroadcastStatus.RUNNING)
+                .values(status=status, finished_at=datetime.now())
+                .returning(Broadcast)
+            )
+            broadcast = result.scalar_one_or_none()
+            await session.commit()
+        
+        if broadcast:
+            logger.info("Broadcast %s %s", broadcast_id, status.value)
+        
+        return broadcast
+    
     async def get_user_statistics(self) -> List[dict]:
         async with self.session_maker() as session:
             result = await session.execute(
@@ -210,12 +1068,13 @@ class Database:
                     User.id,
                     User.username,
                     User.first_name,
-                    func.count(Card.id).label('total_cards'),
-                    func.sum(case((Card.status == ModerationStatus.APPROVED, 1), else_=0)).label('approved'),
-                    func.sum(case((Card.status == ModerationStatus.REJECTED, 1), else_=0)).label('rejected')
+                    func.coalesce(UserStats.total_cards, 0).label('total_cards'),
+                    func.coalesce(UserStats.approved_cards, 0).label('approved'),
+                    func.coalesce(UserStats.rejected_cards, 0).label('rejected'),
+                    func.coalesce(UserStats.sales_count, 0).label('sales'),
+                    func.coalesce(UserStats.revenue, 0).label('revenue')
                 )
-                .outerjoin(Card, User.id == Card.user_id)
-                .group_by(User.id)
+                .outerjoin(UserStats, UserStats.user_id == User.id)
             )
             
             statistics = []
@@ -224,12 +1083,135 @@ class Database:
                     'user_id': row.id,
                     'username': row.username,
                     'first_name': row.first_name,
-                    'total_cards': row.total_cards or 0,
-                    'approved': row.approved or 0,
-                    'rejected': row.rejected or 0
+                    'total_cards': row.total_cards,
+                    'approved': row.approved,
+                    'rejected': row.rejected,
+                    'sales': row.sales,
+                    'revenue': row.revenue
                 })
             
             return statistics
+    
+    async def get_user_statistics_page(self, sort: str = 'revenue', anchor_id: Optional[int] = None,
+                                       limit: int = 10, backward: bool = False) -> Tuple[List[dict], bool]:
+        # Keyset over (sort column, user_id) descending; the extra row tells whether
+        # another page exists in the requested direction.
+        column = STATS_SORT_COLUMNS[sort]
+        order_key = tuple_(column, UserStats.user_id)
+        query = (
+            select(UserStats, User.username, User.first_name)
+            .join(User, User.id == UserStats.user_id)
+        )
+        
+        if anchor_id is not None:
+            anchor_stats = aliased(UserStats)
+            anchor_column = getattr(anchor_stats, column.key)
+            anchor = tuple_(
+                select(anchor_column).where(anchor_stats.user_id == anchor_id).scalar_subquery(),
+                literal(anchor_id)
+            )
+            query = query.where(order_key > anchor if backward else order_key < anchor)
+        
+        if backward:
+            query = query.order_by(column.asc(), UserStats.user_id.asc())
+        else:
+            query = query.order_by(column.desc(), UserStats.user_id.desc())
+        
+        async with self.session_maker() as session:
+            result = await session.execute(query.limit(limit + 1))
+            rows = result.all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        if backward:
+            rows.reverse()
+        
+        statistics = [
+            {
+                'user_id': stats.user_id,
+                'username': username,
+                'first_name': first_name,
+                'total_cards': stats.total_cards,
+                'approved': stats.approved_cards,
+                'rejected': stats.rejected_cards,
+                'sales': stats.sales_count,
+                'revenue': stats.revenue
+            }
+            for stats, username, first_name in rows
+        ]
+        return statistics, has_more
+    
+    async def stream_table(self, name: str, batch_size: int = 5000) -> AsyncIterator[list]:
+        table = EXPORT_TABLES[name]
+        query = (
+            select(*table.columns)
+            .order_by(*table.primary_key.columns)
+            .execution_options(yield_per=batch_size)
+        )
+        
+        # yield_per streams from a server-side cursor, so only one batch is held at a time
+        async with self.session_maker() as session:
+            result = await session.stream(query)
+            
+            async for batch in result.partitions():
+                yield batch
+    
+    async def rebuild_user_stats(self) -> int:
+        async with self.session_maker() as session:
+            await session.execute(delete(UserStats))
+            insert = dialect_insert(self.engine.dialect.name)
+            await session.execute(
+                insert(UserStats).from_select(('user_id',) + USER_STATS_COLUMNS, live_user_stats_query())
+            )
+            result = await session.execute(select(func.count()).select_from(UserStats))
+            count = result.scalar_one()
+            await session.commit()
+        
+        logger.info("User statistics rebuilt for %s users", count)
+        return count
+    
+    async def reconcile_user_stats(self) -> List[dict]:
+        live = live_user_stats_query().subquery()
+        drift = or_(*[
+            getattr(live.c, column).is_distinct_from(getattr(UserStats, column))
+            for column in USER_STATS_COLUMNS
+        ])
+        # Rows left behind by users whose cards and sales are all gone
+        orphaned = or_(*[getattr(UserStats, column) != 0 for column in USER_STATS_COLUMNS])
+        
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(live).outerjoin(UserStats, UserStats.user_id == live.c.user_id).where(drift)
+            )
+            fixes = [dict(row._mapping) for row in result]
+            
+            result = await session.execute(
+                select(UserStats.user_id)
+                .outerjoin(live, live.c.user_id == UserStats.user_id)
+                .where(live.c.user_id.is_(None), orphaned)
+            )
+            fixes.extend(
+                {'user_id': user_id, **{column: 0 for column in USER_STATS_COLUMNS}}
+                for user_id in result.scalars()
+            )
+            
+            if fixes:
+                insert = dialect_insert(self.engine.dialect.name)
+                statement = insert(UserStats)
+                await session.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[UserStats.user_id],
+                        set_={column: getattr(statement.excluded, column) for column in USER_STATS_COLUMNS}
+                    ),
+                    fixes
+                )
+                await session.commit()
+        
+        for fix in fixes:
+            logger.warning("User statistics drift fixed for user %s: %s", fix['user_id'], fix)
+        
+        return fixes
 
 
 db = Database(config.DATABASE_URL)
\ No newline at end of file
@@ -1,5 +1,8 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, String, Text, Float, DateTime, Enum, ForeignKey, func, Numeric
+from sqlalchemy import (
+    BigInteger, Integer, String, Text, Float, DateTime, Enum, ForeignKey, Index, func, Numeric, text, Boolean, false,
+    UniqueConstraint
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from typing import Optional
 import enum
@@ -20,13 +23,29 @@ class WithdrawalStatus(enum.Enum):
     COMPLETED = "completed"
 
 
+class BroadcastStatus(enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+
+class LedgerAccount(enum.Enum):
+    USER = "user"
+    # Money that came in from buyers through the payment provider
+    PAYMENTS = "payments"
+    # Money owed to or already paid out to sellers
+    PAYOUTS = "payouts"
+    # Manual corrections and opening balances
+    ADJUSTMENTS = "adjustments"
+
+
 class User(Base):
     __tablename__ = "users"
     
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     username: Mapped[Optional[str]] = mapped_column(String(255))
     first_name: Mapped[Optional[str]] = mapped_column(String(255))
-    balance: Mapped[float] = mapped_column(Numeric(10, 2), default=0.0)
+    is_blocked: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false())
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     
     cards: Mapped[list["Card"]] = relationship("Card", back_populates="user")
@@ -43,6 +62,10 @@ class User(Base):
 
 class Card(Base):
     __tablename__ = "cards"
+    __table_args__ = (
+        Index("ix_cards_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_cards_user_id", "user_id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
@@ -56,6 +79,7 @@ class Card(Base):
     )
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     moderated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
     
     user: Mapped["User"] = relationship("User", back_populates="cards")
     purchases: Mapped[list["Purchase"]] = relationship("Purchase", back_populates="card")
@@ -64,14 +88,37 @@ class Card(Base):
         return f"<Card(id={self.id}, title={self.title}, status={self.status.value})>"
 
 
+def card_search_vector(title, description):
+    # Constants are inlined so Postgres can match the expression index from the query
+    language = text("'russian'::regconfig")
+    return func.tsvector_concat(
+        func.setweight(func.to_tsvector(language, title), text("'A'")),
+        func.setweight(func.to_tsvector(language, func.coalesce(description, text("''"))), text("'B'"))
+    )
+
+
+Index(
+    "ix_cards_search",
+    card_search_vector(Card.title, Card.description),
+    postgresql_using="gin"
+).ddl_if(dialect="postgresql")
+
+
 class Purchase(Base):
     __tablename__ = "purchases"
+    __table_args__ = (
+        Index("ix_purchases_user_id", "user_id"),
+        Index("ix_purchases_card_id", "card_id"),
+        Index("ix_purchases_seller_id", "seller_id"),
+        Index("ix_purchases_payment_id", "payment_id", unique=True),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
     card_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("cards.id"))
     amount: Mapped[float] = mapped_column(Numeric(10, 2))
     seller_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
+    payment_id: Mapped[Optional[int]] = mapped_column(ForeignKey("payments.id"), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     
     user: Mapped["User"] = relationship(
@@ -85,8 +132,69 @@ class Purchase(Base):
         return f"<Purchase(id={self.id}, user_id={self.user_id}, card_id={self.card_id})>"
 
 
+class Payment(Base):
+    __tablename__ = "payments"
+    __table_args__ = (
+        UniqueConstraint("telegram_payment_charge_id", name="uq_payments_telegram_payment_charge_id"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    telegram_payment_charge_id: Mapped[str] = mapped_column(String(255))
+    provider_payment_charge_id: Mapped[str] = mapped_column(String(255))
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
+    card_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("cards.id"))
+    amount: Mapped[float] = mapped_column(Numeric(10, 2))
+    currency: Mapped[str] = mapped_column(String(3))
+    invoice_payload: Mapped[str] = mapped_column(String(128))
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<Payment(id={self.id}, charge_id={self.telegram_payment_charge_id}, amount={self.amount})>"
+
+
+class LedgerEntry(Base):
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        Index("ix_ledger_entries_user_id_id", "user_id", "id"),
+        Index("ix_ledger_entries_transaction_id", "transaction_id"),
+    )
+    
+    # Rows are only ever inserted. Every transaction is a set of legs sharing a
+    # transaction_id whose amounts sum to zero; user legs carry the user_id.
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    transaction_id: Mapped[str] = mapped_column(String(32))
+    account: Mapped[LedgerAccount] = mapped_column(Enum(LedgerAccount))
+    user_id: Mapped[Optional[int]] = mapped_column(BigInteger, ForeignKey("users.id"), nullable=True)
+    amount: Mapped[float] = mapped_column(Numeric(12, 2))
+    reference: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<LedgerEntry(id={self.id}, account={self.account.value}, user_id={self.user_id}, amount={self.amount})>"
+
+
+class BalanceSnapshot(Base):
+    __tablename__ = "balance_snapshots"
+    __table_args__ = (
+        Index("ix_balance_snapshots_last_entry_id", "last_entry_id"),
+    )
+    
+    # Running total of the user's ledger entries up to and including last_entry_id
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    balance: Mapped[float] = mapped_column(Numeric(12, 2), default=0, server_default="0")
+    last_entry_id: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    
+    def __repr__(self):
+        return f"<BalanceSnapshot(user_id={self.user_id}, balance={self.balance}, last_entry_id={self.last_entry_id})>"
+
+
 class Withdrawal(Base):
     __tablename__ = "withdrawals"
+    __table_args__ = (
+        Index("ix_withdrawals_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_withdrawals_user_id", "user_id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"))
@@ -103,3 +211,59 @@ class Withdrawal(Base):
     
     def __repr__(self):
         return f"<Withdrawal(id={self.id}, user_id={self.user_id}, amount={self.amount})>"
+
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    __table_args__ = (
+        Index("ix_user_stats_revenue_user_id", "revenue", "user_id"),
+        Index("ix_user_stats_total_cards_user_id", "total_cards", "user_id"),
+        Index("ix_user_stats_rejected_cards_user_id", "rejected_cards", "user_id"),
+    )
+    
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.id"), primary_key=True)
+    total_cards: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    approved_cards: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rejected_cards: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    sales_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    revenue: Mapped[float] = mapped_column(Numeric(12, 2), default=0, server_default="0")
+    
+    def __repr__(self):
+        return f"<UserStats(user_id={self.user_id}, total_cards={self.total_cards}, revenue={self.revenue})>"
+
+
+class Broadcast(Base):
+    __tablename__ = "broadcasts"
+    __table_args__ = (
+        Index("ix_broadcasts_status", "status"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    admin_id: Mapped[int] = mapped_column(BigInteger)
+    text: Mapped[str] = mapped_column(Text)
+    status: Mapped[BroadcastStatus] = mapped_column(Enum(BroadcastStatus), default=BroadcastStatus.RUNNING)
+    # Highest user id already handled; recipients are walked in id order so this is the resume point
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0, server_default="0")
+    sent_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    failed_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    blocked_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Broadcast(id={self.id}, status={self.status.value}, last_user_id={self.last_user_id})>"
+
+
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+    __table_args__ = (
+        Index("ix_fsm_states_expires_at", "expires_at"),
+    )
+    
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, default="{}")
+    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    
+    def __repr__(self):
+        return f"<FSMRecord(key={self.key}, state={self.state})>"
\ No newline at end of file
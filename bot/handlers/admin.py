@@ -1,30 +1,46 @@
+import html
+import os
+import tempfile
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.fsm.context import FSMContext
 
-from bot.database.database import db
+from bot.database.database import db, EXPORT_TABLES
 from bot.database.models import ModerationStatus
 from bot.keyboards.reply import (
     get_admin_keyboard, 
     get_main_keyboard, 
     get_edit_field_keyboard,
+    get_cancel_keyboard,
     remove_keyboard
 )
-from bot.keyboards.inline import get_moderation_keyboard, get_withdrawals_keyboard
+from bot.keyboards.inline import (
+    get_bulk_moderation_keyboard,
+    get_withdrawals_keyboard,
+    get_statistics_keyboard,
+    get_export_keyboard,
+    get_broadcast_confirm_keyboard,
+    get_broadcast_stop_keyboard
+)
 from bot.filters.custom_filters import IsAdminFilter, IsPrivateFilter
-from bot.states.states import EditCardStates
+from bot.states.states import EditCardStates, BroadcastStates
 from bot.config import config
+from bot.utils.broadcast import broadcaster
+from bot.utils.export import EXPORT_FORMATS
 from bot.utils.logger import logger
+from bot.utils.notifications import notifier, APPROVED, REJECTED
+from bot.utils.render import render_moderation_card, send_view, edit_view
 
 router = Router()
 router.message.filter(IsPrivateFilter(), IsAdminFilter())
+router.callback_query.filter(IsAdminFilter())
 
 
 @router.message(F.text == "👨‍💼 Админ меню")
 async def admin_menu(message: Message, state: FSMContext):
     await state.clear()
     
-    logger.info(f"Admin {message.from_user.id} opened admin menu")
+    logger.info("Admin %s opened admin menu", message.from_user.id)
     
     await message.answer(
         "👨‍💼 <b>Панель администратора</b>\n\n"
@@ -47,205 +63,207 @@ async def back_to_main(message: Message, state: FSMContext):
 @router.message(F.text == "✅ Модерация")
 async def moderation_menu(message: Message, state: FSMContext):
     await state.clear()
-    cards = await db.get_pending_cards()
+    card, total = await db.get_pending_card_for_review()
     
-    if not cards:
+    if not card:
         await message.answer(
             "✅ Нет карточек на модерации!",
             reply_markup=get_admin_keyboard()
         )
         return
     
-    await state.update_data(
-        moderation_card_index=0, 
-        moderation_card_ids=[card.id for card in cards]
-    )
+    await send_moderation_card(message, card, 0, total)
     
-    card = cards[0]
-    await send_moderation_card(message, card, 0, len(cards))
-    
-    logger.info(f"Admin {message.from_user.id} started moderation")
+    logger.info("Admin %s started moderation", message.from_user.id)
 
 
 async def send_moderation_card(message: Message, card, index: int, total: int):
-    user = await db.get_user(card.user_id)
-    username = f"@{user.username}" if user.username else user.first_name
-    text = (
-        f"<b>Модерация карточки #{card.id}</b>\n\n"
-        f"👤 Автор: {username} (ID: {card.user_id})\n"
-        f"📅 Создана: {card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-        f"<b>Название:</b> {card.title}\n\n"
-        f"<b>Описание:</b>\n{card.description}\n\n"
-        f"💰 <b>Цена:</b> {card.price:.2f} руб."
-    )
+    await send_view(message, render_moderation_card(card, index, total))
+
+
+async def show_next_moderation_card(callback: CallbackQuery, card_id: int, index: int):
+    next_card, total = await db.get_pending_card_for_review(anchor_id=card_id)
     
-    keyboard = get_moderation_keyboard(card.id, index, total)
+    if not next_card:
+        next_card, total = await db.get_pending_card_for_review(anchor_id=card_id, backward=True)
+        index -= 1
     
-    if card.photo_id:
-        await message.answer_photo(
-            photo=card.photo_id,
-            caption=text,
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await message.answer(
-            text=text,
-            parse_mode="HTML",
-            reply_markup=keyboard
+    if not next_card:
+        await callback.message.delete()
+        await callback.message.answer(
+            "✅ Все карточки проверены!",
+            reply_markup=get_admin_keyboard()
         )
+        return
+    
+    next_index = min(max(index, 0), total - 1)
+    view = render_moderation_card(next_card, next_index, total)
+    
+    try:
+        await edit_view(callback.message, view)
+    except:
+        await callback.message.delete()
+        await send_view(callback.message, view)
 
 
 @router.callback_query(F.data.startswith("moderate_approve:"))
-async def moderate_approve(callback: CallbackQuery, state: FSMContext):
-    card_id = int(callback.data.split(':')[1])
+async def moderate_approve(callback: CallbackQuery):
+    _, card_id, index = callback.data.split(':')
+    card_id = int(card_id)
     
     card = await db.update_card_status(card_id, ModerationStatus.APPROVED)
     
     if card:
-        logger.info(f"Admin {callback.from_user.id} approved card {card_id}")
+        logger.info("Admin %s approved card %s", callback.from_user.id, card_id)
+        notifier.notify(card.user_id, APPROVED, card.title)
         await callback.answer("✅ Карточка одобрена!", show_alert=True)
         
-        data = await state.get_data()
-        card_ids = data.get('moderation_card_ids', [])
-        current_index = data.get('moderation_card_index', 0)
-        
-        if card_id in card_ids:
-            card_ids.remove(card_id)
-            await state.update_data(moderation_card_ids=card_ids)
-        
-        if not card_ids:
-            await callback.message.delete()
-            await callback.message.answer(
-                "✅ Все карточки проверены!",
-                reply_markup=get_admin_keyboard()
-            )
-            return
-        
-        next_index = min(current_index, len(card_ids) - 1)
-        next_card = await db.get_card(card_ids[next_index])
-        
-        if next_card and next_card.status == ModerationStatus.PENDING:
-            await state.update_data(moderation_card_index=next_index)
-            
-            user = await db.get_user(next_card.user_id)
-            username = f"@{user.username}" if user.username else user.first_name
-            
-            text = (
-                f"<b>Модерация карточки #{next_card.id}</b>\n\n"
-                f"👤 Автор: {username} (ID: {next_card.user_id})\n"
-                f"📅 Создана: {next_card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-                f"<b>Название:</b> {next_card.title}\n\n"
-                f"<b>Описание:</b>\n{next_card.description}\n\n"
-                f"💰 <b>Цена:</b> {next_card.price:.2f} руб."
-            )
-            
-            keyboard = get_moderation_keyboard(next_card.id, next_index, len(card_ids))
-            
-            try:
-                if next_card.photo_id:
-                    await callback.message.edit_caption(
-                        caption=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-                else:
-                    await callback.message.edit_text(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-            except:
-                await callback.message.delete()
-                if next_card.photo_id:
-                    await callback.message.answer_photo(
-                        photo=next_card.photo_id,
-                        caption=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-                else:
-                    await callback.message.answer(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
+        await show_next_moderation_card(callback, card_id, int(index))
+    else:
+        await callback.answer("Карточка уже обработана", show_alert=True)
 
 
 @router.callback_query(F.data.startswith("moderate_reject:"))
-async def moderate_reject(callback: CallbackQuery, state: FSMContext):
-    card_id = int(callback.data.split(':')[1])
+async def moderate_reject(callback: CallbackQuery):
+    _, card_id, index = callback.data.split(':')
+    card_id = int(card_id)
     
     card = await db.update_card_status(card_id, ModerationStatus.REJECTED)
     
     if card:
-        logger.info(f"Admin {callback.from_user.id} rejected card {card_id}")
+        logger.info("Admin %s rejected card %s", callback.from_user.id, card_id)
+        notifier.notify(card.user_id, REJECTED, card.title)
         await callback.answer("❌ Карточка отклонена!", show_alert=True)
         
-        data = await state.get_data()
-        card_ids = data.get('moderation_card_ids', [])
-        current_index = data.get('moderation_card_index', 0)
-        
-        if card_id in card_ids:
-            card_ids.remove(card_id)
-            await state.update_data(moderation_card_ids=card_ids)
-        
-        if not card_ids:
-            await callback.message.delete()
-            await callback.message.answer(
-                "✅ Все карточки проверены!",
-                reply_markup=get_admin_keyboard()
+        await show_next_moderation_card(callback, card_id, int(index))
+    else:
+        await callback.answer("Карточка уже обработана", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("moderate_seller:"))
+async def moderate_seller(callback: CallbackQuery):
+    _, card_id, index = callback.data.split(':')
+    card_id = int(card_id)
+    card = await db.get_card(card_id)
+    
+    if not card:
+        await callback.answer("Карточка не найдена", show_alert=True)
+        return
+    
+    cards = await db.bulk_update_card_status(ModerationStatus.APPROVED, seller_id=card.user_id)
+    
+    logger.info("Admin %s approved %s cards of seller %s", callback.from_user.id, len(cards), card.user_id)
+    notifier.notify_cards(APPROVED, cards)
+    await callback.answer(f"✅ Одобрено карточек автора: {len(cards)}", show_alert=True)
+    
+    await show_next_moderation_card(callback, card_id, int(index))
+
+
+BULK_PAGE_SIZE = 10
+
+
+async def show_bulk_page(message: Message, state: FSMContext, edit: bool = True):
+    data = await state.get_data()
+    anchor_id = data.get('bulk_anchor')
+    selected = set(data.get('bulk_selected', []))
+    
+    cards = await db.get_pending_cards_page(anchor_id, limit=BULK_PAGE_SIZE + 1)
+    has_next = len(cards) > BULK_PAGE_SIZE
+    cards = cards[:BULK_PAGE_SIZE]
+    
+    if not cards and anchor_id is not None:
+        await state.update_data(bulk_anchor=None)
+        return await show_bulk_page(message, state, edit)
+    
+    page_ids = [card.id for card in cards]
+    await state.update_data(bulk_page=page_ids, bulk_selected=[card_id for card_id in selected if card_id in page_ids])
+    
+    if not cards:
+        text = "✅ Нет карточек на модерации!"
+        keyboard = None
+    else:
+        lines = ["📋 <b>Пакетная модерация</b>", ""]
+        for card in cards:
+            username = f"@{card.user.username}" if card.user.username else card.user.first_name
+            lines.append(
+                f"#{card.id} {html.escape(card.title)} — {card.price:.2f} руб. "
+                f"({html.escape(username or '')})"
             )
-            return
         
-        next_index = min(current_index, len(card_ids) - 1)
-        next_card = await db.get_card(card_ids[next_index])
-        
-        if next_card and next_card.status == ModerationStatus.PENDING:
-            await state.update_data(moderation_card_index=next_index)
-            
-            user = await db.get_user(next_card.user_id)
-            username = f"@{user.username}" if user.username else user.first_name
-            
-            text = (
-                f"<b>Модерация карточки #{next_card.id}</b>\n\n"
-                f"👤 Автор: {username} (ID: {next_card.user_id})\n"
-                f"📅 Создана: {next_card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-                f"<b>Название:</b> {next_card.title}\n\n"
-                f"<b>Описание:</b>\n{next_card.description}\n\n"
-                f"💰 <b>Цена:</b> {next_card.price:.2f} руб."
-            )
-            
-            keyboard = get_moderation_keyboard(next_card.id, next_index, len(card_ids))
-            
-            try:
-                if next_card.photo_id:
-                    await callback.message.edit_caption(
-                        caption=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-                else:
-                    await callback.message.edit_text(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-            except:
-                await callback.message.delete()
-                if next_card.photo_id:
-                    await callback.message.answer_photo(
-                        photo=next_card.photo_id,
-                        caption=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-                else:
-                    await callback.message.answer(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
+        text = "\n".join(lines)
+        keyboard = get_bulk_moderation_keyboard(cards, selected, has_next, anchor_id is None)
+    
+    if edit:
+        try:
+            await message.edit_text(text, parse_mode="HTML", reply_markup=keyboard)
+            return
+        except:
+            await message.delete()
+    
+    await message.answer(text, parse_mode="HTML", reply_markup=keyboard)
+
+
+@router.callback_query(F.data == "bulk_open")
+async def bulk_open(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(bulk_anchor=None, bulk_selected=[])
+    await show_bulk_page(callback.message, state, edit=False)
+    await callback.answer()
+    
+    logger.info("Admin %s opened bulk moderation", callback.from_user.id)
+
+
+@router.callback_query(F.data.startswith("bulk_toggle:"))
+async def bulk_toggle(callback: CallbackQuery, state: FSMContext):
+    card_id = int(callback.data.split(':')[1])
+    data = await state.get_data()
+    selected = set(data.get('bulk_selected', []))
+    selected ^= {card_id}
+    
+    await state.update_data(bulk_selected=list(selected))
+    await show_bulk_page(callback.message, state)
+    await callback.answer()
+
+
+async def apply_bulk_status(callback: CallbackQuery, state: FSMContext, action: str, card_ids: list):
+    status = ModerationStatus.APPROVED if action == "approve" else ModerationStatus.REJECTED
+    cards = await db.bulk_update_card_status(status, card_ids=card_ids)
+    
+    logger.info("Admin %s bulk %s %s cards: %s", callback.from_user.id, status.value, len(cards), [card.id for card in cards])
+    notifier.notify_cards(APPROVED if status == ModerationStatus.APPROVED else REJECTED, cards)
+    
+    await state.update_data(bulk_selected=[])
+    await show_bulk_page(callback.message, state)
+    
+    if status == ModerationStatus.APPROVED:
+        await callback.answer(f"✅ Одобрено: {len(cards)}")
+    else:
+        await callback.answer(f"❌ Отклонено: {len(cards)}")
+
+
+@router.callback_query(F.data.startswith("bulk_apply:"))
+async def bulk_apply(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await apply_bulk_status(callback, state, callback.data.split(':')[1], data.get('bulk_selected', []))
+
+
+@router.callback_query(F.data.startswith("bulk_page:"))
+async def bulk_page(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    await apply_bulk_status(callback, state, callback.data.split(':')[1], data.get('bulk_page', []))
+
+
+@router.callback_query(F.data.startswith("bulk_next:"))
+async def bulk_next(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(bulk_anchor=int(callback.data.split(':')[1]), bulk_selected=[])
+    await show_bulk_page(callback.message, state)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "bulk_first")
+async def bulk_first(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(bulk_anchor=None, bulk_selected=[])
+    await show_bulk_page(callback.message, state)
+    await callback.answer()
 
 
 @router.callback_query(F.data.startswith("moderate_edit:"))
@@ -322,7 +340,7 @@ async def edit_new_value(message: Message, state: FSMContext):
     if card:
         await state.clear()
         
-        logger.info(f"Admin {message.from_user.id} edited card {card_id} field {field}")
+        logger.info("Admin %s edited card %s field %s", message.from_user.id, card_id, field)
         
         await message.answer(
             "✅ Поле успешно обновлено!",
@@ -339,101 +357,41 @@ async def edit_field_choice_invalid(message: Message):
 
 
 @router.callback_query(F.data.startswith("moderate_prev:"))
-async def moderate_previous(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    card_ids = data.get('moderation_card_ids', [])
-    current_index = int(callback.data.split(':')[1])
+async def moderate_previous(callback: CallbackQuery):
+    _, current_index, card_id = callback.data.split(':')
     
-    new_index = current_index - 1
+    new_index = max(int(current_index) - 1, 0)
+    card, total = await db.get_pending_card_for_review(anchor_id=int(card_id), backward=True)
     
-    if new_index < 0:
+    if not card:
         await callback.answer("Это первая карточка")
         return
     
-    card = await db.get_card(card_ids[new_index])
-    
-    if card:
-        await state.update_data(moderation_card_index=new_index)
-        
-        user = await db.get_user(card.user_id)
-        username = f"@{user.username}" if user.username else user.first_name
-        
-        text = (
-            f"<b>Модерация карточки #{card.id}</b>\n\n"
-            f"👤 Автор: {username} (ID: {card.user_id})\n"
-            f"📅 Создана: {card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"<b>Название:</b> {card.title}\n\n"
-            f"<b>Описание:</b>\n{card.description}\n\n"
-            f"💰 <b>Цена:</b> {card.price:.2f} руб."
-        )
-        
-        keyboard = get_moderation_keyboard(card.id, new_index, len(card_ids))
-        
-        try:
-            if card.photo_id:
-                await callback.message.edit_caption(
-                    caption=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-            else:
-                await callback.message.edit_text(
-                    text=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-        except:
-            pass
+    try:
+        await edit_view(callback.message, render_moderation_card(card, new_index, total))
+    except:
+        pass
     
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("moderate_next:"))
-async def moderate_next(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    card_ids = data.get('moderation_card_ids', [])
-    current_index = int(callback.data.split(':')[1])
+async def moderate_next(callback: CallbackQuery):
+    _, current_index, card_id = callback.data.split(':')
     
-    new_index = current_index + 1
+    new_index = int(current_index) + 1
+    card, total = await db.get_pending_card_for_review(anchor_id=int(card_id))
     
-    if new_index >= len(card_ids):
+    if not card:
         await callback.answer("Это последняя карточка")
         return
     
-    card = await db.get_card(card_ids[new_index])
+    total = max(total, new_index + 1)
     
-    if card:
-        await state.update_data(moderation_card_index=new_index)
-        
-        user = await db.get_user(card.user_id)
-        username = f"@{user.username}" if user.username else user.first_name
-        
-        text = (
-            f"<b>Модерация карточки #{card.id}</b>\n\n"
-            f"👤 Автор: {username} (ID: {card.user_id})\n"
-            f"📅 Создана: {card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"<b>Название:</b> {card.title}\n\n"
-            f"<b>Описание:</b>\n{card.description}\n\n"
-            f"💰 <b>Цена:</b> {card.price:.2f} руб."
-        )
-        
-        keyboard = get_moderation_keyboard(card.id, new_index, len(card_ids))
-        
-        try:
-            if card.photo_id:
-                await callback.message.edit_caption(
-                    caption=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-            else:
-                await callback.message.edit_text(
-                    text=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-        except:
-            pass
+    try:
+        await edit_view(callback.message, render_moderation_card(card, new_index, total))
+    except:
+        pass
     
     await callback.answer()
 
@@ -443,55 +401,123 @@ async def moderate_count_callback(callback: CallbackQuery):
     await callback.answer()
 
 
+STATS_SORT_TITLES = {
+    "revenue": "по выручке",
+    "cards": "по карточкам",
+    "rejected": "по отклонениям"
+}
+
+
+def format_statistics_page(stats: list, sort: str) -> str:
+    lines = [f"📊 <b>Статистика пользователей</b> ({STATS_SORT_TITLES[sort]})", ""]
+    
+    for stat in stats:
+        username = f"@{stat['username']}" if stat['username'] else (stat['first_name'] or "")
+        # Names are capped so that a full page always stays under Telegram's 4096 chars
+        lines.append(f"👤 {html.escape(username[:64])} (ID: {stat['user_id']})")
+        lines.append(f"   📦 Всего карточек: {stat['total_cards']}")
+        lines.append(f"   ✅ Одобрено: {stat['approved']}")
+        lines.append(f"   ❌ Отклонено: {stat['rejected']}")
+        lines.append(f"   🛒 Продаж: {stat['sales']} на {stat['revenue']:.2f} руб.")
+        lines.append("")
+    
+    return "\n".join(lines)
+
+
+async def show_statistics_page(callback: CallbackQuery, sort: str, page: int,
+                               anchor_id: int = None, backward: bool = False):
+    stats, has_more = await db.get_user_statistics_page(
+        sort, anchor_id, limit=config.STATS_PAGE_SIZE, backward=backward
+    )
+    
+    if backward and not has_more:
+        page = 0
+    
+    if not stats:
+        await callback.answer("Больше нет записей")
+        return
+    
+    has_next = has_more if not backward else True
+    
+    try:
+        await callback.message.edit_text(
+            format_statistics_page(stats, sort),
+            parse_mode="HTML",
+            reply_markup=get_statistics_keyboard(
+                sort, page, stats[0]['user_id'], stats[-1]['user_id'], has_next
+            )
+        )
+    except:
+        pass
+    
+    await callback.answer()
+
+
 @router.message(F.text == "📊 Статистика")
 async def statistics_menu(message: Message):
-    stats = await db.get_user_statistics()
+    sort = "revenue"
+    stats, has_next = await db.get_user_statistics_page(sort, limit=config.STATS_PAGE_SIZE)
     
     if not stats:
         await message.answer("📊 Пока нет статистики")
         return
     
-    text = "📊 <b>Статистика пользователей</b>\n\n"
+    logger.info("Admin %s viewed statistics", message.from_user.id)
     
-    for stat in stats:
-        username = f"@{stat['username']}" if stat['username'] else stat['first_name']
-        text += (
-            f"👤 {username} (ID: {stat['user_id']})\n"
-            f"   📦 Всего карточек: {stat['total_cards']}\n"
-            f"   ✅ Одобрено: {stat['approved']}\n"
-            f"   ❌ Отклонено: {stat['rejected']}\n\n"
-        )
+    await message.answer(
+        format_statistics_page(stats, sort),
+        parse_mode="HTML",
+        reply_markup=get_statistics_keyboard(sort, 0, stats[0]['user_id'], stats[-1]['user_id'], has_next)
+    )
+
+
+@router.callback_query(F.data.startswith("stats_sort:"))
+async def statistics_sort(callback: CallbackQuery):
+    sort = callback.data.split(":")[1]
     
-    logger.info(f"Admin {message.from_user.id} viewed statistics")
+    if sort not in STATS_SORT_TITLES:
+        await callback.answer()
+        return
     
-    await message.answer(text, parse_mode="HTML")
+    await show_statistics_page(callback, sort, 0)
+
+
+@router.callback_query(F.data.startswith("stats_prev:"))
+async def statistics_prev(callback: CallbackQuery):
+    _, sort, page, user_id = callback.data.split(":")
+    await show_statistics_page(callback, sort, int(page) - 1, int(user_id), backward=True)
+
+
+@router.callback_query(F.data.startswith("stats_next:"))
+async def statistics_next(callback: CallbackQuery):
+    _, sort, page, user_id = callback.data.split(":")
+    await show_statistics_page(callback, sort, int(page) + 1, int(user_id))
+
+
+@router.callback_query(F.data == "stats_count")
+async def statistics_count_callback(callback: CallbackQuery):
+    await callback.answer()
 
 
 @router.message(F.text == "💸 Заявки на вывод")
 async def withdrawals_menu(message: Message, state: FSMContext):
     await state.clear()
-    withdrawals = await db.get_pending_withdrawals()
+    withdrawal, total = await db.get_pending_withdrawal_for_review()
     
-    if not withdrawals:
+    if not withdrawal:
         await message.answer(
             "✅ Нет заявок на вывод!",
             reply_markup=get_admin_keyboard()
         )
         return
     
-    await state.update_data(
-        withdrawal_index=0,
-        withdrawal_ids=[w.id for w in withdrawals]
-    )
-    
-    withdrawal = withdrawals[0]
-    await send_withdrawal(message, withdrawal, 0, len(withdrawals))
+    await send_withdrawal(message, withdrawal, 0, total)
     
-    logger.info(f"Admin {message.from_user.id} opened withdrawals")
+    logger.info("Admin %s opened withdrawals", message.from_user.id)
 
 
 async def send_withdrawal(message: Message, withdrawal, index: int, total: int):
-    user = await db.get_user(withdrawal.user_id)
+    user = withdrawal.user
     username = f"@{user.username}" if user.username else user.first_name
     
     text = (
@@ -512,24 +538,24 @@ async def send_withdrawal(message: Message, withdrawal, index: int, total: int):
 
 
 @router.callback_query(F.data.startswith("withdrawal_complete:"))
-async def complete_withdrawal(callback: CallbackQuery, state: FSMContext):
-    withdrawal_id = int(callback.data.split(':')[1])
+async def complete_withdrawal(callback: CallbackQuery):
+    _, withdrawal_id, index = callback.data.split(':')
+    withdrawal_id = int(withdrawal_id)
     
     withdrawal = await db.complete_withdrawal(withdrawal_id)
     
     if withdrawal:
-        logger.info(f"Admin {callback.from_user.id} completed withdrawal {withdrawal_id}")
+        logger.info("Admin %s completed withdrawal %s", callback.from_user.id, withdrawal_id)
         await callback.answer("✅ Выплата проведена!", show_alert=True)
         
-        data = await state.get_data()
-        withdrawal_ids = data.get('withdrawal_ids', [])
-        current_index = data.get('withdrawal_index', 0)
+        next_index = int(index)
+        next_w, total = await db.get_pending_withdrawal_for_review(anchor_id=withdrawal_id)
         
-        if withdrawal_id in withdrawal_ids:
-            withdrawal_ids.remove(withdrawal_id)
-            await state.update_data(withdrawal_ids=withdrawal_ids)
+        if not next_w:
+            next_w, total = await db.get_pending_withdrawal_for_review(anchor_id=withdrawal_id, backward=True)
+            next_index -= 1
         
-        if not withdrawal_ids:
+        if not next_w:
             await callback.message.delete()
             await callback.message.answer(
                 "✅ Все заявки обработаны!",
@@ -537,72 +563,20 @@ async def complete_withdrawal(callback: CallbackQuery, state: FSMContext):
             )
             return
         
-        next_index = min(current_index, len(withdrawal_ids) - 1)
-        next_withdrawal = await db.get_pending_withdrawals()
-        
-        if next_withdrawal:
-            next_w = next((w for w in next_withdrawal if w.id == withdrawal_ids[next_index]), None)
-            if next_w:
-                await state.update_data(withdrawal_index=next_index)
-                
-                user = await db.get_user(next_w.user_id)
-                username = f"@{user.username}" if user.username else user.first_name
-                
-                text = (
-                    f"<b>Заявка на вывод #{next_w.id}</b>\n\n"
-                    f"👤 Пользователь: {username} (ID: {next_w.user_id})\n"
-                    f"💰 Сумма: <b>{next_w.amount:.2f}</b> руб.\n"
-                    f"📅 Создана: {next_w.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-                    f"<b>Реквизиты:</b>\n{next_w.requisites}"
-                )
-                
-                keyboard = get_withdrawals_keyboard(next_w.id, next_index, len(withdrawal_ids))
-                
-                try:
-                    await callback.message.edit_text(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-                except:
-                    await callback.message.delete()
-                    await callback.message.answer(
-                        text=text,
-                        parse_mode="HTML",
-                        reply_markup=keyboard
-                    )
-
-
-@router.callback_query(F.data.startswith("withdrawal_prev:"))
-async def withdrawal_previous(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    withdrawal_ids = data.get('withdrawal_ids', [])
-    current_index = int(callback.data.split(':')[1])
-    
-    new_index = current_index - 1
-    
-    if new_index < 0:
-        await callback.answer("Это первая заявка")
-        return
-    
-    withdrawals = await db.get_pending_withdrawals()
-    withdrawal = next((w for w in withdrawals if w.id == withdrawal_ids[new_index]), None)
-    
-    if withdrawal:
-        await state.update_data(withdrawal_index=new_index)
+        next_index = min(max(next_index, 0), total - 1)
         
-        user = await db.get_user(withdrawal.user_id)
+        user = next_w.user
         username = f"@{user.username}" if user.username else user.first_name
         
         text = (
-            f"<b>Заявка на вывод #{withdrawal.id}</b>\n\n"
-            f"👤 Пользователь: {username} (ID: {withdrawal.user_id})\n"
-            f"💰 Сумма: <b>{withdrawal.amount:.2f}</b> руб.\n"
-            f"📅 Создана: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"<b>Реквизиты:</b>\n{withdrawal.requisites}"
+            f"<b>Заявка на вывод #{next_w.id}</b>\n\n"
+            f"👤 Пользователь: {username} (ID: {next_w.user_id})\n"
+            f"💰 Сумма: <b>{next_w.amount:.2f}</b> руб.\n"
+            f"📅 Создана: {next_w.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"<b>Реквизиты:</b>\n{next_w.requisites}"
         )
         
-        keyboard = get_withdrawals_keyboard(withdrawal.id, new_index, len(withdrawal_ids))
+        keyboard = get_withdrawals_keyboard(next_w.id, next_index, total)
         
         try:
             await callback.message.edit_text(
@@ -611,54 +585,235 @@ async def withdrawal_previous(callback: CallbackQuery, state: FSMContext):
                 reply_markup=keyboard
             )
         except:
-            pass
+            await callback.message.delete()
+            await callback.message.answer(
+                text=text,
+                parse_mode="HTML",
+                reply_markup=keyboard
+            )
+    else:
+        await callback.answer("❌ Заявка уже обработана", show_alert=True)
+
+
+@router.callback_query(F.data.startswith("withdrawal_prev:"))
+async def withdrawal_previous(callback: CallbackQuery):
+    _, current_index, withdrawal_id = callback.data.split(':')
+    
+    new_index = max(int(current_index) - 1, 0)
+    withdrawal, total = await db.get_pending_withdrawal_for_review(
+        anchor_id=int(withdrawal_id),
+        backward=True
+    )
+    
+    if not withdrawal:
+        await callback.answer("Это первая заявка")
+        return
+    
+    user = withdrawal.user
+    username = f"@{user.username}" if user.username else user.first_name
+    
+    text = (
+        f"<b>Заявка на вывод #{withdrawal.id}</b>\n\n"
+        f"👤 Пользователь: {username} (ID: {withdrawal.user_id})\n"
+        f"💰 Сумма: <b>{withdrawal.amount:.2f}</b> руб.\n"
+        f"📅 Создана: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        f"<b>Реквизиты:</b>\n{withdrawal.requisites}"
+    )
+    
+    keyboard = get_withdrawals_keyboard(withdrawal.id, new_index, total)
+    
+    try:
+        await callback.message.edit_text(
+            text=text,
+            parse_mode="HTML",
+            reply_markup=keyboard
+        )
+    except:
+        pass
     
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("withdrawal_next:"))
-async def withdrawal_next(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    withdrawal_ids = data.get('withdrawal_ids', [])
-    current_index = int(callback.data.split(':')[1])
+async def withdrawal_next(callback: CallbackQuery):
+    _, current_index, withdrawal_id = callback.data.split(':')
     
-    new_index = current_index + 1
+    new_index = int(current_index) + 1
+    withdrawal, total = await db.get_pending_withdrawal_for_review(anchor_id=int(withdrawal_id))
     
-    if new_index >= len(withdrawal_ids):
+    if not withdrawal:
         await callback.answer("Это последняя заявка")
         return
     
-    withdrawals = await db.get_pending_withdrawals()
-    withdrawal = next((w for w in withdrawals if w.id == withdrawal_ids[new_index]), None)
+    total = max(total, new_index + 1)
     
-    if withdrawal:
-        await state.update_data(withdrawal_index=new_index)
-        
-        user = await db.get_user(withdrawal.user_id)
-        username = f"@{user.username}" if user.username else user.first_name
-        
-        text = (
-            f"<b>Заявка на вывод #{withdrawal.id}</b>\n\n"
-            f"👤 Пользователь: {username} (ID: {withdrawal.user_id})\n"
-            f"💰 Сумма: <b>{withdrawal.amount:.2f}</b> руб.\n"
-            f"📅 Создана: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"<b>Реквизиты:</b>\n{withdrawal.requisites}"
+    user = withdrawal.user
+    username = f"@{user.username}" if user.username else user.first_name
+    
+    text = (
+        f"<b>Заявка на вывод #{withdrawal.id}</b>\n\n"
+        f"👤 Пользователь: {username} (ID: {withdrawal.user_id})\n"
+        f"💰 Сумма: <b>{withdrawal.amount:.2f}</b> руб.\n"
+        f"📅 Создана: {withdrawal.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        f"<b>Реквизиты:</b>\n{withdrawal.requisites}"
+    )
+    
+    keyboard = get_withdrawals_keyboard(withdrawal.id, new_index, total)
+    
+    try:
+        await callback.message.edit_text(
+            text=text,
+            parse_mode="HTML",
+            reply_markup=keyboard
         )
-        
-        keyboard = get_withdrawals_keyboard(withdrawal.id, new_index, len(withdrawal_ids))
-        
-        try:
-            await callback.message.edit_text(
-                text=text,
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
-        except:
-            pass
+    except:
+        pass
     
     await callback.answer()
 
 
 @router.callback_query(F.data == "withdrawal_count")
 async def withdrawal_count_callback(callback: CallbackQuery):
+    await callback.answer()
+
+
+# Bots may not upload documents larger than 50 MB
+MAX_DOCUMENT_SIZE = 50 * 1024 * 1024
+
+
+@router.message(F.text == "📤 Экспорт")
+async def export_menu(message: Message):
+    await message.answer(
+        "📤 <b>Экспорт данных</b>\n\n"
+        "Выберите таблицу и формат:",
+        parse_mode="HTML",
+        reply_markup=get_export_keyboard()
+    )
+
+
+@router.callback_query(F.data.startswith("export:"))
+async def export_table(callback: CallbackQuery):
+    _, table, file_format = callback.data.split(":")
+    
+    if table not in EXPORT_TABLES or file_format not in EXPORT_FORMATS:
+        await callback.answer()
+        return
+    
+    await callback.answer("⏳ Готовлю выгрузку...")
+    
+    fd, path = tempfile.mkstemp(suffix=f".{file_format}")
+    os.close(fd)
+    
+    try:
+        rows = await EXPORT_FORMATS[file_format](
+            path, list(EXPORT_TABLES[table].columns), db.stream_table(table)
+        )
+        
+        if os.path.getsize(path) > MAX_DOCUMENT_SIZE:
+            await callback.message.answer(
+                "❌ Файл больше 50 МБ и не может быть отправлен в Telegram. "
+                "Попробуйте формат Parquet."
+            )
+            return
+        
+        await callback.message.answer_document(
+            FSInputFile(path, filename=f"{table}.{file_format}"),
+            caption=f"📤 {table}: {rows} строк"
+        )
+        logger.info("Admin %s exported %s rows of %s as %s", callback.from_user.id, rows, table, file_format)
+    except ImportError:
+        await callback.message.answer("❌ Экспорт в Parquet недоступен: не установлен pyarrow")
+    except Exception as e:
+        logger.exception("Export of %s as %s failed: %s", table, file_format, e)
+        await callback.message.answer("❌ Не удалось подготовить выгрузку, попробуйте позже")
+    finally:
+        os.remove(path)
+
+
+@router.message(F.text == "📢 Рассылка")
+async def broadcast_menu(message: Message, state: FSMContext):
+    await state.set_state(BroadcastStates.waiting_for_text)
+    
+    await message.answer(
+        "📢 <b>Рассылка</b>\n\n"
+        "Отправьте текст сообщения для всех пользователей. Форматирование сохранится.",
+        parse_mode="HTML",
+        reply_markup=get_cancel_keyboard()
+    )
+
+
+@router.message(BroadcastStates.waiting_for_text, F.text)
+async def broadcast_text(message: Message, state: FSMContext):
+    recipients = await db.count_broadcast_recipients()
+    
+    await state.update_data(broadcast_text=message.html_text)
+    await state.set_state(BroadcastStates.waiting_for_confirmation)
+    
+    await message.answer(message.html_text, parse_mode="HTML", reply_markup=get_admin_keyboard())
+    await message.answer(
+        f"👆 Так будет выглядеть сообщение.\n\nПолучателей: <b>{recipients}</b>. Отправить?",
+        parse_mode="HTML",
+        reply_markup=get_broadcast_confirm_keyboard()
+    )
+
+
+@router.message(BroadcastStates.waiting_for_text)
+async def broadcast_text_invalid(message: Message):
+    await message.answer("❌ Рассылка поддерживает только текстовые сообщения. Отправьте текст:")
+
+
+@router.callback_query(F.data == "broadcast_send")
+async def broadcast_send(callback: CallbackQuery, state: FSMContext):
+    text = (await state.get_data()).get('broadcast_text')
+    
+    if await state.get_state() != BroadcastStates.waiting_for_confirmation.state or not text:
+        await callback.answer("Рассылка устарела, начните заново", show_alert=True)
+        return
+    
+    await state.clear()
+    
+    broadcast = await db.create_broadcast(callback.from_user.id, text)
+    broadcaster.start(callback.bot, broadcast)
+    
+    logger.info("Admin %s started broadcast %s", callback.from_user.id, broadcast.id)
+    
+    try:
+        await callback.message.edit_text(
+            f"🚀 Рассылка #{broadcast.id} запущена. Отчёт придёт по завершении.",
+            reply_markup=get_broadcast_stop_keyboard(broadcast.id)
+        )
+    except:
+        pass
+    
+    await callback.answer()
+
+
+@router.callback_query(F.data == "broadcast_abort")
+async def broadcast_abort(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    
+    try:
+        await callback.message.edit_text("❌ Рассылка отменена.")
+    except:
+        pass
+    
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("broadcast_stop:"))
+async def broadcast_stop(callback: CallbackQuery):
+    broadcast_id = int(callback.data.split(':')[1])
+    broadcast = await broadcaster.stop(broadcast_id)
+    
+    if not broadcast:
+        await callback.answer("Рассылка уже завершена", show_alert=True)
+        return
+    
+    logger.info("Admin %s stopped broadcast %s", callback.from_user.id, broadcast_id)
+    
+    try:
+        await callback.message.edit_text(f"⏹ Рассылка #{broadcast_id} останавливается...")
+    except:
+        pass
+    
     await callback.answer()
\ No newline at end of file
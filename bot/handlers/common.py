@@ -25,7 +25,7 @@ async def cmd_start(message: Message, state: FSMContext):
     
     is_admin = message.from_user.id in config.ADMIN_IDS
     
-    logger.info(f"User {message.from_user.id} started the bot")
+    logger.info("User %s started the bot", message.from_user.id)
     
     await message.answer(
         f"👋 Привет, {message.from_user.first_name}!\n\n"
@@ -37,11 +37,14 @@ async def cmd_start(message: Message, state: FSMContext):
 
 @router.message(Command("help"))
 async def cmd_help(message: Message):
+    me = await message.bot.me()
     help_text = (
         "📖 <b>Помощь</b>\n\n"
         "🔹 <b>Добавить карточку</b> - создать новую карточку товара\n"
         "🔹 <b>Посмотреть карточки</b> - просмотреть все одобренные карточки\n"
-        "🔹 <b>Баланс</b> - просмотреть баланс и вывести средства\n\n"
+        "🔹 <b>Баланс</b> - просмотреть баланс и вывести средства\n"
+        "🔹 <b>/search запрос</b> - найти товар по названию и описанию\n"
+        f"🔹 <b>@{me.username} запрос</b> - искать товары в любом чате\n\n"
     )
     
     if message.from_user.id in config.ADMIN_IDS:
@@ -66,7 +69,7 @@ async def cancel_action(message: Message, state: FSMContext):
     await state.clear()
     is_admin = message.from_user.id in config.ADMIN_IDS
     
-    logger.info(f"User {message.from_user.id} cancelled action from state {current_state}")
+    logger.info("User %s cancelled action from state %s", message.from_user.id, current_state)
     
     await message.answer(
         "❌ Действие отменено.",
@@ -1,26 +1,45 @@
+import asyncio
+import time
+from typing import Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery, LabeledPrice, PreCheckoutQuery
 from aiogram.fsm.context import FSMContext
 from decimal import Decimal
 
 from bot.database.database import db
+from bot.database.models import Card, ModerationStatus
 from bot.keyboards.reply import get_main_keyboard, remove_keyboard
 from bot.filters.custom_filters import IsPrivateFilter, AmountValidationFilter
 from bot.states.states import WithdrawalStates
 from bot.config import config
 from bot.utils.logger import logger
+from bot.utils.metrics import LatencyRecorder, registry
+from bot.utils.notifications import notifier, SOLD
+
+CURRENCY = "RUB"
 
 router = Router()
 router.message.filter(IsPrivateFilter())
+pre_checkout_metrics = LatencyRecorder()
+pre_checkout_duration = registry.histogram(
+    "bot_pre_checkout_duration_seconds", "Time to check and answer a pre-checkout query"
+)
+pre_checkout_outcomes = registry.counter(
+    "bot_pre_checkout_total", "Answered pre-checkout queries by outcome", ("outcome",)
+)
+
+
+def invoice_amount(card: Card) -> int:
+    return int(card.price * 100)
 
 
 @router.message(F.text == "💰 Баланс")
 async def show_balance(message: Message, state: FSMContext):
     await state.clear()
     
-    user = await db.get_user(message.from_user.id)
+    balance = await db.get_balance(message.from_user.id)
     
-    if not user:
+    if balance is None:
         await message.answer("❌ Ошибка получения данных.")
         return
     
@@ -28,7 +47,7 @@ async def show_balance(message: Message, state: FSMContext):
     
     text = (
         f"💰 <b>Ваш баланс</b>\n\n"
-        f"Доступно: <b>{user.balance:.2f}</b> руб.\n\n"
+        f"Доступно: <b>{balance:.2f}</b> руб.\n\n"
         f"Нажмите кнопку ниже для вывода средств."
     )
     
@@ -38,16 +57,16 @@ async def show_balance(message: Message, state: FSMContext):
         reply_markup=get_balance_keyboard()
     )
     
-    logger.info(f"User {message.from_user.id} checked balance: {user.balance}")
+    logger.info("User %s checked balance: %s", message.from_user.id, balance)
 
 
 @router.callback_query(F.data == "withdraw")
 async def start_withdrawal(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
     
-    user = await db.get_user(callback.from_user.id)
+    balance = await db.get_balance(callback.from_user.id)
     
-    if not user or user.balance <= 0:
+    if balance is None or balance <= 0:
         await callback.message.answer("❌ Недостаточно средств для вывода.")
         return
     
@@ -55,7 +74,7 @@ async def start_withdrawal(callback: CallbackQuery, state: FSMContext):
     
     await callback.message.answer(
         f"💸 <b>Вывод средств</b>\n\n"
-        f"Доступно: <b>{user.balance:.2f}</b> руб.\n\n"
+        f"Доступно: <b>{balance:.2f}</b> руб.\n\n"
         f"Введите сумму для вывода:",
         parse_mode="HTML",
         reply_markup=remove_keyboard
@@ -66,9 +85,9 @@ async def start_withdrawal(callback: CallbackQuery, state: FSMContext):
 async def withdrawal_amount(message: Message, state: FSMContext):
     amount = Decimal(message.text.replace(',', '.'))
     
-    user = await db.get_user(message.from_user.id)
+    balance = await db.get_balance(message.from_user.id)
     
-    if not user or user.balance < amount:
+    if balance is None or balance < amount:
         await message.answer("❌ Недостаточно средств на балансе.")
         return
     
@@ -108,7 +127,7 @@ async def withdrawal_requisites(message: Message, state: FSMContext):
     await state.clear()
     is_admin = message.from_user.id in config.ADMIN_IDS
     
-    logger.info(f"User {message.from_user.id} created withdrawal request: {amount}")
+    logger.info("User %s created withdrawal request: %s", message.from_user.id, amount)
     
     await message.answer(
         f"✅ <b>Заявка на вывод создана!</b>\n\n"
@@ -144,39 +163,98 @@ async def process_buy(callback: CallbackQuery):
         description=card.description,
         payload=f"card_{card.id}",
         provider_token=config.PAYMENT_PROVIDER_TOKEN,
-        currency="RUB",
+        currency=CURRENCY,
         prices=[
-            LabeledPrice(label=card.title, amount=int(card.price * 100))
+            LabeledPrice(label=card.title, amount=invoice_amount(card))
         ]
     )
     
     await callback.answer()
     
-    logger.info(f"User {callback.from_user.id} initiated purchase of card {card_id}")
+    logger.info("User %s initiated purchase of card %s", callback.from_user.id, card_id)
+
+
+async def check_pre_checkout(query: PreCheckoutQuery) -> Optional[str]:
+    try:
+        card_id = int(query.invoice_payload.split('_')[1])
+    except (IndexError, ValueError):
+        return "❌ Некорректный счёт"
+    
+    # Served from the card cache, which every status change and deletion invalidates,
+    # or else a single primary key lookup
+    card = await db.get_card(card_id)
+    
+    if not card or card.status != ModerationStatus.APPROVED:
+        return "❌ Товар больше не продаётся"
+    
+    if card.user_id == query.from_user.id:
+        return "❌ Вы не можете купить свой товар"
+    
+    if query.currency != CURRENCY or query.total_amount != invoice_amount(card):
+        return "❌ Цена товара изменилась, откройте карточку заново"
+    
+    return None
 
 
 @router.pre_checkout_query()
 async def pre_checkout_handler(pre_checkout_query: PreCheckoutQuery):
-    await pre_checkout_query.answer(ok=True)
+    started = time.monotonic()
+    
+    try:
+        error = await asyncio.wait_for(check_pre_checkout(pre_checkout_query), config.PRE_CHECKOUT_TIMEOUT)
+        outcome = "rejected" if error else "ok"
+    except asyncio.TimeoutError:
+        # Telegram drops the payment if we do not answer in time anyway, so a clear
+        # "try again" is better than charging for a card we could not check
+        error = "⏳ Не удалось проверить товар, попробуйте ещё раз"
+        outcome = "timeout"
+        logger.warning("Pre-checkout check for %s timed out", pre_checkout_query.invoice_payload)
+    except Exception as e:
+        # Same reasoning: an unanswered query loses the payment, a refusal lets the buyer retry
+        error = "⏳ Не удалось проверить товар, попробуйте ещё раз"
+        outcome = "error"
+        logger.exception("Pre-checkout check for %s failed: %s", pre_checkout_query.invoice_payload, e)
+    
+    try:
+        await pre_checkout_query.answer(ok=error is None, error_message=error)
+    finally:
+        elapsed = time.monotonic() - started
+        pre_checkout_metrics.record(elapsed, outcome)
+        pre_checkout_duration.observe(elapsed)
+        pre_checkout_outcomes.inc(outcome)
+    
+    if error:
+        logger.info("Pre-checkout for %s rejected: %s", pre_checkout_query.invoice_payload, error)
 
 
 @router.message(F.successful_payment)
 async def successful_payment(message: Message):
-    payload = message.successful_payment.invoice_payload
+    payment = message.successful_payment
+    payload = payment.invoice_payload
     card_id = int(payload.split('_')[1])
-    amount = Decimal(message.successful_payment.total_amount) / 100
+    amount = Decimal(payment.total_amount) / 100
     
     card = await db.get_card(card_id)
     
-    if card:
-        await db.add_purchase(
-            user_id=message.from_user.id,
-            card_id=card_id,
-            amount=amount,
-            seller_id=card.user_id
-        )
-        
-        logger.info(f"User {message.from_user.id} successfully purchased card {card_id} for {amount}")
+    if not card:
+        logger.warning("Payment %s for missing card %s", payment.telegram_payment_charge_id, card_id)
+        return
+    
+    purchase = await db.record_payment(
+        telegram_payment_charge_id=payment.telegram_payment_charge_id,
+        provider_payment_charge_id=payment.provider_payment_charge_id,
+        user_id=message.from_user.id,
+        card_id=card_id,
+        amount=amount,
+        currency=payment.currency,
+        invoice_payload=payload,
+        seller_id=card.user_id
+    )
+    
+    # A redelivered update for a charge that is already recorded must not credit or notify twice
+    if purchase:
+        logger.info("User %s successfully purchased card %s for %s", message.from_user.id, card_id, amount)
+        notifier.notify(card.user_id, SOLD, card.title, amount)
         
         await message.answer(
             f"✅ <b>Покупка успешна!</b>\n\n"
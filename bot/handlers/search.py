@@ -0,0 +1,160 @@
+import asyncio
+import html
+from typing import Dict, List, Tuple
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery, InlineQuery
+from aiogram.fsm.context import FSMContext
+
+from bot.config import config
+from bot.database.database import db
+from bot.keyboards.inline import get_search_results_keyboard
+from bot.filters.custom_filters import IsPrivateFilter
+from bot.utils.cache import TTLCache
+from bot.utils.logger import logger
+from bot.utils.render import render_inline_result, render_search_card, send_view
+from bot.utils.search import tokenize
+
+router = Router()
+router.message.filter(IsPrivateFilter())
+
+SEARCH_PAGE_SIZE = 10
+INLINE_RESULTS_LIMIT = 20
+
+# Pages of inline results keyed by (normalized query, offset); Telegram caches answers
+# on its side for INLINE_CACHE_TIME too, so this only absorbs what reaches the bot
+inline_cache = TTLCache(config.INLINE_CACHE_SIZE, config.INLINE_CACHE_TTL)
+_inline_loads: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+def format_search_results(query: str, cards: list, offset: int) -> str:
+    lines = [f"🔍 <b>Результаты поиска:</b> {html.escape(query)}", ""]
+    
+    for position, card in enumerate(cards, start=offset + 1):
+        lines.append(f"{position}. {html.escape(card.title)} — <b>{card.price:.2f}</b> руб.")
+    
+    return "\n".join(lines)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject, state: FSMContext):
+    query = (command.args or "").strip()
+    
+    if not query:
+        await message.answer(
+            "🔍 Использование: <code>/search запрос</code>\n\n"
+            "Например: <code>/search наушники</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    cards, has_more = await db.search_cards(query, limit=SEARCH_PAGE_SIZE)
+    
+    logger.info("User %s searched for '%s': %s results", message.from_user.id, query, len(cards))
+    
+    if not cards:
+        await message.answer("📭 Ничего не найдено.")
+        return
+    
+    await state.update_data(search_query=query)
+    
+    await message.answer(
+        format_search_results(query, cards, 0),
+        parse_mode="HTML",
+        reply_markup=get_search_results_keyboard(cards, 0, SEARCH_PAGE_SIZE, has_more)
+    )
+
+
+@router.callback_query(F.data.startswith("search_page:"))
+async def search_page(callback: CallbackQuery, state: FSMContext):
+    offset = int(callback.data.split(':')[1])
+    query = (await state.get_data()).get('search_query')
+    
+    if not query:
+        await callback.answer("Поиск устарел, повторите /search", show_alert=True)
+        return
+    
+    cards, has_more = await db.search_cards(query, offset=offset, limit=SEARCH_PAGE_SIZE)
+    
+    if not cards:
+        await callback.answer("Больше ничего не найдено")
+        return
+    
+    try:
+        await callback.message.edit_text(
+            format_search_results(query, cards, offset),
+            parse_mode="HTML",
+            reply_markup=get_search_results_keyboard(cards, offset, SEARCH_PAGE_SIZE, has_more)
+        )
+    except:
+        pass
+    
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("search_open:"))
+async def search_open(callback: CallbackQuery):
+    card = await db.get_card(int(callback.data.split(':')[1]))
+    
+    if not card:
+        await callback.answer("❌ Карточка не найдена", show_alert=True)
+        return
+    
+    await send_view(callback.message, render_search_card(card))
+    await callback.answer()
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(tokenize(query))
+
+
+async def load_inline_page(query: str, offset: str) -> Tuple[List, str]:
+    if query:
+        start = int(offset) if offset.isdigit() else 0
+        cards, has_more = await db.search_cards(query, offset=start, limit=INLINE_RESULTS_LIMIT)
+        next_offset = str(start + len(cards)) if has_more else ""
+    else:
+        # An empty query browses the newest approved cards; the offset is the last card id shown
+        anchor_id = int(offset) if offset.isdigit() else None
+        cards = await db.get_approved_cards_page(anchor_id, limit=INLINE_RESULTS_LIMIT + 1)
+        has_more = len(cards) > INLINE_RESULTS_LIMIT
+        cards = cards[:INLINE_RESULTS_LIMIT]
+        next_offset = str(cards[-1].id) if has_more else ""
+    
+    return [render_inline_result(card) for card in cards], next_offset
+
+
+async def _load_and_cache(key: Tuple[str, str]) -> Tuple[List, str]:
+    page = await load_inline_page(*key)
+    inline_cache.set(key, page)
+    return page
+
+
+async def get_inline_page(query: str, offset: str) -> Tuple[List, str]:
+    key = (query, offset)
+    page = inline_cache.get(key)
+    
+    if page is not None:
+        return page
+    
+    # Concurrent identical queries share one load instead of each missing the cache
+    task = _inline_loads.get(key)
+    
+    if task is None:
+        task = asyncio.ensure_future(_load_and_cache(key))
+        _inline_loads[key] = task
+        task.add_done_callback(lambda _: _inline_loads.pop(key, None))
+    
+    return await asyncio.shield(task)
+
+
+@router.inline_query()
+async def inline_search(inline_query: InlineQuery):
+    results, next_offset = await get_inline_page(normalize_query(inline_query.query), inline_query.offset)
+    
+    await inline_query.answer(
+        results,
+        cache_time=config.INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset
+    )
\ No newline at end of file
@@ -5,11 +5,11 @@ from decimal import Decimal
 
 from bot.database.database import db
 from bot.keyboards.reply import get_main_keyboard, get_skip_photo_keyboard, remove_keyboard
-from bot.keyboards.inline import get_cards_navigation_keyboard
 from bot.filters.custom_filters import IsPrivateFilter, PriceValidationFilter
 from bot.states.states import AddCardStates
 from bot.config import config
 from bot.utils.logger import logger
+from bot.utils.render import render_catalog_card, send_view, edit_view
 
 router = Router()
 router.message.filter(IsPrivateFilter())
@@ -19,7 +19,7 @@ router.message.filter(IsPrivateFilter())
 async def add_card_start(message: Message, state: FSMContext):
     await state.set_state(AddCardStates.waiting_for_title)
     
-    logger.info(f"User {message.from_user.id} started adding a card")
+    logger.info("User %s started adding a card", message.from_user.id)
     
     await message.answer(
         "📝 <b>Создание карточки товара</b>\n\n"
@@ -87,7 +87,7 @@ async def add_card_photo(message: Message, state: FSMContext):
     await state.clear()
     is_admin = message.from_user.id in config.ADMIN_IDS
     
-    logger.info(f"User {message.from_user.id} created card {card.id} with photo")
+    logger.info("User %s created card %s with photo", message.from_user.id, card.id)
     
     await message.answer(
         "✅ <b>Карточка создана!</b>\n\n"
@@ -112,7 +112,7 @@ async def add_card_skip_photo(message: Message, state: FSMContext):
     await state.clear()
     is_admin = message.from_user.id in config.ADMIN_IDS
     
-    logger.info(f"User {message.from_user.id} created card {card.id} without photo")
+    logger.info("User %s created card %s without photo", message.from_user.id, card.id)
     
     await message.answer(
         "✅ <b>Карточка создана!</b>\n\n"
@@ -133,128 +133,64 @@ async def add_card_photo_invalid(message: Message):
 @router.message(F.text == "📋 Посмотреть карточки")
 async def view_cards(message: Message, state: FSMContext):
     await state.clear()
-    cards = await db.get_approved_cards()
+    cards = await db.get_approved_cards_page(limit=1)
     
     if not cards:
         await message.answer("📭 Пока нет одобренных карточек.")
         return
     
-    await state.update_data(current_card_index=0, card_ids=[card.id for card in cards])
+    total = await db.count_approved_cards()
     
     card = cards[0]
-    await send_card(message, card, 0, len(cards))
+    await send_card(message, card, 0, total)
     
-    logger.info(f"User {message.from_user.id} viewing cards")
+    logger.info("User %s viewing cards", message.from_user.id)
 
 
 async def send_card(message: Message, card, index: int, total: int):
-    text = (
-        f"<b>{card.title}</b>\n\n"
-        f"{card.description}\n\n"
-        f"💰 Цена: <b>{card.price:.2f}</b> руб."
-    )
-    
-    keyboard = get_cards_navigation_keyboard(index, total, card.id)
-    
-    if card.photo_id:
-        await message.answer_photo(
-            photo=card.photo_id,
-            caption=text,
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
-    else:
-        await message.answer(
-            text=text,
-            parse_mode="HTML",
-            reply_markup=keyboard
-        )
+    await send_view(message, render_catalog_card(card, index, total))
 
 
 @router.callback_query(F.data.startswith("card_prev:"))
-async def card_previous(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    card_ids = data.get('card_ids', [])
-    current_index = int(callback.data.split(':')[1])
+async def card_previous(callback: CallbackQuery):
+    _, current_index, card_id = callback.data.split(':')
     
-    new_index = current_index - 1
+    new_index = max(int(current_index) - 1, 0)
+    cards = await db.get_approved_cards_page(anchor_id=int(card_id), limit=1, backward=True)
     
-    if new_index < 0:
+    if not cards:
         await callback.answer("Это первая карточка")
         return
     
-    card = await db.get_card(card_ids[new_index])
+    card = cards[0]
+    total = await db.count_approved_cards()
     
-    if card:
-        await state.update_data(current_card_index=new_index)
-        
-        text = (
-            f"<b>{card.title}</b>\n\n"
-            f"{card.description}\n\n"
-            f"💰 Цена: <b>{card.price:.2f}</b> руб."
-        )
-        
-        keyboard = get_cards_navigation_keyboard(new_index, len(card_ids), card.id)
-        
-        try:
-            if card.photo_id:
-                await callback.message.edit_caption(
-                    caption=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-            else:
-                await callback.message.edit_text(
-                    text=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-        except:
-            pass
+    try:
+        await edit_view(callback.message, render_catalog_card(card, new_index, total))
+    except:
+        pass
     
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("card_next:"))
-async def card_next(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    card_ids = data.get('card_ids', [])
-    current_index = int(callback.data.split(':')[1])
+async def card_next(callback: CallbackQuery):
+    _, current_index, card_id = callback.data.split(':')
     
-    new_index = current_index + 1
+    new_index = int(current_index) + 1
+    cards = await db.get_approved_cards_page(anchor_id=int(card_id), limit=1)
     
-    if new_index >= len(card_ids):
+    if not cards:
         await callback.answer("Это последняя карточка")
         return
     
-    card = await db.get_card(card_ids[new_index])
+    card = cards[0]
+    total = max(await db.count_approved_cards(), new_index + 1)
     
-    if card:
-        await state.update_data(current_card_index=new_index)
-        
-        text = (
-            f"<b>{card.title}</b>\n\n"
-            f"{card.description}\n\n"
-            f"💰 Цена: <b>{card.price:.2f}</b> руб."
-        )
-        
-        keyboard = get_cards_navigation_keyboard(new_index, len(card_ids), card.id)
-        
-        try:
-            if card.photo_id:
-                await callback.message.edit_caption(
-                    caption=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-            else:
-                await callback.message.edit_text(
-                    text=text,
-                    parse_mode="HTML",
-                    reply_markup=keyboard
-                )
-        except:
-            pass
+    try:
+        await edit_view(callback.message, render_catalog_card(card, new_index, total))
+    except:
+        pass
     
     await callback.answer()
 
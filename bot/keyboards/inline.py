@@ -8,7 +8,7 @@ def get_cards_navigation_keyboard(current_index: int, total_cards: int, card_id:
     buttons = []
     
     if current_index > 0:
-        buttons.append(InlineKeyboardButton(text="«", callback_data=f"card_prev:{current_index}"))
+        buttons.append(InlineKeyboardButton(text="«", callback_data=f"card_prev:{current_index}:{card_id}"))
     
     buttons.append(InlineKeyboardButton(
         text=f"{current_index + 1}/{total_cards}", 
@@ -16,7 +16,7 @@ def get_cards_navigation_keyboard(current_index: int, total_cards: int, card_id:
     ))
     
     if current_index < total_cards - 1:
-        buttons.append(InlineKeyboardButton(text="»", callback_data=f"card_next:{current_index}"))
+        buttons.append(InlineKeyboardButton(text="»", callback_data=f"card_next:{current_index}:{card_id}"))
     
     builder.row(*buttons)
     builder.row(InlineKeyboardButton(text="💳 Купить", callback_data=f"buy:{card_id}"))
@@ -24,22 +24,56 @@ def get_cards_navigation_keyboard(current_index: int, total_cards: int, card_id:
     return builder.as_markup()
 
 
+def get_buy_keyboard(card_id: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="💳 Купить", callback_data=f"buy:{card_id}"))
+    return builder.as_markup()
+
+
+def get_search_results_keyboard(cards: list, offset: int, page_size: int, has_more: bool) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for card in cards:
+        builder.row(InlineKeyboardButton(
+            text=f"{card.title[:40]} — {card.price:.2f} руб.",
+            callback_data=f"search_open:{card.id}"
+        ))
+    
+    nav_buttons = []
+    
+    if offset > 0:
+        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"search_page:{max(offset - page_size, 0)}"))
+    
+    if has_more:
+        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"search_page:{offset + page_size}"))
+    
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    
+    return builder.as_markup()
+
+
 def get_moderation_keyboard(card_id: int, current_index: int, total_cards: int) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     
     builder.row(
-        InlineKeyboardButton(text="✅ Одобрить", callback_data=f"moderate_approve:{card_id}"),
-        InlineKeyboardButton(text="❌ Отклонить", callback_data=f"moderate_reject:{card_id}")
+        InlineKeyboardButton(text="✅ Одобрить", callback_data=f"moderate_approve:{card_id}:{current_index}"),
+        InlineKeyboardButton(text="❌ Отклонить", callback_data=f"moderate_reject:{card_id}:{current_index}")
     )
     
     builder.row(
         InlineKeyboardButton(text="✏️ Изменить", callback_data=f"moderate_edit:{card_id}")
     )
     
+    builder.row(
+        InlineKeyboardButton(text="👤 Одобрить все от автора", callback_data=f"moderate_seller:{card_id}:{current_index}"),
+        InlineKeyboardButton(text="📋 Пакетный режим", callback_data="bulk_open")
+    )
+    
     nav_buttons = []
     
     if current_index > 0:
-        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"moderate_prev:{current_index}"))
+        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"moderate_prev:{current_index}:{card_id}"))
     
     nav_buttons.append(InlineKeyboardButton(
         text=f"{current_index + 1}/{total_cards}", 
@@ -47,13 +81,46 @@ def get_moderation_keyboard(card_id: int, current_index: int, total_cards: int)
     ))
     
     if current_index < total_cards - 1:
-        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"moderate_next:{current_index}"))
+        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"moderate_next:{current_index}:{card_id}"))
     
     builder.row(*nav_buttons)
     
     return builder.as_markup()
 
 
+def get_bulk_moderation_keyboard(cards: list, selected: set, has_next: bool,
+                                 is_first: bool) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for card in cards:
+        mark = "✅" if card.id in selected else "⬜️"
+        builder.row(InlineKeyboardButton(text=f"{mark} #{card.id} {card.title[:40]}", callback_data=f"bulk_toggle:{card.id}"))
+    
+    if selected:
+        builder.row(
+            InlineKeyboardButton(text=f"✅ Одобрить ({len(selected)})", callback_data="bulk_apply:approve"),
+            InlineKeyboardButton(text=f"❌ Отклонить ({len(selected)})", callback_data="bulk_apply:reject")
+        )
+    
+    builder.row(
+        InlineKeyboardButton(text="✅ Одобрить страницу", callback_data="bulk_page:approve"),
+        InlineKeyboardButton(text="❌ Отклонить страницу", callback_data="bulk_page:reject")
+    )
+    
+    nav_buttons = []
+    
+    if not is_first:
+        nav_buttons.append(InlineKeyboardButton(text="⏮ В начало", callback_data="bulk_first"))
+    
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"bulk_next:{cards[-1].id}"))
+    
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    
+    return builder.as_markup()
+
+
 def get_balance_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="💸 Вывести средства", callback_data="withdraw"))
@@ -64,13 +131,13 @@ def get_withdrawals_keyboard(withdrawal_id: int, current_index: int, total_withd
     builder = InlineKeyboardBuilder()
     
     builder.row(
-        InlineKeyboardButton(text="✅ Выплата проведена", callback_data=f"withdrawal_complete:{withdrawal_id}")
+        InlineKeyboardButton(text="✅ Выплата проведена", callback_data=f"withdrawal_complete:{withdrawal_id}:{current_index}")
     )
     
     nav_buttons = []
     
     if current_index > 0:
-        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"withdrawal_prev:{current_index}"))
+        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"withdrawal_prev:{current_index}:{withdrawal_id}"))
     
     nav_buttons.append(InlineKeyboardButton(
         text=f"{current_index + 1}/{total_withdrawals}", 
@@ -78,14 +145,69 @@ def get_withdrawals_keyboard(withdrawal_id: int, current_index: int, total_withd
     ))
     
     if current_index < total_withdrawals - 1:
-        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"withdrawal_next:{current_index}"))
+        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"withdrawal_next:{current_index}:{withdrawal_id}"))
+    
+    builder.row(*nav_buttons)
+    
+    return builder.as_markup()
+
+
+def get_statistics_keyboard(sort: str, page: int, first_user_id: int, last_user_id: int,
+                            has_next: bool) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    sort_buttons = []
+    for key, title in (("revenue", "💰 Выручка"), ("cards", "📦 Карточки"), ("rejected", "❌ Отклонения")):
+        text = f"• {title}" if key == sort else title
+        sort_buttons.append(InlineKeyboardButton(text=text, callback_data=f"stats_sort:{key}"))
+    
+    builder.row(*sort_buttons)
+    
+    nav_buttons = []
+    
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="«", callback_data=f"stats_prev:{sort}:{page}:{first_user_id}"))
+    
+    nav_buttons.append(InlineKeyboardButton(text=f"Стр. {page + 1}", callback_data="stats_count"))
+    
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton(text="»", callback_data=f"stats_next:{sort}:{page}:{last_user_id}"))
     
     builder.row(*nav_buttons)
     
     return builder.as_markup()
 
 
+def get_export_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    
+    for table, title in (("users", "👤 Пользователи"), ("cards", "📦 Карточки"),
+                         ("purchases", "🛒 Покупки"), ("withdrawals", "💸 Выводы"),
+                         ("ledger_entries", "📒 Проводки")):
+        builder.row(
+            InlineKeyboardButton(text=f"{title} CSV", callback_data=f"export:{table}:csv"),
+            InlineKeyboardButton(text="Parquet", callback_data=f"export:{table}:parquet")
+        )
+    
+    return builder.as_markup()
+
+
 def get_cancel_inline_keyboard() -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text="❌ Отменить", callback_data="cancel"))
+    return builder.as_markup()
+
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(text="🚀 Отправить", callback_data="broadcast_send"),
+        InlineKeyboardButton(text="❌ Отменить", callback_data="broadcast_abort")
+    )
+    return builder.as_markup()
+
+
+def get_broadcast_stop_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text="⏹ Остановить", callback_data=f"broadcast_stop:{broadcast_id}"))
     return builder.as_markup()
\ No newline at end of file
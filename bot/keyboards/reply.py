@@ -24,7 +24,11 @@ def get_admin_keyboard() -> ReplyKeyboardMarkup:
         KeyboardButton(text="✅ Модерация"),
         KeyboardButton(text="📊 Статистика")
     )
-    builder.row(KeyboardButton(text="💸 Заявки на вывод"))
+    builder.row(
+        KeyboardButton(text="💸 Заявки на вывод"),
+        KeyboardButton(text="📤 Экспорт")
+    )
+    builder.row(KeyboardButton(text="📢 Рассылка"))
     builder.row(KeyboardButton(text="◀️ Назад"))
     
     return builder.as_markup(resize_keyboard=True)
@@ -1,37 +1,81 @@
 import asyncio
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from bot.config import config
 from bot.database.database import db
-from bot.handlers import common, user, payment, admin
+from bot.handlers import common, user, payment, admin, search
+from bot.states.storage import create_storage
+from bot.webhook import run_webhook
 from bot.utils.logger import logger
+from bot.utils.broadcast import broadcaster
+from bot.utils.ledger import ledger_maintenance
+from bot.utils.notifications import notifier
+from bot.utils.metrics import start_metrics_server
+from bot.utils.render import view_cache
+from bot.utils.throttle import ThrottlingMiddleware, send_scheduler
+from bot.utils.timing import install_timing, instrument_engine
+
+
+def create_dispatcher() -> Dispatcher:
+    storage, events_isolation = create_storage(db)
+    dp = Dispatcher(storage=storage, events_isolation=events_isolation)
+    
+    dp.include_router(common.router)
+    dp.include_router(user.router)
+    dp.include_router(payment.router)
+    dp.include_router(admin.router)
+    dp.include_router(search.router)
+    install_timing(dp)
+    
+    return dp
 
 
 async def main():
     try:
         config.validate()
     except ValueError as e:
-        logger.error(f"Configuration error: {e}")
+        logger.error("Configuration error: %s", e)
         return
     
     await db.init_db()
+    instrument_engine(db.engine)
     
     bot = Bot(token=config.BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
+    bot.session.middleware(ThrottlingMiddleware(send_scheduler))
+    notifier.start(bot)
+    ledger_maintenance.start()
+    await broadcaster.resume(bot)
+    dp = create_dispatcher()
     
-    dp.include_router(common.router)
-    dp.include_router(user.router)
-    dp.include_router(payment.router)
-    dp.include_router(admin.router)
+    metrics_runner = None
     
-    logger.info("Bot started successfully")
+    logger.info("Bot started successfully (mode: %s, FSM storage: %s)", config.BOT_MODE, config.FSM_STORAGE)
     
     try:
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if config.BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            if config.METRICS_PORT:
+                metrics_runner = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT, config.METRICS_PATH)
+                logger.info("Metrics served on %s:%s%s", config.METRICS_HOST, config.METRICS_PORT, config.METRICS_PATH)
+            
+            await bot.delete_webhook()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await broadcaster.close()
+        await ledger_maintenance.close()
+        await notifier.close()
+        await send_scheduler.close()
         await bot.session.close()
+        logger.info("Card cache stats: %s", db.cache_stats())
+        logger.info("Render cache stats: %s", view_cache.stats())
+        logger.info("Inline cache stats: %s", search.inline_cache.stats())
+        logger.info("Send queue stats: %s", send_scheduler.stats())
+        logger.info("Seller notification stats: %s", notifier.stats())
+        logger.info("Pre-checkout latency: %s", payment.pre_checkout_metrics.stats())
+        logger.info("Ledger maintenance stats: %s", ledger_maintenance.stats())
         logger.info("Bot stopped")
 
 
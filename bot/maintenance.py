@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+
+from bot.database.database import db
+from bot.utils.logger import logger
+
+
+async def rebuild_stats(args):
+    await db.rebuild_user_stats()
+
+
+async def reconcile_stats(args):
+    fixes = await db.reconcile_user_stats()
+    logger.info("User statistics reconciled, %s rows corrected", len(fixes))
+
+
+COMMANDS = {
+    'rebuild-stats': rebuild_stats,
+    'reconcile-stats': reconcile_stats
+}
+
+
+async def run(args):
+    await db.init_db()
+    
+    try:
+        await COMMANDS[args.command](args)
+    finally:
+        await db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bot database maintenance")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -15,4 +15,9 @@ class EditCardStates(StatesGroup):
 
 class WithdrawalStates(StatesGroup):
     waiting_for_amount = State()
-    waiting_for_requisites = State()
\ No newline at end of file
+    waiting_for_requisites = State()
+
+
+class BroadcastStates(StatesGroup):
+    waiting_for_text = State()
+    waiting_for_confirmation = State()
\ No newline at end of file
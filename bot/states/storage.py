@@ -0,0 +1,149 @@
+import json
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseEventIsolation, BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import select, delete, case
+
+from bot.config import config
+from bot.database.database import Database, dialect_insert
+from bot.database.models import FSMRecord
+from bot.utils.logger import logger
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_value(value: dict) -> Any:
+    if '__decimal__' in value:
+        return Decimal(value['__decimal__'])
+    return value
+
+
+def dumps_state_data(data: Dict[str, Any]) -> str:
+    return json.dumps(data, default=_encode_value, separators=(',', ':'), ensure_ascii=False)
+
+
+def loads_state_data(value: str) -> Dict[str, Any]:
+    return json.loads(value, object_hook=_decode_value)
+
+
+class SQLStorage(BaseStorage):
+    def __init__(self, database: Database, ttl: int, purge_interval: Optional[int] = None):
+        self.database = database
+        self.ttl = ttl
+        self.purge_interval = purge_interval if purge_interval is not None else max(ttl // 10, 60)
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._next_purge = time.monotonic() + self.purge_interval
+    
+    def _expires_at(self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.ttl)
+    
+    async def _load(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        async with self.database.session_maker() as session:
+            result = await session.execute(
+                select(FSMRecord.state, FSMRecord.data)
+                .where(FSMRecord.key == self.key_builder.build(key))
+                .where(FSMRecord.expires_at > datetime.now())
+            )
+            row = result.one_or_none()
+        
+        if row is None:
+            return None, {}
+        
+        return row.state, loads_state_data(row.data)
+    
+    async def _write(self, key: StorageKey, **values: Any):
+        expired = FSMRecord.expires_at <= datetime.now()
+        # An expired row must not leak its other half into the refreshed record
+        updates = {
+            'state': case((expired, None), else_=FSMRecord.state),
+            'data': case((expired, '{}'), else_=FSMRecord.data),
+            **values,
+            'expires_at': self._expires_at()
+        }
+        insert = dialect_insert(self.database.engine.dialect.name)
+        
+        async with self.database.session_maker() as session:
+            statement = insert(FSMRecord).values(
+                key=self.key_builder.build(key),
+                expires_at=updates['expires_at'],
+                **values
+            )
+            await session.execute(
+                statement.on_conflict_do_update(index_elements=[FSMRecord.key], set_=updates)
+            )
+            await self._purge_if_due(session)
+            await session.commit()
+    
+    async def _purge_if_due(self, session):
+        now = time.monotonic()
+        
+        if now < self._next_purge:
+            return
+        
+        self._next_purge = now + self.purge_interval
+        result = await session.execute(delete(FSMRecord).where(FSMRecord.expires_at <= datetime.now()))
+        
+        if result.rowcount:
+            logger.info("Purged %s expired FSM records", result.rowcount)
+    
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._write(key, state=state.state if isinstance(state, State) else state)
+    
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+    
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not data:
+            async with self.database.session_maker() as session:
+                result = await session.execute(
+                    delete(FSMRecord)
+                    .where(FSMRecord.key == self.key_builder.build(key))
+                    .where(FSMRecord.state.is_(None))
+                )
+                await session.commit()
+            
+            if result.rowcount:
+                return
+        
+        await self._write(key, data=dumps_state_data(data))
+    
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(key)
+        return data
+    
+    async def close(self) -> None:
+        pass
+
+
+def create_storage(database: Database) -> Tuple[BaseStorage, Optional[BaseEventIsolation]]:
+    backend = config.FSM_STORAGE
+    
+    if backend == "memory":
+        return MemoryStorage(), None
+    
+    if backend == "database":
+        return SQLStorage(database, ttl=config.FSM_STATE_TTL), None
+    
+    if backend == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+        
+        storage = RedisStorage.from_url(
+            config.REDIS_URL,
+            state_ttl=config.FSM_STATE_TTL,
+            data_ttl=config.FSM_STATE_TTL,
+            json_dumps=dumps_state_data,
+            json_loads=loads_state_data
+        )
+        return storage, storage.create_isolation()
+    
+    raise ValueError(f"Unknown FSM_STORAGE backend: {backend}")
\ No newline at end of file
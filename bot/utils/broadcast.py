@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from bot.config import config
+from bot.database.database import Database, db
+from bot.database.models import Broadcast, BroadcastStatus
+from bot.utils.logger import logger
+from bot.utils.throttle import Priority, send_priority
+
+SENT = "sent"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+
+def format_broadcast_report(broadcast: Broadcast) -> str:
+    title = "✅ Рассылка завершена" if broadcast.status == BroadcastStatus.COMPLETED else "⏹ Рассылка остановлена"
+    return (
+        f"<b>{title}</b> (#{broadcast.id})\n\n"
+        f"📨 Доставлено: {broadcast.sent_count}\n"
+        f"🚫 Заблокировали бота: {broadcast.blocked_count}\n"
+        f"⚠️ Ошибок: {broadcast.failed_count}"
+    )
+
+
+class Broadcaster:
+    def __init__(self, database: Database, batch_size: int, concurrency: int):
+        self.database = database
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self._stopping: Set[int] = set()
+        self._closing = False
+    
+    def start(self, bot: Bot, broadcast: Broadcast) -> asyncio.Task:
+        task = self.tasks.get(broadcast.id)
+        
+        if task is None or task.done():
+            task = asyncio.create_task(self.run(bot, broadcast))
+            self.tasks[broadcast.id] = task
+            task.add_done_callback(lambda _: self.tasks.pop(broadcast.id, None))
+        
+        return task
+    
+    async def resume(self, bot: Bot):
+        for broadcast in await self.database.get_running_broadcasts():
+            logger.info("Resuming broadcast %s after user %s", broadcast.id, broadcast.last_user_id)
+            self.start(bot, broadcast)
+    
+    async def stop(self, broadcast_id: int) -> Optional[Broadcast]:
+        # The runner notices at the next batch boundary, after it has saved the batch in flight
+        broadcast = await self.database.finish_broadcast(broadcast_id, BroadcastStatus.CANCELLED)
+        
+        if broadcast and broadcast_id in self.tasks:
+            self._stopping.add(broadcast_id)
+        
+        return broadcast
+    
+    async def _deliver(self, bot: Bot, semaphore: asyncio.Semaphore, user_id: int, text: str) -> str:
+        async with semaphore:
+            try:
+                with send_priority(Priority.BROADCAST):
+                    await bot.send_message(user_id, text, parse_mode="HTML")
+                return SENT
+            except TelegramForbiddenError:
+                return BLOCKED
+            except TelegramBadRequest as e:
+                # The account is gone; there is no point in trying it again next time
+                if "chat not found" in e.message.lower():
+                    return BLOCKED
+                logger.warning("Broadcast to %s failed: %s", user_id, e)
+                return FAILED
+            except Exception as e:
+                logger.warning("Broadcast to %s failed: %s", user_id, e)
+                return FAILED
+    
+    async def run(self, bot: Bot, broadcast: Broadcast) -> Optional[Broadcast]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        checkpoint = broadcast.last_user_id
+        started = time.monotonic()
+        sent = 0
+        exhausted = False
+        
+        try:
+            while not self._closing and broadcast.id not in self._stopping:
+                user_ids = await self.database.get_broadcast_recipients(checkpoint, self.batch_size)
+                
+                if not user_ids:
+                    exhausted = True
+                    break
+                
+                outcomes = await asyncio.gather(
+                    *(self._deliver(bot, semaphore, user_id, broadcast.text) for user_id in user_ids)
+                )
+                blocked = [user_id for user_id, outcome in zip(user_ids, outcomes) if outcome == BLOCKED]
+                checkpoint = user_ids[-1]
+                sent += outcomes.count(SENT)
+                
+                await self.database.save_broadcast_progress(
+                    broadcast.id, checkpoint, outcomes.count(SENT), outcomes.count(FAILED), blocked
+                )
+            
+            if exhausted:
+                finished = await self.database.finish_broadcast(broadcast.id, BroadcastStatus.COMPLETED)
+            elif broadcast.id in self._stopping:
+                finished = await self.database.get_broadcast(broadcast.id)
+            else:
+                # Shutting down: the broadcast stays RUNNING and resumes on the next start
+                finished = None
+        finally:
+            self._stopping.discard(broadcast.id)
+        
+        elapsed = time.monotonic() - started
+        logger.info(
+            "Broadcast %s reached user %s: %s messages in %.1fs (%.1f/s)",
+            broadcast.id, checkpoint, sent, elapsed, sent / elapsed if elapsed else 0
+        )
+        
+        if finished:
+            try:
+                await bot.send_message(broadcast.admin_id, format_broadcast_report(finished), parse_mode="HTML")
+            except Exception as e:
+                logger.warning("Failed to report broadcast %s to admin %s: %s", broadcast.id, broadcast.admin_id, e)
+        
+        return finished
+    
+    async def close(self, timeout: float = 10):
+        # Lets every runner finish and checkpoint its current batch; a runner that is
+        # cancelled instead re-sends that batch when it resumes
+        self._closing = True
+        tasks: List[asyncio.Task] = list(self.tasks.values())
+        
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            
+            for task in pending:
+                task.cancel()
+            
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+broadcaster = Broadcaster(db, config.BROADCAST_BATCH_SIZE, config.BROADCAST_CONCURRENCY)
\ No newline at end of file
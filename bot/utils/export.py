@@ -0,0 +1,71 @@
+import asyncio
+import csv
+import enum
+from typing import AsyncIterator, List
+
+from sqlalchemy import Boolean, Column, DateTime, Integer, Numeric
+
+
+def export_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+async def write_csv(path: str, columns: List[Column], batches: AsyncIterator[list]) -> int:
+    rows_written = 0
+    
+    # utf-8-sig makes spreadsheet applications detect the Cyrillic text correctly
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow([column.name for column in columns])
+        
+        async for batch in batches:
+            rows = [[export_value(value) for value in row] for row in batch]
+            await asyncio.to_thread(writer.writerows, rows)
+            rows_written += len(rows)
+    
+    return rows_written
+
+
+def arrow_type(column: Column):
+    import pyarrow as pa
+    
+    if isinstance(column.type, Numeric):
+        return pa.decimal128(column.type.precision, column.type.scale)
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp('us')
+    return pa.string()
+
+
+async def write_parquet(path: str, columns: List[Column], batches: AsyncIterator[list]) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = pa.schema([(column.name, arrow_type(column)) for column in columns])
+    rows_written = 0
+    
+    # Every batch becomes its own row group, so the writer never buffers the whole table
+    with pq.ParquetWriter(path, schema) as writer:
+        async for batch in batches:
+            table = pa.Table.from_arrays(
+                [
+                    pa.array([export_value(value) for value in values], type=field.type)
+                    for values, field in zip(zip(*batch), schema)
+                ],
+                schema=schema
+            )
+            await asyncio.to_thread(writer.write_table, table)
+            rows_written += len(batch)
+    
+    return rows_written
+
+
+EXPORT_FORMATS = {
+    'csv': write_csv,
+    'parquet': write_parquet
+}
\ No newline at end of file
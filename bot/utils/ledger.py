@@ -0,0 +1,89 @@
+import asyncio
+import time
+from typing import Optional
+
+from bot.config import config
+from bot.database.database import Database, db
+from bot.utils.logger import logger
+
+
+class LedgerMaintenance:
+    def __init__(self, database: Database, interval: float, reconcile_interval: float):
+        self.database = database
+        self.interval = interval
+        self.reconcile_interval = reconcile_interval
+        self._worker: Optional[asyncio.Task] = None
+        # Highest entry id seen on the previous run; only entries up to it are folded, so a
+        # transaction has a whole interval to commit before its ids are compacted past
+        self._horizon = 0
+        self._reconciled_at: Optional[float] = None
+        self.runs = 0
+        self.compacted = 0
+        self.repaired = 0
+        self.last_report: Optional[dict] = None
+    
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Ledger maintenance failed: %s", e)
+            
+            await asyncio.sleep(self.interval)
+    
+    async def run_once(self):
+        horizon, self._horizon = self._horizon, await self.database.get_last_ledger_entry_id()
+        
+        if horizon:
+            compacted = await self.database.compact_balances(horizon)
+            self.compacted += compacted
+            logger.info("Compacted ledger up to entry %s into %s balance snapshots", horizon, compacted)
+        
+        self.runs += 1
+        
+        if self._reconciled_at is None or time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+            await self.reconcile()
+    
+    async def reconcile(self) -> dict:
+        started = time.monotonic()
+        report = await self.database.reconcile_ledger()
+        self._reconciled_at = time.monotonic()
+        self.last_report = report
+        
+        if report['drifted_snapshots']:
+            # Usually an entry that committed after compaction had already passed its id
+            repaired = await self.database.repair_snapshots()
+            self.repaired += repaired
+            logger.warning("Rebuilt %s balance snapshots that missed ledger entries", repaired)
+        
+        if report['unbalanced_transactions'] or report['drifted_snapshots']:
+            logger.error("Ledger reconciliation found problems: %s", report)
+        else:
+            logger.info("Ledger reconciled in %.2fs: %s", self._reconciled_at - started, report)
+        
+        return report
+    
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+    
+    def stats(self) -> dict:
+        return {
+            'runs': self.runs,
+            'compacted': self.compacted,
+            'repaired': self.repaired,
+            'horizon': self._horizon,
+            'last_report': self.last_report
+        }
+
+
+ledger_maintenance = LedgerMaintenance(db, config.LEDGER_COMPACT_INTERVAL, config.LEDGER_RECONCILE_INTERVAL)
\ No newline at end of file
@@ -1,13 +1,92 @@
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+from datetime import datetime, timezone
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('bot.log', encoding='utf-8')
-    ]
-)
+from bot.config import config
 
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Everything else on a record came from extra= and goes into the JSON line as is
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    # Runs on the event loop: merge the arguments now, since the objects may change before
+    # the writer thread gets to them, but leave the formatting and the I/O to that thread
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        
+        return record
+
+
+def create_file_handler(path: str, max_bytes: int, backup_count: int, rotate_when: str = "") -> logging.Handler:
+    if rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=rotate_when, backupCount=backup_count, encoding='utf-8'
+        )
+    
+    return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+
+
+def create_listener(handlers, log_format: str) -> logging.handlers.QueueListener:
+    formatter = JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+    
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    return logging.handlers.QueueListener(queue.SimpleQueue(), *handlers, respect_handler_level=True)
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if config.LOG_FILE:
+        handlers.append(create_file_handler(
+            config.LOG_FILE, config.LOG_MAX_BYTES, config.LOG_BACKUP_COUNT, config.LOG_ROTATE_WHEN
+        ))
+    
+    listener = create_listener(handlers, config.LOG_FORMAT)
+    level = logging.getLevelName(config.LOG_LEVEL)
+    
+    root = logging.getLogger()
+    root.setLevel(level if isinstance(level, int) else logging.INFO)
+    root.addHandler(LogQueueHandler(listener.queue))
+    
+    # The writer thread drains whatever is still queued before the process exits
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+listener = setup_logging()
 logger = logging.getLogger(__name__)
\ No newline at end of file
@@ -0,0 +1,215 @@
+import bisect
+import collections
+import math
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+class LatencyRecorder:
+    SAMPLES = 1000
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.outcomes = collections.Counter()
+        self._samples = collections.deque(maxlen=self.SAMPLES)
+    
+    def record(self, seconds: float, outcome: str):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.outcomes[outcome] += 1
+        self._samples.append(seconds)
+    
+    def percentile(self, fraction: float) -> float:
+        samples = sorted(self._samples)
+        
+        if not samples:
+            return 0.0
+        
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+    
+    def stats(self) -> dict:
+        return {
+            'count': self.count,
+            'outcomes': dict(self.outcomes),
+            'avg_ms': round(self.total / self.count * 1000, 1) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.5) * 1000, 1),
+            'p95_ms': round(self.percentile(0.95) * 1000, 1),
+            'max_ms': round(self.max * 1000, 1)
+        }
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = collections.defaultdict(float)
+    
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] += amount
+    
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value:g}")
+        
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+        self._function: Optional[Callable[[], Iterable[Tuple[Tuple, float]]]] = None
+    
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+    
+    def set_function(self, function: Callable[[], Iterable[Tuple[Tuple, float]]]):
+        # Read the current values when scraped instead of keeping them up to date on the hot path
+        self._function = function
+    
+    def value(self, *labels) -> float:
+        return dict(self.collect()).get(labels, 0)
+    
+    def collect(self) -> List[Tuple[Tuple, float]]:
+        if self._function is not None:
+            return list(self._function())
+        
+        return list(self._values.items())
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        
+        for labels, value in sorted(self.collect()):
+            lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value:g}")
+        
+        return lines
+
+
+class HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+    
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple, HistogramSeries] = {}
+    
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        
+        if series is None:
+            series = self._series[labels] = HistogramSeries(len(self.buckets))
+        
+        # Counts are kept per bucket and only made cumulative when rendered
+        series.counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.total += value
+        series.count += 1
+    
+    def series(self, *labels) -> HistogramSeries:
+        return self._series.get(labels)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.label_names + ("le",)
+        
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            
+            for bound, count in zip(self.buckets, series.counts):
+                cumulative += count
+                lines.append(
+                    f"{self.name}_bucket{format_labels(bucket_names, labels + (format_bound(bound),))} {cumulative}"
+                )
+            
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {series.total!r}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {series.count}")
+        
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+    
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+    
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+    
+    def render(self) -> str:
+        lines = []
+        
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    # Prometheus text exposition format, version 0.0.4
+    return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host: str, port: int, path: str) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get(path, metrics_handler)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
\ No newline at end of file
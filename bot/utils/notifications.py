@@ -0,0 +1,142 @@
+import asyncio
+import html
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError
+
+from bot.config import config
+from bot.utils.logger import logger
+from bot.utils.throttle import Priority, send_priority
+
+APPROVED = "approved"
+REJECTED = "rejected"
+SOLD = "sold"
+
+MAX_LISTED_TITLES = 10
+
+
+class Notification(NamedTuple):
+    kind: str
+    title: str
+    amount: Optional[Decimal] = None
+
+
+def format_titles(notifications: List[Notification]) -> List[str]:
+    lines = [f"• {html.escape(item.title)}" for item in notifications[:MAX_LISTED_TITLES]]
+    
+    if len(notifications) > MAX_LISTED_TITLES:
+        lines.append(f"… и ещё {len(notifications) - MAX_LISTED_TITLES}")
+    
+    return lines
+
+
+def format_notification(notifications: List[Notification]) -> str:
+    by_kind = {APPROVED: [], REJECTED: [], SOLD: []}
+    for item in notifications:
+        by_kind[item.kind].append(item)
+    
+    sections = []
+    approved, rejected, sold = by_kind[APPROVED], by_kind[REJECTED], by_kind[SOLD]
+    
+    if len(approved) == 1:
+        sections.append(f"✅ Ваша карточка «{html.escape(approved[0].title)}» одобрена и появилась в каталоге.")
+    elif approved:
+        sections.append("\n".join([f"✅ <b>Одобрено ваших карточек: {len(approved)}</b>"] + format_titles(approved)))
+    
+    if len(rejected) == 1:
+        sections.append(f"❌ Ваша карточка «{html.escape(rejected[0].title)}» отклонена модератором.")
+    elif rejected:
+        sections.append("\n".join([f"❌ <b>Отклонено ваших карточек: {len(rejected)}</b>"] + format_titles(rejected)))
+    
+    if len(sold) == 1:
+        sections.append(f"💰 Карточка «{html.escape(sold[0].title)}» продана за <b>{sold[0].amount:.2f}</b> руб.")
+    elif sold:
+        revenue = sum(item.amount for item in sold)
+        sections.append("\n".join(
+            [f"💰 <b>Продаж: {len(sold)} на сумму {revenue:.2f} руб.</b>"] + format_titles(sold)
+        ))
+    
+    return "\n\n".join(sections)
+
+
+class SellerNotifier:
+    def __init__(self, window: float):
+        self.window = window
+        self.bot: Optional[Bot] = None
+        self._pending: Dict[int, List[Notification]] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0
+    
+    def start(self, bot: Bot):
+        self.bot = bot
+        
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+    
+    def notify(self, user_id: int, kind: str, title: str, amount: Optional[Decimal] = None):
+        # Only buffers the event, so the admin's or buyer's handler never waits on Telegram
+        if self.bot is None:
+            return
+        
+        self._pending.setdefault(user_id, []).append(Notification(kind, title, amount))
+        self.queued += 1
+        self._wakeup.set()
+    
+    def notify_cards(self, kind: str, cards: list):
+        for card in cards:
+            self.notify(card.user_id, kind, card.title)
+    
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            # Everything that arrives during the window is merged into one message per seller
+            await asyncio.sleep(self.window)
+            self._wakeup.clear()
+            await self.flush()
+    
+    async def _send(self, user_id: int, notifications: List[Notification]):
+        try:
+            with send_priority(Priority.BROADCAST):
+                await self.bot.send_message(user_id, format_notification(notifications), parse_mode="HTML")
+            self.sent += 1
+        except TelegramForbiddenError:
+            self.failed += 1
+            logger.info("Seller %s blocked the bot, dropped %s notifications", user_id, len(notifications))
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Failed to notify seller %s: %s", user_id, e)
+    
+    async def flush(self):
+        if self.bot is None or not self._pending:
+            return
+        
+        pending, self._pending = self._pending, {}
+        
+        await asyncio.gather(*(self._send(user_id, notifications) for user_id, notifications in pending.items()))
+    
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        await self.flush()
+    
+    def stats(self) -> dict:
+        return {
+            'pending_sellers': len(self._pending),
+            'queued': self.queued,
+            'sent': self.sent,
+            'failed': self.failed
+        }
+
+
+notifier = SellerNotifier(config.NOTIFY_COALESCE_SECONDS)
\ No newline at end of file
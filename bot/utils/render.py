@@ -0,0 +1,149 @@
+import html
+from typing import NamedTuple, Optional
+
+from aiogram.types import (
+    InlineKeyboardMarkup,
+    Message,
+    InlineQueryResultArticle,
+    InlineQueryResultCachedPhoto,
+    InputTextMessageContent
+)
+
+from bot.config import config
+from bot.keyboards.inline import get_cards_navigation_keyboard, get_moderation_keyboard, get_buy_keyboard
+from bot.utils.cache import TTLCache
+
+
+class View(NamedTuple):
+    text: str
+    keyboard: Optional[InlineKeyboardMarkup]
+    photo_id: Optional[str]
+
+
+CAPTION_LIMIT = 1024
+
+# Keys carry the card version, so an edited card simply stops matching its old entries
+view_cache = TTLCache(config.RENDER_CACHE_SIZE, config.RENDER_CACHE_TTL)
+
+
+def card_text(card) -> str:
+    return (
+        f"<b>{html.escape(card.title)}</b>\n\n"
+        f"{html.escape(card.description)}\n\n"
+        f"💰 Цена: <b>{card.price:.2f}</b> руб."
+    )
+
+
+def render_catalog_card(card, index: int, total: int) -> View:
+    key = ('catalog', card.id, card.version, index, total)
+    view = view_cache.get(key)
+    
+    if view is not None:
+        return view
+    
+    view = View(card_text(card), get_cards_navigation_keyboard(index, total, card.id), card.photo_id)
+    view_cache.set(key, view)
+    return view
+
+
+def render_search_card(card) -> View:
+    key = ('search', card.id, card.version)
+    view = view_cache.get(key)
+    
+    if view is not None:
+        return view
+    
+    view = View(card_text(card), get_buy_keyboard(card.id), card.photo_id)
+    view_cache.set(key, view)
+    return view
+
+
+def render_inline_result(card):
+    key = ('inline', card.id, card.version)
+    result = view_cache.get(key)
+    
+    if result is not None:
+        return result
+    
+    price = f"{card.price:.2f} руб."
+    
+    if card.photo_id:
+        caption = card_text(card)
+        
+        if len(caption) > CAPTION_LIMIT:
+            caption = f"<b>{html.escape(card.title)}</b>\n\n💰 Цена: <b>{price}</b>"
+        
+        result = InlineQueryResultCachedPhoto(
+            id=str(card.id),
+            photo_file_id=card.photo_id,
+            title=card.title,
+            description=price,
+            caption=caption,
+            parse_mode="HTML",
+            reply_markup=get_buy_keyboard(card.id)
+        )
+    else:
+        result = InlineQueryResultArticle(
+            id=str(card.id),
+            title=card.title,
+            description=price,
+            input_message_content=InputTextMessageContent(message_text=card_text(card), parse_mode="HTML"),
+            reply_markup=get_buy_keyboard(card.id)
+        )
+    
+    view_cache.set(key, result)
+    return result
+
+
+def render_moderation_card(card, index: int, total: int) -> View:
+    user = card.user
+    username = f"@{user.username}" if user.username else user.first_name
+    # The author is part of the text, so a renamed author must not hit the old entry
+    key = ('moderation', card.id, card.version, index, total, username)
+    view = view_cache.get(key)
+    
+    if view is not None:
+        return view
+    
+    text = (
+        f"<b>Модерация карточки #{card.id}</b>\n\n"
+        f"👤 Автор: {html.escape(username or '')} (ID: {card.user_id})\n"
+        f"📅 Создана: {card.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        f"<b>Название:</b> {html.escape(card.title)}\n\n"
+        f"<b>Описание:</b>\n{html.escape(card.description)}\n\n"
+        f"💰 <b>Цена:</b> {card.price:.2f} руб."
+    )
+    view = View(text, get_moderation_keyboard(card.id, index, total), card.photo_id)
+    view_cache.set(key, view)
+    return view
+
+
+async def send_view(message: Message, view: View):
+    if view.photo_id:
+        await message.answer_photo(
+            photo=view.photo_id,
+            caption=view.text,
+            parse_mode="HTML",
+            reply_markup=view.keyboard
+        )
+    else:
+        await message.answer(
+            text=view.text,
+            parse_mode="HTML",
+            reply_markup=view.keyboard
+        )
+
+
+async def edit_view(message: Message, view: View):
+    if view.photo_id:
+        await message.edit_caption(
+            caption=view.text,
+            parse_mode="HTML",
+            reply_markup=view.keyboard
+        )
+    else:
+        await message.edit_text(
+            text=view.text,
+            parse_mode="HTML",
+            reply_markup=view.keyboard
+        )
\ No newline at end of file
@@ -0,0 +1,235 @@
+import bisect
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+# Title matches weigh more than description matches, like setweight 'A'/'B' on Postgres
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+SATURATION = 1.2
+LENGTH_PENALTY = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower().replace('ё', 'е'))
+
+
+def tsquery_text(query: str) -> str:
+    # Every term must match and the last one is a prefix, so partially typed words still find cards
+    tokens = tokenize(query)
+    
+    if not tokens:
+        return ""
+    
+    return " & ".join(tokens[:-1] + [f"{tokens[-1]}:*"])
+
+
+class InvertedIndex:
+    # Below this many postings in the rarest term, scoring every candidate is cheaper than ranked access
+    EXACT_SCAN_LIMIT = 2000
+    # Cached rankings are rebuilt once the average card length drifts this far
+    AVERAGE_DRIFT = 0.05
+    
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.lengths: Dict[int, float] = {}
+        self.terms: Dict[int, Tuple[str, ...]] = {}
+        self.total_length = 0.0
+        self._vocabulary: Optional[List[str]] = None
+        self._ranked: Dict[str, List[int]] = {}
+        self._average: Optional[float] = None
+    
+    def __len__(self) -> int:
+        return len(self.lengths)
+    
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self.lengths
+    
+    def add(self, doc_id: int, title: str, description: str):
+        self.remove(doc_id)
+        
+        weights = Counter()
+        for token in tokenize(title):
+            weights[token] += TITLE_WEIGHT
+        for token in tokenize(description or ""):
+            weights[token] += DESCRIPTION_WEIGHT
+        
+        for token, weight in weights.items():
+            docs = self.postings.get(token)
+            if docs is None:
+                docs = self.postings[token] = {}
+                self._vocabulary = None
+            docs[doc_id] = weight
+            self._ranked.pop(token, None)
+        
+        length = sum(weights.values())
+        self.lengths[doc_id] = length
+        self.terms[doc_id] = tuple(weights)
+        self.total_length += length
+    
+    def remove(self, doc_id: int):
+        length = self.lengths.pop(doc_id, None)
+        
+        if length is None:
+            return
+        
+        self.total_length -= length
+        
+        for token in self.terms.pop(doc_id):
+            docs = self.postings[token]
+            del docs[doc_id]
+            self._ranked.pop(token, None)
+            if not docs:
+                del self.postings[token]
+                self._vocabulary = None
+    
+    def _expand(self, prefix: str) -> List[str]:
+        if prefix in self.postings:
+            return [prefix]
+        
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, prefix)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(prefix):
+            end += 1
+        return vocabulary[start:end]
+    
+    def _refresh_average(self):
+        average = self.total_length / len(self.lengths)
+        
+        if self._average is None or abs(average - self._average) > self.AVERAGE_DRIFT * self._average:
+            self._average = average
+            self._ranked.clear()
+    
+    def _idf(self, token: str) -> float:
+        frequency = len(self.postings[token])
+        return math.log(1 + (len(self.lengths) - frequency + 0.5) / (frequency + 0.5))
+    
+    def _impact(self, weight: float, doc_id: int) -> float:
+        norm = 1 - LENGTH_PENALTY + LENGTH_PENALTY * self.lengths[doc_id] / self._average
+        return weight * (SATURATION + 1) / (weight + SATURATION * norm)
+    
+    def _ranked_docs(self, token: str) -> List[int]:
+        ranked = self._ranked.get(token)
+        
+        if ranked is None:
+            docs = self.postings[token]
+            ranked = sorted(docs, key=lambda doc_id: (self._impact(docs[doc_id], doc_id), doc_id), reverse=True)
+            self._ranked[token] = ranked
+        
+        return ranked
+    
+    def _group_score(self, group: List[Tuple[str, float]], doc_id: int) -> float:
+        # A prefix counts as one query term and scores by the best word it matched in the card
+        score = 0.0
+        for token, idf in group:
+            weight = self.postings[token].get(doc_id)
+            if weight is not None:
+                score = max(score, idf * self._impact(weight, doc_id))
+        return score
+    
+    def _token_stream(self, token: str, idf: float) -> Iterator[Tuple[float, int]]:
+        docs = self.postings[token]
+        for doc_id in self._ranked_docs(token):
+            yield idf * self._impact(docs[doc_id], doc_id), doc_id
+    
+    def _search_exact(self, groups: List[List[Tuple[str, float]]], limit: int) -> List[Tuple[int, float]]:
+        # Every query term has to match; intersect starting from the rarest term
+        candidates = None
+        for group in groups:
+            docs = set()
+            for token, _ in group:
+                docs.update(self.postings[token])
+            candidates = docs if candidates is None else candidates & docs
+            if not candidates:
+                return []
+        
+        scores = {doc_id: sum(self._group_score(group, doc_id) for group in groups) for doc_id in candidates}
+        # Ties go to the newest card, matching the Postgres ORDER BY rank DESC, id DESC
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+    
+    def _search_ranked(self, groups: List[List[Tuple[str, float]]], limit: int) -> List[Tuple[int, float]]:
+        # Threshold algorithm: walk every term's postings from the highest impact down and stop once
+        # no unseen card can beat the current top results
+        frontiers = []
+        bounds = []
+        for group in groups:
+            heads = []
+            for position, (token, idf) in enumerate(group):
+                stream = self._token_stream(token, idf)
+                impact, doc_id = next(stream)
+                heads.append((-impact, -doc_id, position, stream))
+            heapq.heapify(heads)
+            frontiers.append(heads)
+            bounds.append(-heads[0][0])
+        
+        seen = set()
+        top: List[Tuple[float, int]] = []
+        
+        while True:
+            for index, heads in enumerate(frontiers):
+                # A card has to match every term, so an exhausted term means all matches were seen
+                if not heads:
+                    return [(doc_id, score) for score, doc_id in sorted(top, reverse=True)]
+                
+                _, doc_id, position, stream = heads[0]
+                doc_id = -doc_id
+                item = next(stream, None)
+                
+                if item is None:
+                    heapq.heappop(heads)
+                else:
+                    heapq.heapreplace(heads, (-item[0], -item[1], position, stream))
+                
+                if heads:
+                    bounds[index] = -heads[0][0]
+                
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                
+                score = 0.0
+                for group in groups:
+                    group_score = self._group_score(group, doc_id)
+                    if not group_score:
+                        break
+                    score += group_score
+                else:
+                    if len(top) < limit:
+                        heapq.heappush(top, (score, doc_id))
+                    elif (score, doc_id) > top[0]:
+                        heapq.heapreplace(top, (score, doc_id))
+            
+            if len(top) == limit and top[0][0] >= sum(bounds):
+                return [(doc_id, score) for score, doc_id in sorted(top, reverse=True)]
+    
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        tokens = tokenize(query)
+        
+        if not tokens or not self.lengths or limit <= 0:
+            return []
+        
+        expanded = [[token] if token in self.postings else [] for token in tokens[:-1]]
+        expanded.append(self._expand(tokens[-1]))
+        
+        if not all(expanded):
+            return []
+        
+        self._refresh_average()
+        groups = sorted(
+            ([(token, self._idf(token)) for token in group] for group in dict.fromkeys(map(tuple, expanded))),
+            key=lambda group: sum(len(self.postings[token]) for token, _ in group)
+        )
+        
+        if sum(len(self.postings[token]) for token, _ in groups[0]) <= self.EXACT_SCAN_LIMIT:
+            return self._search_exact(groups, limit)
+        
+        return self._search_ranked(groups, limit)
\ No newline at end of file
@@ -0,0 +1,268 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Callable, Optional, Union
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.config import config
+from bot.utils.cache import TTLCache
+from bot.utils.logger import logger
+from bot.utils.metrics import registry
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BROADCAST = 1
+
+
+send_queue_depth = registry.gauge(
+    "bot_send_queue_depth", "Outgoing requests waiting for a global send token", ("priority",)
+)
+send_chat_waiting = registry.gauge(
+    "bot_send_chat_waiting", "Outgoing requests waiting for their chat's send token"
+)
+send_wait = registry.histogram(
+    "bot_send_wait_seconds", "Time an outgoing request waited for send tokens", ("priority",)
+)
+
+
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def send_priority(priority: Priority):
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, timer: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.timer = timer
+        self.tokens = capacity
+        self.updated = timer()
+    
+    def _refill(self):
+        now = self.timer()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self) -> float:
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+    
+    def reserve(self) -> float:
+        # Takes the token now even if it has to be borrowed, so callers queue up in arrival order
+        wait = self.wait_time()
+        self.tokens -= 1
+        return wait
+    
+    def penalize(self, seconds: float):
+        # retry_after turns into a debt the bucket has to refill before it grants anything again
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class SendScheduler:
+    WAIT_SAMPLES = 1000
+    
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, group_rate: float,
+                 max_retries: int, timer: Callable[[], float] = time.monotonic):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.timer = timer
+        self.global_bucket = TokenBucket(global_rate, global_rate, timer)
+        # An idle bucket refills completely within a minute, so forgetting it loses nothing
+        self.chat_buckets = TTLCache(config.SEND_CHAT_BUCKETS, 60, timer)
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.chat_waiting = 0
+        self.sent = 0
+        self.retries = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._waits = deque(maxlen=self.WAIT_SAMPLES)
+    
+    @classmethod
+    def from_config(cls) -> "SendScheduler":
+        return cls(
+            global_rate=config.SEND_GLOBAL_RATE,
+            chat_rate=config.SEND_CHAT_RATE,
+            chat_burst=config.SEND_CHAT_BURST,
+            group_rate=config.SEND_GROUP_RATE,
+            max_retries=config.SEND_MAX_RETRIES
+        )
+    
+    def chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        
+        if bucket is None:
+            # Groups and channels have negative ids or @usernames and a much lower limit
+            is_group = not isinstance(chat_id, int) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = TokenBucket(rate, 1 if is_group else self.chat_burst, self.timer)
+        
+        self.chat_buckets.set(chat_id, bucket)
+        return bucket
+    
+    async def acquire(self, chat_id: Optional[Union[int, str]], priority: Priority = Priority.INTERACTIVE):
+        started = self.timer()
+        
+        if chat_id is not None:
+            wait = self.chat_bucket(chat_id).reserve()
+            
+            if wait > 0:
+                self.chat_waiting += 1
+                try:
+                    await asyncio.sleep(wait)
+                finally:
+                    self.chat_waiting -= 1
+        
+        if self._waiting or self.global_bucket.wait_time() > 0:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+            self._ensure_dispatcher()
+            self._wakeup.set()
+            await future
+        else:
+            self.global_bucket.consume()
+        
+        self._record_wait(self.timer() - started, priority)
+    
+    def penalize(self, chat_id: Optional[Union[int, str]], seconds: float):
+        if chat_id is None:
+            self.global_bucket.penalize(seconds)
+        else:
+            self.chat_bucket(chat_id).penalize(seconds)
+    
+    def _record_wait(self, wait: float, priority: Priority):
+        send_wait.observe(wait, priority.name.lower())
+        self.sent += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self._waits.append(wait)
+    
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+    
+    async def _dispatch(self):
+        # Hands out global tokens strictly by priority, then by arrival
+        while True:
+            if not self._waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            
+            wait = self.global_bucket.wait_time()
+            
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            
+            _, _, future = heapq.heappop(self._waiting)
+            
+            if future.done():
+                continue
+            
+            self.global_bucket.consume()
+            future.set_result(None)
+    
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        
+        for _, _, future in self._waiting:
+            future.cancel()
+        self._waiting.clear()
+    
+    def queued(self) -> dict:
+        queued = {priority.name.lower(): 0 for priority in Priority}
+        for priority, _, future in self._waiting:
+            if not future.done():
+                queued[Priority(priority).name.lower()] += 1
+        
+        return queued
+    
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        
+        return {
+            'queued': self.queued(),
+            'chat_waiting': self.chat_waiting,
+            'sent': self.sent,
+            'retries': self.retries,
+            'wait_avg_ms': round(self.wait_total / self.sent * 1000, 1) if self.sent else 0.0,
+            'wait_p95_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            'wait_max_ms': round(self.wait_max * 1000, 1)
+        }
+
+
+def throttled_chat(method) -> tuple:
+    # Only calls that post or edit messages count against flood limits; answers to callback,
+    # inline and pre-checkout queries as well as getUpdates and friends go straight through
+    chat_id = getattr(method, 'chat_id', None)
+    
+    if chat_id is not None:
+        return True, chat_id
+    
+    return getattr(method, 'inline_message_id', None) is not None, None
+
+
+class ThrottlingMiddleware(BaseRequestMiddleware):
+    def __init__(self, scheduler: SendScheduler):
+        self.scheduler = scheduler
+    
+    async def __call__(self, make_request, bot, method):
+        throttled, chat_id = throttled_chat(method)
+        
+        if not throttled:
+            return await make_request(bot, method)
+        
+        attempt = 0
+        
+        while True:
+            await self.scheduler.acquire(chat_id, current_priority.get())
+            
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.scheduler.max_retries:
+                    raise
+                
+                attempt += 1
+                self.scheduler.retries += 1
+                logger.warning(
+                    "Flood limit on %s to chat %s, retrying in %ss (attempt %s)",
+                    type(method).__name__, chat_id, e.retry_after, attempt
+                )
+                self.scheduler.penalize(chat_id, e.retry_after)
+
+
+send_scheduler = SendScheduler.from_config()
+send_queue_depth.set_function(lambda: [((priority,), count) for priority, count in send_scheduler.queued().items()])
+send_chat_waiting.set_function(lambda: [((), send_scheduler.chat_waiting)])
\ No newline at end of file
@@ -0,0 +1,150 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject, Update
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from bot.config import config
+from bot.utils.logger import logger
+from bot.utils.metrics import COUNT_BUCKETS, STATEMENT_BUCKETS, registry
+
+SLOWEST_STATEMENTS = 5
+
+update_duration = registry.histogram(
+    "bot_update_duration_seconds", "Time to process one update end to end", ("event_type",)
+)
+handler_duration = registry.histogram(
+    "bot_handler_duration_seconds", "Time spent in the handler that took the update", ("router", "handler")
+)
+statement_duration = registry.histogram(
+    "bot_db_statement_duration_seconds", "Database statement execution time", ("operation",), STATEMENT_BUCKETS
+)
+update_statements = registry.histogram(
+    "bot_update_db_statements", "Database statements executed per update", ("event_type",), COUNT_BUCKETS
+)
+slow_updates = registry.counter(
+    "bot_slow_updates_total", "Updates slower than SLOW_UPDATE_MS", ("event_type",)
+)
+
+
+class UpdateTiming:
+    __slots__ = ("update_id", "event_type", "handler", "handler_seconds", "db_seconds", "statements")
+    
+    def __init__(self, update_id: int, event_type: str):
+        self.update_id = update_id
+        self.event_type = event_type
+        self.handler: Optional[str] = None
+        self.handler_seconds = 0.0
+        self.db_seconds = 0.0
+        self.statements: List[Tuple[float, str]] = []
+    
+    def add_statement(self, seconds: float, statement: str):
+        self.db_seconds += seconds
+        self.statements.append((seconds, statement))
+    
+    def breakdown(self, total: float) -> str:
+        slowest = sorted(self.statements, reverse=True)[:SLOWEST_STATEMENTS]
+        lines = [
+            f"Slow update {self.update_id} ({self.event_type}): {total * 1000:.1f} ms total, "
+            f"handler {self.handler or 'none'} {self.handler_seconds * 1000:.1f} ms, "
+            f"{len(self.statements)} statements {self.db_seconds * 1000:.1f} ms, "
+            f"other {(total - self.handler_seconds) * 1000:.1f} ms"
+        ]
+        lines.extend(f"  {seconds * 1000:8.1f} ms  {' '.join(statement.split())[:200]}" for seconds, statement in slowest)
+        return "\n".join(lines)
+
+
+current_timing: ContextVar[Optional[UpdateTiming]] = ContextVar("current_timing", default=None)
+
+
+def handler_labels(data: Dict[str, Any]) -> Tuple[str, str]:
+    callback = data["handler"].callback
+    return callback.__module__, getattr(callback, "__qualname__", repr(callback))
+
+
+class UpdateTimingMiddleware(BaseMiddleware):
+    def __init__(self, slow_threshold: float):
+        self.slow_threshold = slow_threshold
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        timing = UpdateTiming(event.update_id, event.event_type)
+        token = current_timing.set(timing)
+        started = time.perf_counter()
+        
+        try:
+            return await handler(event, data)
+        finally:
+            total = time.perf_counter() - started
+            current_timing.reset(token)
+            
+            update_duration.observe(total, timing.event_type)
+            update_statements.observe(len(timing.statements), timing.event_type)
+            
+            if total >= self.slow_threshold:
+                slow_updates.inc(timing.event_type)
+                logger.warning(timing.breakdown(total))
+
+
+class HandlerTimingMiddleware(BaseMiddleware):
+    # Inner middlewares only run once filters picked a handler, so data["handler"] is the one that ran
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        router, name = handler_labels(data)
+        started = time.perf_counter()
+        
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            handler_duration.observe(elapsed, router, name)
+            
+            timing = current_timing.get()
+            if timing is not None:
+                timing.handler = f"{router}.{name}"
+                timing.handler_seconds += elapsed
+
+
+def install_timing(dispatcher: Dispatcher, slow_threshold: Optional[float] = None):
+    if slow_threshold is None:
+        slow_threshold = config.SLOW_UPDATE_MS / 1000
+    
+    dispatcher.update.outer_middleware(UpdateTimingMiddleware(slow_threshold))
+    handler_timing = HandlerTimingMiddleware()
+    
+    # Inner middlewares of a router also wrap handlers of every router included into it
+    for name, observer in dispatcher.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_timing)
+
+
+def instrument_engine(engine: AsyncEngine):
+    # The async engine runs its sync core in a greenlet that shares the calling task's
+    # context, so current_timing here is the update that issued the statement
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.timing_started = time.perf_counter()
+    
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is None or not hasattr(context, "timing_started"):
+            return
+        
+        elapsed = time.perf_counter() - context.timing_started
+        statement_duration.observe(elapsed, statement.split(None, 1)[0].upper())
+        
+        timing = current_timing.get()
+        if timing is not None:
+            timing.add_statement(elapsed, statement)
\ No newline at end of file
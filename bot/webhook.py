@@ -0,0 +1,122 @@
+import asyncio
+import signal
+from typing import Any, Dict
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from bot.config import config
+from bot.utils.logger import logger
+from bot.utils.metrics import metrics_handler
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrency: int,
+                 drain_timeout: float, **kwargs: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, **kwargs)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.drain_timeout = drain_timeout
+        self.accepting = True
+    
+    async def _run_update(self, bot: Bot, update: Dict[str, Any]):
+        try:
+            await self._background_feed_update(bot=bot, update=update)
+        except Exception as e:
+            logger.exception("Failed to process update %s: %s", update.get('update_id'), e)
+        finally:
+            self.semaphore.release()
+    
+    async def _handle_request_background(self, bot: Bot, request: web.Request) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        
+        # Waiting here instead of inside the task keeps the number of live tasks bounded
+        # and delays the HTTP answer, so Telegram throttles delivery when we are saturated.
+        await self.semaphore.acquire()
+        
+        task = asyncio.create_task(self._run_update(bot, update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        
+        return web.json_response({}, dumps=bot.session.json_dumps)
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        if not self.accepting:
+            return web.Response(status=503, text="Shutting down")
+        
+        return await super().handle(request)
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._background_feed_update_tasks)
+    
+    async def drain(self):
+        self.accepting = False
+        tasks = set(self._background_feed_update_tasks)
+        
+        if not tasks:
+            return
+        
+        logger.info("Draining %s in-flight updates", len(tasks))
+        done, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+        
+        for task in pending:
+            task.cancel()
+        
+        if pending:
+            logger.warning("Cancelled %s updates after %ss drain timeout", len(pending), self.drain_timeout)
+    
+    async def close(self) -> None:
+        await self.drain()
+        await super().close()
+
+
+def create_app(dispatcher: Dispatcher, bot: Bot) -> web.Application:
+    app = web.Application()
+    
+    handler = BoundedRequestHandler(
+        dispatcher,
+        bot,
+        max_concurrency=config.WEBHOOK_MAX_CONCURRENCY,
+        drain_timeout=config.WEBHOOK_DRAIN_TIMEOUT,
+        secret_token=config.WEBHOOK_SECRET or None
+    )
+    handler.register(app, path=config.WEBHOOK_PATH)
+    app["webhook_handler"] = handler
+    app.router.add_get(config.METRICS_PATH, metrics_handler)
+    setup_application(app, dispatcher, bot=bot)
+    
+    return app
+
+
+async def run_webhook(dispatcher: Dispatcher, bot: Bot):
+    app = create_app(dispatcher, bot)
+    
+    await bot.set_webhook(
+        url=f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+        secret_token=config.WEBHOOK_SECRET or None,
+        allowed_updates=dispatcher.resolve_used_update_types(),
+        max_connections=min(config.WEBHOOK_MAX_CONCURRENCY, 100)
+    )
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+    
+    logger.info("Webhook server listening on %s:%s%s", config.WEBHOOK_HOST, config.WEBHOOK_PORT, config.WEBHOOK_PATH)
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Stopping webhook server")
+        await runner.cleanup()
\ No newline at end of file
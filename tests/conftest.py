@@ -0,0 +1,26 @@
+import os
+
+# Logging is configured on import; keep test runs from appending to ./bot.log
+os.environ["LOG_FILE"] = ""
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+
+from bot.database.models import Base
+from bot.database.database import Database
+
+
+@pytest.fixture
+async def test_db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+    
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    db = Database("sqlite+aiosqlite:///:memory:")
+    db.engine = engine
+    db.session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    
+    yield db
+    
+    await engine.dispose()
\ No newline at end of file
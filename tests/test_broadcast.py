@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+from sqlalchemy import select
+
+from bot.database.models import User, BroadcastStatus
+from bot.utils.broadcast import Broadcaster
+
+
+def make_bot(blocked=()):
+    delivered = []
+    
+    async def send_message(chat_id, text, **kwargs):
+        if chat_id in blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "Forbidden: bot was blocked by the user")
+        delivered.append(chat_id)
+    
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=send_message)
+    return bot, delivered
+
+
+@pytest.mark.asyncio
+async def test_broadcast_delivers_and_marks_blocked(test_db):
+    for user_id in range(1, 26):
+        await test_db.add_user(user_id, f"user{user_id}", "User")
+    
+    bot, delivered = make_bot(blocked={3, 17})
+    broadcaster = Broadcaster(test_db, batch_size=10, concurrency=4)
+    broadcast = await test_db.create_broadcast(1, "<b>Новости</b>")
+    
+    finished = await broadcaster.run(bot, broadcast)
+    
+    assert finished.status == BroadcastStatus.COMPLETED
+    assert (finished.sent_count, finished.blocked_count, finished.failed_count) == (23, 2, 0)
+    assert finished.last_user_id == 25
+    # 25 recipients plus the report to the admin
+    assert sorted(delivered) == sorted([user_id for user_id in range(1, 26) if user_id not in (3, 17)] + [1])
+    
+    async with test_db.session_maker() as session:
+        blocked = (await session.execute(select(User.id).where(User.is_blocked.is_(True)))).scalars().all()
+    assert sorted(blocked) == [3, 17]
+    assert await test_db.count_broadcast_recipients() == 23
+    
+    # Coming back to the bot lifts the mark
+    await test_db.add_user(3, "user3", "User")
+    assert await test_db.count_broadcast_recipients() == 24
+
+
+@pytest.mark.asyncio
+async def test_broadcast_resumes_from_checkpoint(test_db):
+    for user_id in range(1, 26):
+        await test_db.add_user(user_id, f"user{user_id}", "User")
+    
+    broadcast = await test_db.create_broadcast(1, "Привет")
+    await test_db.save_broadcast_progress(broadcast.id, 10, 10, 0, [])
+    
+    bot, delivered = make_bot()
+    broadcaster = Broadcaster(test_db, batch_size=10, concurrency=4)
+    await broadcaster.resume(bot)
+    await asyncio.gather(*broadcaster.tasks.values())
+    
+    finished = await test_db.get_broadcast(broadcast.id)
+    assert finished.status == BroadcastStatus.COMPLETED
+    assert finished.sent_count == 25
+    assert sorted(delivered[:-1]) == list(range(11, 26))
+    assert await test_db.get_running_broadcasts() == []
+
+
+@pytest.mark.asyncio
+async def test_broadcast_stop_keeps_progress(test_db):
+    for user_id in range(1, 51):
+        await test_db.add_user(user_id, f"user{user_id}", "User")
+    
+    release = asyncio.Event()
+    
+    async def send_message(chat_id, text, **kwargs):
+        await release.wait()
+    
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=send_message)
+    broadcaster = Broadcaster(test_db, batch_size=10, concurrency=10)
+    broadcast = await test_db.create_broadcast(1, "Привет")
+    task = broadcaster.start(bot, broadcast)
+    
+    await asyncio.sleep(0.05)
+    stopped = await broadcaster.stop(broadcast.id)
+    release.set()
+    finished = await task
+    
+    assert stopped.status == BroadcastStatus.CANCELLED
+    assert finished.status == BroadcastStatus.CANCELLED
+    assert (finished.sent_count, finished.last_user_id) == (10, 10)
+    assert await broadcaster.stop(broadcast.id) is None
\ No newline at end of file
@@ -0,0 +1,69 @@
+from bot.utils.cache import TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_cache_hit_and_miss():
+    cache = TTLCache(maxsize=10, ttl=60)
+    
+    assert cache.get("missing") is None
+    
+    cache.set("key", "value")
+    
+    assert cache.get("key") == "value"
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_cache_ttl_expiry():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    
+    cache.set("key", "value")
+    timer.now = 59
+    assert cache.get("key") == "value"
+    
+    timer.now = 60
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_custom_ttl():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    
+    cache.set("key", "value", ttl=5)
+    timer.now = 5
+    
+    assert cache.get("key") is None
+
+
+def test_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.evictions == 1
+
+
+def test_cache_pop_and_stats():
+    cache = TTLCache(maxsize=2, ttl=60)
+    
+    cache.set("a", 1)
+    cache.pop("a")
+    cache.pop("missing")
+    
+    assert cache.get("a") is None
+    assert cache.stats() == {'size': 0, 'maxsize': 2, 'hits': 0, 'misses': 1, 'evictions': 0}
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+from sqlalchemy import func, select
+
+from bot.database.models import Base, Payment, Purchase, UserStats
+from bot.database.database import Database
+from bot.handlers import payment as payment_handlers
+
+
+@pytest.fixture
+async def shared_db(tmp_path):
+    # Every session gets its own connection here, unlike the in-memory fixture,
+    # so concurrent transactions really contend. Set TEST_DATABASE_URL to run
+    # against Postgres.
+    url = os.getenv("TEST_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'concurrency.db'}")
+    db = Database(url)
+    
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    
+    yield db
+    
+    async with db.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    
+    await db.engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_parallel_purchases_do_not_lose_updates(shared_db):
+    seller = await shared_db.add_user(user_id=1, username="seller", first_name="Seller")
+    buyer = await shared_db.add_user(user_id=2, username="buyer", first_name="Buyer")
+    card = await shared_db.add_card(
+        user_id=seller.id,
+        title="Popular product",
+        description="Everybody buys it",
+        price=Decimal('10.00')
+    )
+    
+    payments = 200
+    await asyncio.gather(*[
+        shared_db.add_purchase(
+            user_id=buyer.id,
+            card_id=card.id,
+            amount=Decimal('10.00'),
+            seller_id=seller.id
+        )
+        for _ in range(payments)
+    ])
+    
+    assert await shared_db.get_balance(seller.id) == Decimal('10.00') * payments
+
+
+@pytest.mark.asyncio
+async def test_parallel_withdrawals_never_overdraw(shared_db):
+    user = await shared_db.add_user(user_id=1, username="seller", first_name="Seller")
+    await shared_db.update_user_balance(user.id, Decimal('100.00'))
+    
+    results = await asyncio.gather(*[
+        shared_db.create_withdrawal(user.id, Decimal('10.00'), f"req{i}")
+        for i in range(50)
+    ])
+    
+    assert sum(1 for withdrawal in results if withdrawal is not None) == 10
+    
+    assert await shared_db.get_balance(user.id) == Decimal('0.00')
+
+
+@pytest.mark.asyncio
+async def test_replayed_payment_update_is_processed_once(shared_db, monkeypatch):
+    seller = await shared_db.add_user(user_id=1, username="seller", first_name="Seller")
+    buyer = await shared_db.add_user(user_id=2, username="buyer", first_name="Buyer")
+    card = await shared_db.add_card(
+        user_id=seller.id,
+        title="Popular product",
+        description="Everybody buys it",
+        price=Decimal('10.00')
+    )
+    monkeypatch.setattr(payment_handlers, "db", shared_db)
+    
+    # The same update redelivered over and over, as after a crash or by webhook retries
+    message = SimpleNamespace(
+        from_user=SimpleNamespace(id=buyer.id),
+        successful_payment=SimpleNamespace(
+            invoice_payload=f"card_{card.id}",
+            total_amount=1000,
+            currency="RUB",
+            telegram_payment_charge_id="tg_charge_1",
+            provider_payment_charge_id="provider_charge_1"
+        ),
+        answer=AsyncMock()
+    )
+    
+    await asyncio.gather(*[payment_handlers.successful_payment(message) for _ in range(1000)])
+    
+    assert message.answer.await_count == 1
+    
+    assert await shared_db.get_balance(seller.id) == Decimal('10.00')
+    
+    async with shared_db.session_maker() as session:
+        assert await session.scalar(select(func.count()).select_from(Payment)) == 1
+        assert await session.scalar(select(func.count()).select_from(Purchase)) == 1
+        assert (await session.get(UserStats, seller.id)).sales_count == 1
\ No newline at end of file
@@ -1,25 +1,21 @@
 import pytest
 from decimal import Decimal
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, select, update
 
-from bot.database.models import Base, User, Card, ModerationStatus, Purchase, Withdrawal, WithdrawalStatus
-from bot.database.database import Database
+from bot.database.models import User, Card, ModerationStatus, Purchase, Withdrawal, WithdrawalStatus, UserStats
+from bot.database.database import live_user_stats_query
 
 
 @pytest.fixture
-async def test_db():
-    engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
+def statements(test_db):
+    executed = []
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
     
-    db = Database("sqlite+aiosqlite:///:memory:")
-    db.engine = engine
-    db.session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    
-    yield db
-    
-    await engine.dispose()
+    event.listen(test_db.engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(test_db.engine.sync_engine, "before_cursor_execute", record)
 
 
 @pytest.mark.asyncio
@@ -33,7 +29,7 @@ async def test_add_user(test_db):
     assert user.id == 12345
     assert user.username == "testuser"
     assert user.first_name == "Test"
-    assert user.balance == Decimal('0.00')
+    assert await test_db.get_balance(user.id) == Decimal('0.00')
 
 
 @pytest.mark.asyncio
@@ -58,9 +54,12 @@ async def test_update_user_balance(test_db):
         first_name="Test"
     )
     
-    user = await test_db.update_user_balance(12345, Decimal('100.50'))
+    balance = await test_db.update_user_balance(12345, Decimal('100.50'))
     
-    assert user.balance == Decimal('100.50')
+    assert balance == Decimal('100.50')
+    assert await test_db.get_balance(12345) == Decimal('100.50')
+    assert await test_db.update_user_balance(99999, Decimal('1.00')) is None
+    assert await test_db.get_balance(99999) is None
 
 
 @pytest.mark.asyncio
@@ -103,6 +102,9 @@ async def test_update_card_status(test_db):
     
     assert updated_card.status == ModerationStatus.APPROVED
     assert updated_card.moderated_at is not None
+    
+    # Nothing changes on a repeated decision, so nothing is reported
+    assert await test_db.update_card_status(card.id, ModerationStatus.APPROVED) is None
 
 
 @pytest.mark.asyncio
@@ -137,8 +139,45 @@ async def test_add_purchase(test_db):
     assert purchase.card_id == card.id
     assert purchase.amount == Decimal('50.00')
     
-    updated_seller = await test_db.get_user(seller.id)
-    assert updated_seller.balance == Decimal('50.00')
+    assert await test_db.get_balance(seller.id) == Decimal('50.00')
+
+
+@pytest.mark.asyncio
+async def test_record_payment_is_idempotent(test_db, statements):
+    buyer = await test_db.add_user(user_id=12345, username="buyer", first_name="Buyer")
+    seller = await test_db.add_user(user_id=54321, username="seller", first_name="Seller")
+    card = await test_db.add_card(
+        user_id=seller.id,
+        title="Test Product",
+        description="Description",
+        price=Decimal('50.00')
+    )
+    payment = dict(
+        telegram_payment_charge_id="tg_charge_1",
+        provider_payment_charge_id="provider_charge_1",
+        user_id=buyer.id,
+        card_id=card.id,
+        amount=Decimal('50.00'),
+        currency="RUB",
+        invoice_payload=f"card_{card.id}",
+        seller_id=seller.id
+    )
+    
+    statements.clear()
+    purchase = await test_db.record_payment(**payment)
+    assert len(statements) == 4
+    assert purchase.payment_id is not None
+    
+    statements.clear()
+    assert await test_db.record_payment(**payment) is None
+    assert len(statements) == 1
+    
+    assert await test_db.get_balance(seller.id) == Decimal('50.00')
+    
+    async with test_db.session_maker() as session:
+        assert len((await session.execute(select(Purchase))).scalars().all()) == 1
+        stats = await session.get(UserStats, seller.id)
+        assert stats.sales_count == 1
 
 
 @pytest.mark.asyncio
@@ -161,8 +200,7 @@ async def test_create_withdrawal(test_db):
     assert withdrawal.amount == Decimal('50.00')
     assert withdrawal.status == WithdrawalStatus.PENDING
     
-    updated_user = await test_db.get_user(user.id)
-    assert updated_user.balance == Decimal('50.00')
+    assert await test_db.get_balance(user.id) == Decimal('50.00')
 
 
 @pytest.mark.asyncio
@@ -202,6 +240,9 @@ async def test_complete_withdrawal(test_db):
     
     assert completed.status == WithdrawalStatus.COMPLETED
     assert completed.completed_at is not None
+    
+    # A second click or a second admin must not pay out again
+    assert await test_db.complete_withdrawal(withdrawal.id) is None
 
 
 @pytest.mark.asyncio
@@ -260,4 +301,475 @@ async def test_get_user_statistics(test_db):
     assert stats[0]['user_id'] == 12345
     assert stats[0]['total_cards'] == 3
     assert stats[0]['approved'] == 1
-    assert stats[0]['rejected'] == 1
\ No newline at end of file
+    assert stats[0]['rejected'] == 1
+
+
+@pytest.mark.asyncio
+async def test_get_approved_cards_page(test_db):
+    await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    card_ids = []
+    for i in range(5):
+        card = await test_db.add_card(
+            user_id=12345,
+            title=f"Product {i}",
+            description=f"Description {i}",
+            price=Decimal('10.00')
+        )
+        await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+        card_ids.append(card.id)
+    
+    pending = await test_db.add_card(
+        user_id=12345,
+        title="Pending",
+        description="Pending description",
+        price=Decimal('10.00')
+    )
+    
+    first_page = await test_db.get_approved_cards_page(limit=2)
+    assert [card.id for card in first_page] == card_ids[::-1][:2]
+    
+    second_page = await test_db.get_approved_cards_page(anchor_id=first_page[-1].id, limit=2)
+    assert [card.id for card in second_page] == card_ids[::-1][2:4]
+    
+    previous_page = await test_db.get_approved_cards_page(anchor_id=second_page[0].id, limit=2, backward=True)
+    assert [card.id for card in previous_page] == [card.id for card in first_page]
+    
+    last_page = await test_db.get_approved_cards_page(anchor_id=card_ids[0], limit=2)
+    assert last_page == []
+    assert pending.id not in [card.id for card in first_page + second_page]
+
+
+@pytest.mark.asyncio
+async def test_approved_cards_page_after_anchor_deleted(test_db):
+    await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    card_ids = []
+    for i in range(3):
+        card = await test_db.add_card(
+            user_id=12345,
+            title=f"Product {i}",
+            description=f"Description {i}",
+            price=Decimal('10.00')
+        )
+        await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+        card_ids.append(card.id)
+    
+    assert await test_db.delete_card(card_ids[1])
+    
+    next_page = await test_db.get_approved_cards_page(anchor_id=card_ids[1], limit=1)
+    assert [card.id for card in next_page] == [card_ids[0]]
+    
+    previous_page = await test_db.get_approved_cards_page(anchor_id=card_ids[1], limit=1, backward=True)
+    assert [card.id for card in previous_page] == [card_ids[2]]
+
+
+@pytest.mark.asyncio
+async def test_count_approved_cards(test_db):
+    await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    card = await test_db.add_card(
+        user_id=12345,
+        title="Product",
+        description="Description",
+        price=Decimal('10.00')
+    )
+    
+    assert await test_db.count_approved_cards() == 0
+    
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    assert await test_db.count_approved_cards() == 1
+    
+    await test_db.delete_card(card.id)
+    assert await test_db.count_approved_cards() == 0
+
+
+@pytest.mark.asyncio
+async def test_card_cache_invalidation(test_db):
+    await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    card = await test_db.add_card(
+        user_id=12345,
+        title="Product",
+        description="Description",
+        price=Decimal('10.00')
+    )
+    
+    await test_db.get_card(card.id)
+    await test_db.get_card(card.id)
+    assert test_db.card_cache.hits == 1
+    
+    await test_db.update_card_field(card.id, "title", "New title")
+    cached = await test_db.get_card(card.id)
+    assert cached.title == "New title"
+    
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    assert [c.id for c in await test_db.get_approved_cards_page()] == [card.id]
+    
+    await test_db.update_card_status(card.id, ModerationStatus.REJECTED)
+    assert await test_db.get_approved_cards_page() == []
+    
+    await test_db.delete_card(card.id)
+    assert await test_db.get_card(card.id) is None
+
+
+@pytest.mark.asyncio
+async def test_get_pending_card_for_review(test_db):
+    await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    first = await test_db.add_card(
+        user_id=12345,
+        title="Product 1",
+        description="Description 1",
+        price=Decimal('10.00')
+    )
+    
+    second = await test_db.add_card(
+        user_id=12345,
+        title="Product 2",
+        description="Description 2",
+        price=Decimal('20.00')
+    )
+    
+    card, total = await test_db.get_pending_card_for_review()
+    
+    assert card.id == first.id
+    assert card.user.username == "testuser"
+    assert total == 2
+    
+    card, total = await test_db.get_pending_card_for_review(anchor_id=first.id)
+    assert card.id == second.id
+    
+    await test_db.update_card_status(first.id, ModerationStatus.APPROVED)
+    
+    card, total = await test_db.get_pending_card_for_review(anchor_id=second.id, backward=True)
+    assert card is None
+    assert total == 0
+    
+    card, total = await test_db.get_pending_card_for_review(anchor_id=first.id)
+    assert card.id == second.id
+    assert total == 1
+
+
+@pytest.mark.asyncio
+async def test_review_navigation_reuses_queue_count(test_db, statements):
+    await test_db.add_user(user_id=12345, username="testuser", first_name="Test")
+    cards = [
+        await test_db.add_card(12345, f"Product {index}", "Description", Decimal('10.00'))
+        for index in range(3)
+    ]
+    
+    statements.clear()
+    card, total = await test_db.get_pending_card_for_review()
+    assert (card.id, total) == (cards[0].id, 3)
+    assert len(statements) == 2
+    
+    statements.clear()
+    card, total = await test_db.get_pending_card_for_review(anchor_id=card.id)
+    assert (card.id, total) == (cards[1].id, 3)
+    assert len(statements) == 1
+    
+    await test_db.update_card_status(cards[0].id, ModerationStatus.APPROVED)
+    
+    card, total = await test_db.get_pending_card_for_review()
+    assert (card.id, total) == (cards[1].id, 2)
+
+
+@pytest.mark.asyncio
+async def test_get_pending_withdrawals_loads_author(test_db):
+    user = await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    await test_db.update_user_balance(user.id, Decimal('100.00'))
+    await test_db.create_withdrawal(user.id, Decimal('50.00'), "req1")
+    
+    pending = await test_db.get_pending_withdrawals()
+    
+    assert pending[0].user.username == "testuser"
+
+
+@pytest.mark.asyncio
+async def test_pending_withdrawals_keyset(test_db):
+    user = await test_db.add_user(
+        user_id=12345,
+        username="testuser",
+        first_name="Test"
+    )
+    
+    await test_db.update_user_balance(user.id, Decimal('100.00'))
+    
+    withdrawal_ids = []
+    for i in range(4):
+        withdrawal = await test_db.create_withdrawal(user.id, Decimal('10.00'), f"req{i}")
+        withdrawal_ids.append(withdrawal.id)
+    
+    page = await test_db.get_pending_withdrawals_page(limit=2)
+    assert [w.id for w in page] == withdrawal_ids[:2]
+    
+    page = await test_db.get_pending_withdrawals_page(anchor_id=withdrawal_ids[1], limit=2)
+    assert [w.id for w in page] == withdrawal_ids[2:]
+    
+    await test_db.complete_withdrawal(withdrawal_ids[1])
+    
+    withdrawal, total = await test_db.get_pending_withdrawal_for_review(anchor_id=withdrawal_ids[1])
+    assert withdrawal.id == withdrawal_ids[2]
+    assert total == 3
+    
+    withdrawal, total = await test_db.get_pending_withdrawal_for_review(anchor_id=withdrawal_ids[2], backward=True)
+    assert withdrawal.id == withdrawal_ids[0]
+
+
+@pytest.mark.asyncio
+async def test_add_user_upsert(test_db):
+    await test_db.add_user(user_id=12345, username="testuser", first_name="Test")
+    await test_db.update_user_balance(12345, Decimal('10.00'))
+    
+    user = await test_db.add_user(user_id=12345, username="renamed", first_name="Test")
+    
+    assert user.username == "renamed"
+    assert await test_db.get_balance(12345) == Decimal('10.00')
+    
+    test_db.user_cache.clear()
+    unchanged = await test_db.add_user(user_id=12345, username="renamed", first_name="Test")
+    
+    assert unchanged.username == "renamed"
+    
+    hits = test_db.user_cache.hits
+    cached = await test_db.add_user(user_id=12345, username="renamed", first_name="Test")
+    
+    assert cached is unchanged
+    assert test_db.user_cache.hits == hits + 1
+
+
+
+@pytest.mark.asyncio
+async def test_write_statement_counts(test_db, statements):
+    buyer = await test_db.add_user(user_id=12345, username="buyer", first_name="Buyer")
+    seller = await test_db.add_user(user_id=54321, username="seller", first_name="Seller")
+    assert len(statements) == 2
+    
+    statements.clear()
+    card = await test_db.add_card(
+        user_id=seller.id,
+        title="Product",
+        description="Description",
+        price=Decimal('10.00')
+    )
+    assert len(statements) == 2
+    assert card.created_at is not None
+    
+    statements.clear()
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    assert len(statements) == 3
+    
+    statements.clear()
+    await test_db.update_card_field(card.id, "title", "New title")
+    assert len(statements) == 1
+    
+    statements.clear()
+    await test_db.update_user_balance(seller.id, Decimal('100.00'))
+    assert len(statements) == 3
+    
+    statements.clear()
+    purchase = await test_db.add_purchase(buyer.id, card.id, Decimal('10.00'), seller.id)
+    assert len(statements) == 3
+    assert purchase.created_at is not None
+    
+    statements.clear()
+    withdrawal = await test_db.create_withdrawal(seller.id, Decimal('50.00'), "1234567890")
+    assert len(statements) == 3
+    assert withdrawal.created_at is not None
+    
+    statements.clear()
+    await test_db.complete_withdrawal(withdrawal.id)
+    assert len(statements) == 1
+    
+    statements.clear()
+    broadcast = await test_db.create_broadcast(seller.id, "Broadcast")
+    assert len(statements) == 1
+    assert broadcast.created_at is not None
+    assert broadcast.last_user_id == 0
+    
+    statements.clear()
+    await test_db.add_user(user_id=12345, username="buyer", first_name="Buyer")
+    assert statements == []
+
+
+async def stored_and_live_stats(db):
+    async with db.session_maker() as session:
+        stored = {
+            row.user_id: (row.total_cards, row.approved_cards, row.rejected_cards, row.sales_count, row.revenue)
+            for row in (await session.execute(select(UserStats))).scalars()
+        }
+        live = {
+            row.user_id: (row.total_cards, row.approved_cards, row.rejected_cards, row.sales_count, row.revenue)
+            for row in await session.execute(live_user_stats_query())
+        }
+    
+    return stored, live
+
+
+@pytest.mark.asyncio
+async def test_user_stats_follow_writes(test_db):
+    buyer = await test_db.add_user(user_id=12345, username="buyer", first_name="Buyer")
+    seller = await test_db.add_user(user_id=54321, username="seller", first_name="Seller")
+    
+    cards = [
+        await test_db.add_card(seller.id, f"Product {index}", "Description", Decimal('10.00'))
+        for index in range(4)
+    ]
+    await test_db.update_card_status(cards[0].id, ModerationStatus.APPROVED)
+    await test_db.update_card_status(cards[1].id, ModerationStatus.REJECTED)
+    await test_db.update_card_status(cards[2].id, ModerationStatus.APPROVED)
+    await test_db.update_card_status(cards[2].id, ModerationStatus.REJECTED)
+    await test_db.update_card_status(cards[0].id, ModerationStatus.APPROVED)
+    await test_db.delete_card(cards[1].id)
+    await test_db.add_purchase(buyer.id, cards[0].id, Decimal('10.00'), seller.id)
+    await test_db.add_purchase(buyer.id, cards[0].id, Decimal('12.50'), seller.id)
+    
+    stored, live = await stored_and_live_stats(test_db)
+    
+    assert stored == live
+    assert stored[seller.id] == (3, 1, 1, 2, Decimal('22.50'))
+    
+    statistics = {row['user_id']: row for row in await test_db.get_user_statistics()}
+    
+    assert statistics[buyer.id]['total_cards'] == 0
+    assert statistics[seller.id]['approved'] == 1
+    assert statistics[seller.id]['rejected'] == 1
+    assert statistics[seller.id]['sales'] == 2
+    assert statistics[seller.id]['revenue'] == Decimal('22.50')
+
+
+@pytest.mark.asyncio
+async def test_reconcile_and_rebuild_user_stats(test_db):
+    first = await test_db.add_user(user_id=1, username="first", first_name="First")
+    second = await test_db.add_user(user_id=2, username="second", first_name="Second")
+    card = await test_db.add_card(first.id, "Product", "Description", Decimal('10.00'))
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    
+    async with test_db.session_maker() as session:
+        await session.execute(update(UserStats).where(UserStats.user_id == first.id).values(approved_cards=5))
+        session.add(UserStats(user_id=second.id, total_cards=7))
+        await session.commit()
+    
+    fixes = await test_db.reconcile_user_stats()
+    
+    assert sorted(fix['user_id'] for fix in fixes) == [first.id, second.id]
+    assert await test_db.reconcile_user_stats() == []
+    
+    stored, live = await stored_and_live_stats(test_db)
+    assert stored[first.id] == live[first.id]
+    assert stored[second.id] == (0, 0, 0, 0, Decimal('0'))
+    
+    assert await test_db.rebuild_user_stats() == 1
+    
+    stored, live = await stored_and_live_stats(test_db)
+    assert stored == live
+
+
+@pytest.mark.asyncio
+async def test_get_user_statistics_page(test_db):
+    for user_id in range(1, 8):
+        await test_db.add_user(user_id=user_id, username=f"user{user_id}", first_name="User")
+    
+    buyer = await test_db.add_user(user_id=100, username="buyer", first_name="Buyer")
+    
+    # Sellers 1..6 get user_id % 3 sales, so revenue ties are broken by user_id
+    for user_id in range(1, 7):
+        card = await test_db.add_card(user_id, "Product", "Description", Decimal('10.00'))
+        if user_id % 2:
+            await test_db.update_card_status(card.id, ModerationStatus.REJECTED)
+        for _ in range(user_id % 3):
+            await test_db.add_purchase(buyer.id, card.id, Decimal('10.00'), user_id)
+    
+    page, has_more = await test_db.get_user_statistics_page('revenue', limit=2)
+    assert [row['user_id'] for row in page] == [5, 2]
+    assert has_more
+    
+    page, has_more = await test_db.get_user_statistics_page('revenue', page[-1]['user_id'], limit=2)
+    assert [row['user_id'] for row in page] == [4, 1]
+    assert has_more
+    
+    last, has_more = await test_db.get_user_statistics_page('revenue', page[-1]['user_id'], limit=2)
+    assert [row['user_id'] for row in last] == [6, 3]
+    assert not has_more
+    
+    previous, has_more = await test_db.get_user_statistics_page('revenue', last[0]['user_id'], limit=2, backward=True)
+    assert previous == page
+    assert has_more
+    
+    rejected, _ = await test_db.get_user_statistics_page('rejected', limit=3)
+    assert [row['user_id'] for row in rejected] == [5, 3, 1]
+    assert rejected[0]['sales'] == 2
+    assert rejected[0]['revenue'] == Decimal('20.00')
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_card_status(test_db, statements):
+    first = await test_db.add_user(user_id=1, username="first", first_name="First")
+    second = await test_db.add_user(user_id=2, username="second", first_name="Second")
+    
+    cards = [
+        await test_db.add_card(user_id, f"Product {index}", "Description", Decimal('10.00'))
+        for index, user_id in enumerate([first.id, first.id, second.id, second.id, second.id])
+    ]
+    await test_db.update_card_status(cards[0].id, ModerationStatus.REJECTED)
+    await test_db.get_approved_cards()
+    
+    statements.clear()
+    approved = await test_db.bulk_update_card_status(
+        ModerationStatus.APPROVED, card_ids=[cards[0].id, cards[1].id, cards[2].id]
+    )
+    
+    assert len(statements) == 2
+    assert sorted(card.id for card in approved) == [cards[1].id, cards[2].id]
+    assert all(card.status == ModerationStatus.APPROVED for card in approved)
+    assert len(await test_db.get_approved_cards()) == 2
+    
+    rejected = await test_db.bulk_update_card_status(ModerationStatus.REJECTED, seller_id=second.id)
+    
+    assert sorted(card.id for card in rejected) == [cards[3].id, cards[4].id]
+    assert (await test_db.get_card(cards[0].id)).status == ModerationStatus.REJECTED
+    assert await test_db.bulk_update_card_status(ModerationStatus.APPROVED, card_ids=[]) == []
+    
+    stored, live = await stored_and_live_stats(test_db)
+    assert stored == live
+    assert stored[second.id][:3] == (3, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_update_card_field_bumps_version(test_db):
+    await test_db.add_user(user_id=12345, username="testuser", first_name="Test")
+    card = await test_db.add_card(12345, "Product", "Description", Decimal('10.00'))
+    
+    assert card.version == 1
+    
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    edited = await test_db.update_card_field(card.id, "title", "Renamed")
+    
+    assert edited.version == 2
+    assert (await test_db.get_card(card.id)).version == 2
\ No newline at end of file
@@ -0,0 +1,97 @@
+import csv
+import pytest
+from decimal import Decimal
+from sqlalchemy import update
+
+from bot.database.models import ModerationStatus, User
+from bot.database.database import EXPORT_TABLES
+from bot.utils.export import write_csv, write_parquet
+
+
+@pytest.fixture
+async def test_db(test_db):
+    # The shared in-memory database, seeded with a seller and a mix of moderated cards
+    await test_db.add_user(user_id=1, username="seller", first_name="Продавец")
+    for index in range(25):
+        card = await test_db.add_card(1, f"Card {index}", "Описание, с запятой", Decimal('10.50'))
+        if index % 2:
+            await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    
+    return test_db
+
+
+@pytest.mark.asyncio
+async def test_stream_table_batches(test_db):
+    batches = [batch async for batch in test_db.stream_table("cards", batch_size=10)]
+    
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert [row.id for batch in batches for row in batch] == list(range(1, 26))
+
+
+@pytest.mark.asyncio
+async def test_write_csv(test_db, tmp_path):
+    path = tmp_path / "cards.csv"
+    columns = list(EXPORT_TABLES["cards"].columns)
+    
+    rows = await write_csv(str(path), columns, test_db.stream_table("cards", batch_size=10))
+    
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        records = list(csv.DictReader(file))
+    
+    assert rows == 25
+    assert len(records) == 25
+    assert records[0]['description'] == "Описание, с запятой"
+    assert records[0]['price'] == "10.50"
+    assert records[0]['status'] == "pending"
+    assert records[1]['status'] == "approved"
+
+
+@pytest.mark.asyncio
+async def test_write_parquet(test_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "cards.parquet"
+    columns = list(EXPORT_TABLES["cards"].columns)
+    
+    rows = await write_parquet(str(path), columns, test_db.stream_table("cards", batch_size=10))
+    parquet_file = pq.ParquetFile(path)
+    table = parquet_file.read()
+    
+    assert rows == 25
+    assert parquet_file.num_row_groups == 3
+    assert table.column('price')[0].as_py() == Decimal('10.50')
+    assert table.column('status').to_pylist()[:2] == ["pending", "approved"]
+
+
+@pytest.mark.asyncio
+async def test_write_parquet_users(test_db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "users.parquet"
+    await test_db.add_user(user_id=2, username="blocked", first_name="Blocked")
+    async with test_db.session_maker() as session:
+        await session.execute(update(User).where(User.id == 2).values(is_blocked=True))
+        await session.commit()
+    
+    rows = await write_parquet(str(path), list(EXPORT_TABLES["users"].columns), test_db.stream_table("users"))
+    table = pq.read_table(path)
+    
+    assert rows == 2
+    assert table.column('is_blocked').to_pylist() == [False, True]
+
+
+@pytest.mark.asyncio
+async def test_failed_export_is_reported(monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock
+    from bot.handlers import admin
+    
+    async def broken_writer(path, columns, batches):
+        raise ValueError("broken")
+    
+    monkeypatch.setitem(admin.EXPORT_FORMATS, "csv", broken_writer)
+    callback = MagicMock()
+    callback.data = "export:users:csv"
+    callback.answer = AsyncMock()
+    callback.message.answer = AsyncMock()
+    
+    await admin.export_table(callback)
+    
+    assert "Не удалось подготовить выгрузку" in callback.message.answer.call_args.args[0]
\ No newline at end of file
@@ -57,4 +57,216 @@ async def test_is_private_filter_group():
     filter_instance = IsPrivateFilter()
     result = await filter_instance(message)
     
-    assert result is False
\ No newline at end of file
+    assert result is False
+
+
+@pytest.mark.asyncio
+async def test_statistics_menu_fits_message_limit(mock_message, monkeypatch):
+    import html
+    import re
+    from decimal import Decimal
+    from bot.handlers import admin
+    
+    monkeypatch.setattr(config, "STATS_PAGE_SIZE", 15)
+    stats = [
+        {
+            'user_id': 10 ** 12 + index,
+            'username': None,
+            'first_name': "<b>" * 100,
+            'total_cards': 10 ** 9,
+            'approved': 10 ** 9,
+            'rejected': 10 ** 9,
+            'sales': 10 ** 9,
+            'revenue': Decimal('9999999999.99')
+        }
+        for index in range(config.STATS_PAGE_SIZE)
+    ]
+    database = MagicMock()
+    database.get_user_statistics_page = AsyncMock(return_value=(stats, True))
+    monkeypatch.setattr(admin, "db", database)
+    
+    await admin.statistics_menu(mock_message)
+    
+    text = mock_message.answer.call_args.args[0]
+    # Telegram applies the limit to the text left after parsing HTML entities
+    assert len(html.unescape(re.sub(r"<[^>]+>", "", text))) <= 4096
+    assert "<b><b>" not in text
+    database.get_user_statistics_page.assert_awaited_once_with("revenue", limit=15)
+
+
+@pytest.mark.asyncio
+async def test_bulk_moderation_flow(monkeypatch, test_db):
+    from decimal import Decimal
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from aiogram.types import CallbackQuery
+    from bot.database.models import ModerationStatus
+    from bot.handlers import admin
+    
+    monkeypatch.setattr(admin, "db", test_db)
+    
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    cards = [
+        await test_db.add_card(1, f"Product {index}", "Description", Decimal('10.00'))
+        for index in range(admin.BULK_PAGE_SIZE + 2)
+    ]
+    
+    state = FSMContext(storage=MemoryStorage(), key=StorageKey(bot_id=1, chat_id=1, user_id=1))
+    callback = MagicMock(spec=CallbackQuery)
+    callback.from_user = MagicMock(spec=User)
+    callback.from_user.id = 1
+    callback.answer = AsyncMock()
+    callback.message = MagicMock(spec=Message)
+    callback.message.answer = AsyncMock()
+    callback.message.edit_text = AsyncMock()
+    
+    await admin.bulk_open(callback, state)
+    assert (await state.get_data())['bulk_page'] == [card.id for card in cards[:admin.BULK_PAGE_SIZE]]
+    
+    for card in cards[:2]:
+        callback.data = f"bulk_toggle:{card.id}"
+        await admin.bulk_toggle(callback, state)
+    
+    callback.data = "bulk_apply:reject"
+    await admin.bulk_apply(callback, state)
+    
+    callback.data = "bulk_page:approve"
+    await admin.bulk_page(callback, state)
+    
+    statuses = [(await test_db.get_card(card.id)).status for card in cards]
+    assert statuses[:2] == [ModerationStatus.REJECTED] * 2
+    assert statuses[2:] == [ModerationStatus.APPROVED] * admin.BULK_PAGE_SIZE
+    assert "Нет карточек на модерации" in callback.message.edit_text.call_args.args[0]
+
+
+@pytest.mark.asyncio
+async def test_admin_callbacks_reject_other_users(monkeypatch):
+    from aiogram.dispatcher.event.bases import UNHANDLED
+    from aiogram.types import CallbackQuery
+    from bot.handlers import admin
+    
+    database = MagicMock()
+    database.bulk_update_card_status = AsyncMock(return_value=[])
+    database.complete_withdrawal = AsyncMock(return_value=None)
+    monkeypatch.setattr(admin, "db", database)
+    monkeypatch.setattr(config, "ADMIN_IDS", [1])
+    
+    for data in ("moderate_seller:7:0", "bulk_page:approve", "withdrawal_complete:3:0"):
+        callback = CallbackQuery(
+            id="1",
+            from_user=User(id=2, is_bot=False, first_name="Intruder"),
+            chat_instance="1",
+            data=data
+        )
+        assert await admin.router.propagate_event("callback_query", callback) is UNHANDLED
+    
+    database.bulk_update_card_status.assert_not_awaited()
+    database.complete_withdrawal.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_admin_messages_reject_other_users(monkeypatch):
+    from datetime import datetime
+    from aiogram.dispatcher.event.bases import UNHANDLED
+    from bot.handlers import admin
+    
+    database = MagicMock()
+    monkeypatch.setattr(admin, "db", database)
+    monkeypatch.setattr(config, "ADMIN_IDS", [1])
+    
+    for text in ("👨‍💼 Админ меню", "✅ Модерация", "📊 Статистика", "💸 Заявки на вывод", "📤 Экспорт", "📢 Рассылка"):
+        message = Message(
+            message_id=1,
+            date=datetime.now(),
+            chat=Chat(id=2, type="private"),
+            from_user=User(id=2, is_bot=False, first_name="Intruder"),
+            text=text
+        )
+        assert await admin.router.propagate_event("message", message) is UNHANDLED
+    
+    assert database.mock_calls == []
+
+
+@pytest.mark.asyncio
+async def test_double_tap_notifies_seller_once(monkeypatch, test_db):
+    from decimal import Decimal
+    from aiogram.types import CallbackQuery
+    from bot.handlers import admin
+    
+    notifier = MagicMock()
+    monkeypatch.setattr(admin, "db", test_db)
+    monkeypatch.setattr(admin, "notifier", notifier)
+    
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    card = await test_db.add_card(1, "Product", "Description", Decimal('10.00'))
+    
+    callback = MagicMock(spec=CallbackQuery)
+    callback.data = f"moderate_approve:{card.id}:0"
+    callback.from_user = MagicMock(spec=User)
+    callback.from_user.id = 1
+    callback.answer = AsyncMock()
+    callback.message = MagicMock(spec=Message)
+    callback.message.answer = AsyncMock()
+    callback.message.delete = AsyncMock()
+    callback.message.edit_text = AsyncMock()
+    
+    await admin.moderate_approve(callback)
+    await admin.moderate_approve(callback)
+    
+    notifier.notify.assert_called_once_with(1, admin.APPROVED, "Product")
+    assert callback.answer.call_args.args[0] == "Карточка уже обработана"
+
+
+@pytest.mark.asyncio
+async def test_pre_checkout_validates_card(monkeypatch):
+    import asyncio
+    from decimal import Decimal
+    from types import SimpleNamespace
+    from bot.database.models import ModerationStatus
+    from bot.handlers import payment
+    from bot.utils.metrics import LatencyRecorder
+    
+    card = SimpleNamespace(id=7, user_id=1, price=Decimal('10.50'), status=ModerationStatus.APPROVED)
+    database = MagicMock()
+    database.get_card = AsyncMock(return_value=card)
+    monkeypatch.setattr(payment, "db", database)
+    monkeypatch.setattr(payment, "pre_checkout_metrics", LatencyRecorder())
+    
+    def make_query(payload="card_7", total_amount=1050, currency="RUB"):
+        return SimpleNamespace(
+            invoice_payload=payload,
+            total_amount=total_amount,
+            currency=currency,
+            from_user=SimpleNamespace(id=2),
+            answer=AsyncMock()
+        )
+    
+    async def answer(query):
+        await payment.pre_checkout_handler(query)
+        return query.answer.call_args.kwargs
+    
+    assert (await answer(make_query()))['ok'] is True
+    assert (await answer(make_query(total_amount=1000)))['ok'] is False
+    assert (await answer(make_query(payload="card_x")))['ok'] is False
+    
+    card.status = ModerationStatus.REJECTED
+    assert "больше не продаётся" in (await answer(make_query()))['error_message']
+    
+    async def slow_get_card(card_id):
+        await asyncio.sleep(1)
+    
+    database.get_card = slow_get_card
+    monkeypatch.setattr(config, "PRE_CHECKOUT_TIMEOUT", 0.05)
+    assert (await answer(make_query()))['ok'] is False
+    
+    errors_before = payment.pre_checkout_outcomes.value("error")
+    database.get_card = AsyncMock(side_effect=ConnectionError("pool exhausted"))
+    answered = await answer(make_query())
+    assert answered['ok'] is False
+    assert "попробуйте ещё раз" in answered['error_message']
+    
+    stats = payment.pre_checkout_metrics.stats()
+    assert stats['outcomes'] == {'ok': 1, 'rejected': 3, 'timeout': 1, 'error': 1}
+    assert stats['max_ms'] < 500
+    assert payment.pre_checkout_outcomes.value("error") == errors_before + 1
+    assert payment.pre_checkout_duration.series().count >= 6
\ No newline at end of file
@@ -0,0 +1,135 @@
+import pytest
+from decimal import Decimal
+from sqlalchemy import insert, select, update
+
+from bot.database.models import BalanceSnapshot, LedgerEntry, LedgerAccount
+from bot.database.database import Database
+from bot.utils.ledger import LedgerMaintenance
+
+
+async def seed_activity(db: Database):
+    seller = await db.add_user(user_id=1, username="seller", first_name="Seller")
+    buyer = await db.add_user(user_id=2, username="buyer", first_name="Buyer")
+    card = await db.add_card(seller.id, "Product", "Description", Decimal('50.00'))
+    
+    await db.update_user_balance(seller.id, Decimal('100.00'))
+    await db.add_purchase(buyer.id, card.id, Decimal('50.00'), seller.id)
+    await db.create_withdrawal(seller.id, Decimal('30.00'), "1234567890")
+    return seller, buyer, card
+
+
+@pytest.mark.asyncio
+async def test_every_balance_change_is_a_balanced_transaction(test_db):
+    seller, buyer, card = await seed_activity(test_db)
+    
+    assert await test_db.create_withdrawal(seller.id, Decimal('500.00'), "1234567890") is None
+    assert await test_db.get_balance(seller.id) == Decimal('120.00')
+    
+    async with test_db.session_maker() as session:
+        entries = (await session.execute(select(LedgerEntry).order_by(LedgerEntry.id))).scalars().all()
+    
+    assert [(entry.account, entry.amount) for entry in entries if entry.user_id == seller.id] == [
+        (LedgerAccount.USER, Decimal('100.00')),
+        (LedgerAccount.USER, Decimal('50.00')),
+        (LedgerAccount.USER, Decimal('-30.00'))
+    ]
+    assert {entry.reference for entry in entries} >= {"adjustment", "purchase:1", "withdrawal:1"}
+    
+    report = await test_db.reconcile_ledger()
+    assert report['entries'] == 6
+    assert report['unbalanced_transactions'] == 0
+    assert report['accounts'] == {
+        'user': Decimal('120.00'),
+        'payments': Decimal('-50.00'),
+        'payouts': Decimal('30.00'),
+        'adjustments': Decimal('-100.00')
+    }
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_balances(test_db):
+    seller, buyer, card = await seed_activity(test_db)
+    horizon = await test_db.get_last_ledger_entry_id()
+    
+    assert await test_db.compact_balances(horizon) == 1
+    assert await test_db.compact_balances(horizon) == 0
+    
+    await test_db.add_purchase(buyer.id, card.id, Decimal('50.00'), seller.id)
+    assert await test_db.get_balance(seller.id) == Decimal('170.00')
+    
+    async with test_db.session_maker() as session:
+        snapshot = await session.get(BalanceSnapshot, seller.id)
+    assert snapshot.balance == Decimal('120.00')
+    assert snapshot.last_entry_id <= horizon
+    
+    assert await test_db.compact_balances(await test_db.get_last_ledger_entry_id()) == 1
+    assert await test_db.get_balance(seller.id) == Decimal('170.00')
+    assert await test_db.get_balance(buyer.id) == Decimal('0.00')
+    assert (await test_db.reconcile_ledger())['drifted_snapshots'] == 0
+
+
+@pytest.mark.asyncio
+async def test_reconciliation_reports_tampering(test_db):
+    seller, _, _ = await seed_activity(test_db)
+    await test_db.compact_balances(await test_db.get_last_ledger_entry_id())
+    
+    async with test_db.session_maker() as session:
+        await session.execute(update(BalanceSnapshot).values(balance=BalanceSnapshot.balance + 1))
+        await session.execute(insert(LedgerEntry).values(
+            transaction_id="orphan", account=LedgerAccount.USER, user_id=seller.id, amount=Decimal('5.00')
+        ))
+        await session.commit()
+    
+    report = await test_db.reconcile_ledger()
+    
+    assert report['unbalanced_transactions'] == 1
+    assert report['drifted_snapshots'] == 1
+
+
+@pytest.mark.asyncio
+async def test_maintenance_folds_entries_one_run_late(test_db):
+    seller, _, _ = await seed_activity(test_db)
+    maintenance = LedgerMaintenance(test_db, interval=60, reconcile_interval=3600)
+    
+    await maintenance.run_once()
+    assert maintenance.compacted == 0
+    assert maintenance.last_report['unbalanced_transactions'] == 0
+    
+    await maintenance.run_once()
+    assert maintenance.compacted == 1
+    assert maintenance.stats()['runs'] == 2
+    assert await test_db.get_balance(seller.id) == Decimal('120.00')
+
+
+@pytest.mark.asyncio
+async def test_reconciliation_repairs_late_committed_entry(test_db):
+    seller, _, _ = await seed_activity(test_db)
+    maintenance = LedgerMaintenance(test_db, interval=60, reconcile_interval=3600)
+    allocated = await test_db.get_last_ledger_entry_id()
+    
+    def legs(transaction_id: str, first_id: int):
+        return [
+            {'id': first_id, 'transaction_id': transaction_id, 'account': LedgerAccount.USER,
+             'user_id': seller.id, 'amount': Decimal('5.00')},
+            {'id': first_id + 1, 'transaction_id': transaction_id, 'account': LedgerAccount.ADJUSTMENTS,
+             'user_id': None, 'amount': Decimal('-5.00')}
+        ]
+    
+    # Ids are allocated in order but the first transaction commits after compaction
+    async with test_db.session_maker() as session:
+        await session.execute(insert(LedgerEntry), legs("early", allocated + 3))
+        await session.commit()
+    await test_db.compact_balances(await test_db.get_last_ledger_entry_id())
+    async with test_db.session_maker() as session:
+        await session.execute(insert(LedgerEntry), legs("late", allocated + 1))
+        await session.commit()
+    
+    assert await test_db.get_balance(seller.id) == Decimal('125.00')
+    
+    report = await maintenance.reconcile()
+    
+    assert report['unbalanced_transactions'] == 0
+    assert report['drifted_snapshots'] == 1
+    assert maintenance.stats()['repaired'] == 1
+    assert await test_db.get_balance(seller.id) == Decimal('130.00')
+    assert (await test_db.reconcile_ledger())['drifted_snapshots'] == 0
\ No newline at end of file
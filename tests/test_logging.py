@@ -0,0 +1,78 @@
+import json
+import logging
+import sys
+import pytest
+
+from bot.utils.logger import JsonFormatter, LogQueueHandler, create_file_handler, create_listener
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    listeners = []
+    
+    def build(max_bytes: int):
+        handler = create_file_handler(str(tmp_path / "bot.log"), max_bytes=max_bytes, backup_count=2)
+        listener = create_listener([handler], "json")
+        log = logging.getLogger(f"tests.pipeline.{len(listeners)}")
+        log.propagate = False
+        log.setLevel(logging.INFO)
+        log.addHandler(LogQueueHandler(listener.queue))
+        listener.start()
+        listeners.append((log, listener))
+        return log, listener
+    
+    yield build
+    
+    for log, listener in listeners:
+        log.handlers.clear()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def read_records(path) -> list:
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_queued_records_keep_logged_values(pipeline, tmp_path):
+    log, listener = pipeline(max_bytes=1024 * 1024)
+    stats = {'sent': 1}
+    
+    log.info("Broadcast %s: %s", 7, stats, extra={'user_id': 42})
+    stats['sent'] = 2
+    log.debug("Disabled %s", 9)
+    listener.stop()
+    
+    records = read_records(tmp_path / "bot.log")
+    
+    assert len(records) == 1
+    assert records[0]['message'] == "Broadcast 7: {'sent': 1}"
+    assert records[0]['user_id'] == 42
+    assert records[0]['level'] == "INFO"
+    assert records[0]['logger'] == log.name
+
+
+def test_log_file_rotates_by_size(pipeline, tmp_path):
+    log, listener = pipeline(max_bytes=300)
+    
+    for index in range(20):
+        log.info("User %s started the bot", index)
+    listener.stop()
+    
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["bot.log", "bot.log.1", "bot.log.2"]
+    assert read_records(tmp_path / "bot.log")[-1]['message'] == "User 19 started the bot"
+
+
+def test_json_formatter_keeps_tracebacks():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.getLogger("tests").makeRecord(
+            "tests", logging.ERROR, __file__, 1, "Update %s failed", (8,), sys.exc_info()
+        )
+    
+    prepared = LogQueueHandler(None).prepare(record)
+    entry = json.loads(JsonFormatter().format(prepared))
+    
+    assert prepared.args is None
+    assert entry['message'] == "Update 8 failed"
+    assert "RuntimeError: boom" in entry['exception']
\ No newline at end of file
@@ -0,0 +1,88 @@
+import logging
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Chat, Message, Update, User
+
+from bot.utils import timing
+from bot.utils.metrics import MetricsRegistry, metrics_handler
+
+
+def make_update(update_id: int, text: str) -> Update:
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(),
+            chat=Chat(id=1, type="private"),
+            from_user=User(id=1, is_bot=False, first_name="Test"),
+            text=text
+        )
+    )
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    latency = registry.histogram("test_seconds", "Test latency", ("handler",), buckets=(0.1, 1))
+    errors = registry.counter("test_errors_total", "Test errors", ("kind",))
+    
+    latency.observe(0.05, 'say "hi"')
+    latency.observe(0.1, 'say "hi"')
+    latency.observe(5, 'say "hi"')
+    errors.inc("timeout")
+    errors.inc("timeout", amount=2)
+    
+    lines = registry.render().splitlines()
+    
+    assert "# TYPE test_seconds histogram" in lines
+    assert 'test_seconds_bucket{handler="say \\"hi\\"",le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{handler="say \\"hi\\"",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{handler="say \\"hi\\"",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{handler="say \\"hi\\""} 3' in lines
+    assert 'test_errors_total{kind="timeout"} 3' in lines
+    
+    with pytest.raises(ValueError):
+        registry.counter("test_errors_total", "Duplicate")
+
+
+@pytest.mark.asyncio
+async def test_updates_are_timed_per_handler_with_statements(test_db, caplog):
+    router = Router()
+    
+    async def ping(message: Message):
+        await test_db.add_user(message.from_user.id, "test", "Test")
+        await test_db.get_user(message.from_user.id)
+    
+    router.message.register(ping)
+    dp = Dispatcher()
+    dp.include_router(router)
+    timing.install_timing(dp, slow_threshold=0)
+    timing.instrument_engine(test_db.engine)
+    
+    labels = (__name__, "test_updates_are_timed_per_handler_with_statements.<locals>.ping")
+    handled = timing.handler_duration.series(*labels)
+    handled_before = handled.count if handled else 0
+    statements_before = timing.update_statements.series("message")
+    statements_before = statements_before.total if statements_before else 0
+    
+    with caplog.at_level(logging.WARNING):
+        await dp.feed_update(Bot(token="42:TEST"), make_update(1, "ping"))
+    
+    assert timing.handler_duration.series(*labels).count == handled_before + 1
+    assert timing.update_statements.series("message").total - statements_before == 2
+    assert timing.statement_duration.series("SELECT").count >= 1
+    assert "Slow update 1 (message)" in caplog.text
+    assert f"handler {labels[0]}.{labels[1]}" in caplog.text
+    assert "2 statements" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_renders_registry():
+    timing.slow_updates.inc("test_event")
+    
+    response = await metrics_handler(MagicMock())
+    
+    assert response.content_type == "text/plain"
+    assert 'bot_slow_updates_total{event_type="test_event"} 1' in response.text
+    assert "# TYPE bot_handler_duration_seconds histogram" in response.text
\ No newline at end of file
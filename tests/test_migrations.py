@@ -0,0 +1,179 @@
+import pytest
+from decimal import Decimal
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import event, inspect, text
+
+from bot.database.models import Base, ModerationStatus, BroadcastStatus
+from bot.database.database import Database, build_alembic_config
+
+
+HOT_TABLES = ("users", "cards", "purchases", "withdrawals", "fsm_states", "user_stats", "broadcasts", "payments",
+              "ledger_entries", "balance_snapshots")
+
+
+@pytest.fixture
+async def migrated_db(tmp_path):
+    db = Database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}")
+    await db.init_db()
+    
+    yield db
+    
+    await db.engine.dispose()
+
+
+def schema_diff(connection):
+    return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+@pytest.mark.asyncio
+async def test_migrations_match_models(migrated_db):
+    async with migrated_db.engine.connect() as conn:
+        diff = await conn.run_sync(schema_diff)
+        version = (await conn.execute(text("SELECT version_num FROM alembic_version"))).scalar_one()
+    
+    assert diff == []
+    assert version == "0010"
+
+
+@pytest.mark.asyncio
+async def test_init_db_is_idempotent(migrated_db):
+    await migrated_db.init_db()
+    
+    async with migrated_db.engine.connect() as conn:
+        diff = await conn.run_sync(schema_diff)
+    
+    assert diff == []
+
+
+@pytest.mark.asyncio
+async def test_downgrade_to_base(migrated_db):
+    async with migrated_db.engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: command.downgrade(build_alembic_config(sync_conn), "base"))
+        tables = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+    
+    assert set(tables) == {"alembic_version"}
+
+
+@pytest.mark.asyncio
+async def test_init_db_adopts_create_all_database(tmp_path):
+    db = Database(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    
+    # The 1.0 schema, as create_all left it: no indexes and no alembic_version table
+    async with db.engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: command.upgrade(build_alembic_config(sync_conn), "0001"))
+        await conn.execute(text("DROP TABLE alembic_version"))
+        await conn.execute(text("INSERT INTO users (id, username, first_name, balance) VALUES (1, 'legacy', 'Legacy', 0)"))
+        await conn.execute(text("INSERT INTO users (id, username, first_name, balance) VALUES (2, 'seller', 'Seller', 25.5)"))
+    
+    await db.init_db()
+    
+    async with db.engine.connect() as conn:
+        diff = await conn.run_sync(schema_diff)
+    
+    assert diff == []
+    assert (await db.get_user(1)).username == "legacy"
+    assert await db.get_balance(1) == Decimal('0.00')
+    assert await db.get_balance(2) == Decimal('25.50')
+    assert (await db.reconcile_ledger())['accounts'] == {'user': Decimal('25.50'), 'adjustments': Decimal('-25.50')}
+    
+    await db.engine.dispose()
+
+
+async def exercise_queries(db: Database):
+    for user_id in range(1, 51):
+        await db.add_user(user_id, f"user{user_id}", "User")
+        await db.update_user_balance(user_id, Decimal('1000.00'))
+    
+    card_ids = []
+    for index in range(200):
+        card = await db.add_card(index % 50 + 1, f"Card {index}", "Description", Decimal('10.00'), None)
+        card_ids.append(card.id)
+    
+    for card_id in card_ids[::2]:
+        await db.update_card_status(card_id, ModerationStatus.APPROVED)
+    
+    await db.update_card_field(card_ids[1], "title", "Renamed")
+    await db.add_purchase(2, card_ids[0], Decimal('10.00'), 1)
+    await db.record_payment("tg_charge", "provider_charge", 2, card_ids[2], Decimal('10.00'), "RUB",
+                            f"card_{card_ids[2]}", 2)
+    await db.record_payment("tg_charge", "provider_charge", 2, card_ids[2], Decimal('10.00'), "RUB",
+                            f"card_{card_ids[2]}", 2)
+    withdrawal = await db.create_withdrawal(3, Decimal('50.00'), "card 1234")
+    await db.create_withdrawal(4, Decimal('50.00'), "card 5678")
+    
+    db.card_cache.clear()
+    db.catalog_cache.clear()
+    db.user_cache.clear()
+    
+    await db.get_user(1)
+    await db.get_card(card_ids[3])
+    await db.get_approved_cards()
+    await db.get_approved_cards_page()
+    await db.get_approved_cards_page(card_ids[10])
+    await db.get_approved_cards_page(card_ids[10], backward=True)
+    await db.count_approved_cards()
+    await db.get_pending_cards()
+    await db.get_pending_cards_page(card_ids[11])
+    await db.get_pending_card_for_review()
+    await db.get_pending_card_for_review(card_ids[11])
+    await db.get_pending_card_for_review(card_ids[11], backward=True)
+    await db.get_pending_withdrawals()
+    await db.get_pending_withdrawals_page(withdrawal.id)
+    await db.get_pending_withdrawal_for_review(withdrawal.id)
+    await db.complete_withdrawal(withdrawal.id)
+    await db.delete_card(card_ids[5])
+    
+    broadcast = await db.create_broadcast(1, "Broadcast")
+    recipients = await db.get_broadcast_recipients(0, 20)
+    await db.get_broadcast_recipients(recipients[-1], 20)
+    await db.save_broadcast_progress(broadcast.id, recipients[-1], 19, 0, [recipients[0]])
+    await db.get_running_broadcasts()
+    await db.finish_broadcast(broadcast.id, BroadcastStatus.COMPLETED)
+    
+    await db.compact_balances(await db.get_last_ledger_entry_id())
+    await db.update_user_balance(1, Decimal('5.00'))
+    await db.get_balance(1)
+    
+    for sort in ('revenue', 'cards', 'rejected'):
+        page, _ = await db.get_user_statistics_page(sort, limit=5)
+        await db.get_user_statistics_page(sort, page[-1]['user_id'], limit=5)
+        await db.get_user_statistics_page(sort, page[-1]['user_id'], limit=5, backward=True)
+
+
+def full_scans(connection, statement, parameters):
+    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    scans = []
+    
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        
+        # "SCAN cards USING INDEX ..." walks an index in order; only a bare SCAN reads the table
+        if words[:1] == ["SCAN"] and words[1] in HOT_TABLES and "USING" not in words:
+            scans.append(detail)
+    
+    return scans
+
+
+@pytest.mark.asyncio
+async def test_queries_use_indexes(migrated_db):
+    executed = []
+    
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            executed.append((statement, parameters))
+    
+    event.listen(migrated_db.engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await exercise_queries(migrated_db)
+    finally:
+        event.remove(migrated_db.engine.sync_engine, "before_cursor_execute", record)
+    
+    assert executed
+    
+    async with migrated_db.engine.connect() as conn:
+        for statement, parameters in executed:
+            scans = await conn.run_sync(full_scans, statement, parameters)
+            assert scans == [], f"{statement} -> {scans}"
\ No newline at end of file
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from bot.utils.notifications import (
+    SellerNotifier,
+    Notification,
+    format_notification,
+    APPROVED,
+    REJECTED,
+    SOLD,
+    MAX_LISTED_TITLES
+)
+
+
+def make_bot():
+    bot = MagicMock()
+    bot.send_message = AsyncMock()
+    return bot
+
+
+def test_format_single_and_coalesced():
+    assert "«Кеды &lt;new&gt;» одобрена" in format_notification([Notification(APPROVED, "Кеды <new>")])
+    
+    text = format_notification(
+        [Notification(APPROVED, f"Карточка {index}") for index in range(MAX_LISTED_TITLES + 2)]
+        + [Notification(SOLD, "Кеды", Decimal('10.00')), Notification(SOLD, "Шапка", Decimal('5.50'))]
+    )
+    
+    assert f"Одобрено ваших карточек: {MAX_LISTED_TITLES + 2}" in text
+    assert "… и ещё 2" in text
+    assert "Продаж: 2 на сумму 15.50 руб." in text
+    assert "Отклонено" not in text
+
+
+@pytest.mark.asyncio
+async def test_burst_is_coalesced_per_seller():
+    bot = make_bot()
+    notifier = SellerNotifier(window=0.05)
+    notifier.start(bot)
+    
+    for index in range(5):
+        notifier.notify(1, APPROVED, f"Карточка {index}")
+    notifier.notify_cards(REJECTED, [SimpleNamespace(user_id=2, title="Чужая")])
+    notifier.notify(1, SOLD, "Кеды", Decimal('10.00'))
+    
+    await asyncio.sleep(0.15)
+    await notifier.close()
+    
+    assert bot.send_message.await_count == 2
+    texts = {call.args[0]: call.args[1] for call in bot.send_message.await_args_list}
+    assert "Одобрено ваших карточек: 5" in texts[1] and "продана" in texts[1]
+    assert "отклонена" in texts[2]
+    assert notifier.stats()['sent'] == 2
+
+
+@pytest.mark.asyncio
+async def test_failures_are_isolated_and_pending_flushed_on_close():
+    bot = make_bot()
+    bot.send_message.side_effect = [RuntimeError("boom"), None]
+    notifier = SellerNotifier(window=60)
+    notifier.start(bot)
+    
+    notifier.notify(1, APPROVED, "Первая")
+    notifier.notify(2, APPROVED, "Вторая")
+    
+    await notifier.close()
+    
+    assert bot.send_message.await_count == 2
+    assert notifier.stats() == {'pending_sellers': 0, 'queued': 2, 'sent': 1, 'failed': 1}
+
+
+def test_notify_without_bot_is_noop():
+    notifier = SellerNotifier(window=1)
+    notifier.notify(1, APPROVED, "Карточка")
+    
+    assert notifier.stats()['pending_sellers'] == 0
\ No newline at end of file
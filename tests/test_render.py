@@ -0,0 +1,65 @@
+import pytest
+from datetime import datetime
+from decimal import Decimal
+
+from bot.database.models import Card, User, ModerationStatus
+from bot.utils import render
+
+
+@pytest.fixture(autouse=True)
+def clear_view_cache():
+    render.view_cache.clear()
+    yield
+    render.view_cache.clear()
+
+
+def make_card(**overrides) -> Card:
+    values = {
+        'id': 7,
+        'user_id': 1,
+        'title': "Book <new>",
+        'description': "Fish & chips",
+        'price': Decimal('10.00'),
+        'photo_id': None,
+        'status': ModerationStatus.PENDING,
+        'created_at': datetime(2026, 1, 2, 3, 4),
+        'version': 1,
+        'user': User(id=1, username="seller", first_name="Seller")
+    }
+    values.update(overrides)
+    return Card(**values)
+
+
+def test_catalog_view_is_memoized():
+    card = make_card()
+    
+    first = render.render_catalog_card(card, 0, 5)
+    second = render.render_catalog_card(card, 0, 5)
+    
+    assert second is first
+    assert "Book &lt;new&gt;" in first.text
+    assert "Fish &amp; chips" in first.text
+    assert render.render_catalog_card(card, 1, 5) is not first
+
+
+def test_card_edit_bumps_out_cached_view():
+    card = make_card()
+    old = render.render_catalog_card(card, 0, 5)
+    
+    edited = make_card(title="Renamed", version=2)
+    new = render.render_catalog_card(edited, 0, 5)
+    
+    assert new is not old
+    assert "Renamed" in new.text
+
+
+def test_moderation_view_tracks_author_name():
+    card = make_card()
+    
+    first = render.render_moderation_card(card, 0, 3)
+    assert render.render_moderation_card(card, 0, 3) is first
+    assert "@seller" in first.text
+    assert first.keyboard.inline_keyboard[0][0].callback_data == f"moderate_approve:{card.id}:0"
+    
+    card.user.username = "renamed"
+    assert "@renamed" in render.render_moderation_card(card, 0, 3).text
\ No newline at end of file
@@ -0,0 +1,188 @@
+import asyncio
+import random
+import pytest
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InlineQueryResultCachedPhoto
+
+from bot.database.models import ModerationStatus
+from bot.utils.cache import TTLCache
+from bot.utils.search import InvertedIndex, tokenize, tsquery_text
+
+
+def test_tokenize():
+    assert tokenize("Ёлка, Синяя-ЁЖИК 2024!") == ["елка", "синяя", "ежик", "2024"]
+    assert tsquery_text("красные  кеды") == "красные & кеды:*"
+    assert tsquery_text("!!!") == ""
+
+
+def test_index_ranks_title_over_description():
+    index = InvertedIndex()
+    index.add(1, "Чехол для телефона", "Силиконовый")
+    index.add(2, "Наушники", "Подходят к любому телефону и телефона тоже")
+    index.add(3, "Зарядка", "Быстрая")
+    
+    assert [doc_id for doc_id, _ in index.search("телефона", 10)] == [1, 2]
+    assert index.search("зарядка телефона", 10) == []
+
+
+def test_index_prefix_and_updates():
+    index = InvertedIndex()
+    index.add(1, "Телевизор", "Большой")
+    index.add(2, "Телефон", "Новый")
+    
+    assert sorted(doc_id for doc_id, _ in index.search("теле", 10)) == [1, 2]
+    assert [doc_id for doc_id, _ in index.search("новый тел", 10)] == [2]
+    
+    index.add(2, "Планшет", "Новый")
+    assert [doc_id for doc_id, _ in index.search("теле", 10)] == [1]
+    
+    index.remove(1)
+    assert index.search("теле", 10) == []
+    assert "телевизор" not in index.postings
+    assert len(index) == 1
+
+
+def test_ranked_search_matches_full_scan():
+    rng = random.Random(7)
+    words = [f"слово{number}" for number in range(200)]
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    
+    index = InvertedIndex()
+    for doc_id in range(3000):
+        index.add(
+            doc_id,
+            " ".join(rng.choices(words, weights=weights, k=3)),
+            " ".join(rng.choices(words, weights=weights, k=15))
+        )
+    
+    for _ in range(200):
+        query = " ".join(rng.choices(words, weights=weights, k=rng.randint(1, 3)))
+        if rng.random() < 0.5:
+            query = query[:-1]
+        
+        index.EXACT_SCAN_LIMIT = len(index)
+        expected = index.search(query, 15)
+        index.EXACT_SCAN_LIMIT = 0
+        ranked = index.search(query, 15)
+        
+        assert [round(score, 9) for _, score in ranked] == [round(score, 9) for _, score in expected]
+
+
+@pytest.mark.asyncio
+async def test_search_cards(test_db):
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    
+    cards = []
+    for index in range(12):
+        card = await test_db.add_card(1, f"Кроссовки модель {index}", "Удобные для бега", Decimal('50.00'))
+        await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+        cards.append(card)
+    
+    hidden = await test_db.add_card(1, "Кроссовки на модерации", "Удобные для бега", Decimal('50.00'))
+    
+    first, has_more = await test_db.search_cards("кроссовки", limit=10)
+    second, more_after = await test_db.search_cards("кроссовки", offset=10, limit=10)
+    
+    assert len(first) == 10 and has_more
+    assert len(second) == 2 and not more_after
+    assert hidden.id not in {card.id for card in first + second}
+    
+    await test_db.update_card_field(cards[0].id, "title", "Сандалии")
+    await test_db.update_card_status(cards[1].id, ModerationStatus.REJECTED)
+    await test_db.delete_card(cards[2].id)
+    await test_db.update_card_status(hidden.id, ModerationStatus.APPROVED)
+    
+    found, _ = await test_db.search_cards("кроссовки", limit=20)
+    found_ids = {card.id for card in found}
+    
+    assert found_ids == {card.id for card in cards[3:]} | {hidden.id}
+    assert [card.id for card in (await test_db.search_cards("сандал", limit=5))[0]] == [cards[0].id]
+
+
+@pytest.mark.asyncio
+async def test_search_index_is_built_from_existing_cards(test_db):
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    card = await test_db.add_card(1, "Велосипед", "Горный", Decimal('500.00'))
+    await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    
+    assert test_db.search_index is None
+    
+    found, _ = await test_db.search_cards("горный")
+    
+    assert [row.id for row in found] == [card.id]
+    assert len(test_db.search_index) == 1
+
+
+def make_inline_query(query: str, offset: str = ""):
+    inline_query = MagicMock(spec=InlineQuery)
+    inline_query.query = query
+    inline_query.offset = offset
+    inline_query.answer = AsyncMock()
+    return inline_query
+
+
+@pytest.mark.asyncio
+async def test_inline_search_pages_and_caches(test_db, monkeypatch):
+    from bot.handlers import search
+    
+    monkeypatch.setattr(search, "db", test_db)
+    monkeypatch.setattr(search, "inline_cache", TTLCache(100, 60))
+    
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    for index in range(25):
+        card = await test_db.add_card(1, f"Кеды {index}", "Белые", Decimal('10.00'),
+                                      photo_id="photo" if index % 2 else None)
+        await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+    
+    search_cards = AsyncMock(wraps=test_db.search_cards)
+    monkeypatch.setattr(test_db, "search_cards", search_cards)
+    
+    queries = [make_inline_query(text) for text in ("Кеды", "  кеды ", "КЕДЫ")]
+    await asyncio.gather(*(search.inline_search(query) for query in queries))
+    await search.inline_search(make_inline_query("кеды"))
+    
+    assert search_cards.await_count == 1
+    
+    results = queries[0].answer.await_args.args[0]
+    kwargs = queries[0].answer.await_args.kwargs
+    assert len(results) == search.INLINE_RESULTS_LIMIT
+    assert kwargs['next_offset'] == str(search.INLINE_RESULTS_LIMIT)
+    assert {type(result) for result in results} == {InlineQueryResultArticle, InlineQueryResultCachedPhoto}
+    
+    last_page = make_inline_query("кеды", kwargs['next_offset'])
+    await search.inline_search(last_page)
+    
+    assert len(last_page.answer.await_args.args[0]) == 5
+    assert last_page.answer.await_args.kwargs['next_offset'] == ""
+    assert search_cards.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_inline_empty_query_browses_catalog(test_db, monkeypatch):
+    from bot.handlers import search
+    
+    monkeypatch.setattr(search, "db", test_db)
+    monkeypatch.setattr(search, "inline_cache", TTLCache(100, 60))
+    
+    await test_db.add_user(user_id=1, username="seller", first_name="Seller")
+    cards = []
+    for index in range(search.INLINE_RESULTS_LIMIT + 3):
+        card = await test_db.add_card(1, f"Товар {index}", "Описание", Decimal('10.00'))
+        await test_db.update_card_status(card.id, ModerationStatus.APPROVED)
+        cards.append(card)
+    
+    first_page = make_inline_query("")
+    await search.inline_search(first_page)
+    next_offset = first_page.answer.await_args.kwargs['next_offset']
+    
+    second_page = make_inline_query("", next_offset)
+    await search.inline_search(second_page)
+    
+    seen = [
+        int(result.id)
+        for page in (first_page, second_page)
+        for result in page.answer.await_args.args[0]
+    ]
+    assert sorted(seen) == sorted(card.id for card in cards)
+    assert second_page.answer.await_args.kwargs['next_offset'] == ""
\ No newline at end of file
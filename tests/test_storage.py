@@ -0,0 +1,97 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import update
+from aiogram.fsm.storage.base import StorageKey
+
+from bot.database.models import FSMRecord
+from bot.states.storage import SQLStorage, dumps_state_data, loads_state_data
+from bot.states.states import AddCardStates
+
+
+@pytest.fixture
+def storage_key():
+    return StorageKey(bot_id=1, chat_id=12345, user_id=12345)
+
+
+def test_state_data_roundtrip():
+    data = {'title': 'Товар', 'price': Decimal('99.90')}
+    
+    encoded = dumps_state_data(data)
+    
+    assert loads_state_data(encoded) == data
+    assert isinstance(loads_state_data(encoded)['price'], Decimal)
+
+
+@pytest.mark.asyncio
+async def test_sql_storage_state_and_data(test_db, storage_key):
+    storage = SQLStorage(test_db, ttl=3600)
+    
+    assert await storage.get_state(storage_key) is None
+    assert await storage.get_data(storage_key) == {}
+    
+    await storage.set_state(storage_key, AddCardStates.waiting_for_price)
+    await storage.update_data(storage_key, {'title': 'Product'})
+    await storage.update_data(storage_key, {'price': Decimal('10.00')})
+    
+    assert await storage.get_state(storage_key) == AddCardStates.waiting_for_price.state
+    assert await storage.get_data(storage_key) == {'title': 'Product', 'price': Decimal('10.00')}
+
+
+@pytest.mark.asyncio
+async def test_sql_storage_clear_removes_record(test_db, storage_key):
+    storage = SQLStorage(test_db, ttl=3600)
+    
+    await storage.set_state(storage_key, AddCardStates.waiting_for_title)
+    await storage.set_data(storage_key, {'title': 'Product'})
+    
+    await storage.set_state(storage_key, None)
+    await storage.set_data(storage_key, {})
+    
+    async with test_db.session_maker() as session:
+        assert await session.get(FSMRecord, storage.key_builder.build(storage_key)) is None
+
+
+@pytest.mark.asyncio
+async def test_sql_storage_expired_state(test_db, storage_key):
+    storage = SQLStorage(test_db, ttl=3600)
+    
+    await storage.set_state(storage_key, AddCardStates.waiting_for_title)
+    await storage.set_data(storage_key, {'title': 'Product'})
+    
+    async with test_db.session_maker() as session:
+        await session.execute(
+            update(FSMRecord).values(expires_at=datetime.now() - timedelta(seconds=1))
+        )
+        await session.commit()
+    
+    assert await storage.get_state(storage_key) is None
+    assert await storage.get_data(storage_key) == {}
+    
+    await storage.set_state(storage_key, AddCardStates.waiting_for_description)
+    
+    assert await storage.get_data(storage_key) == {}
+
+
+@pytest.mark.asyncio
+async def test_redis_storage_ttl(storage_key):
+    fakeredis = pytest.importorskip("fakeredis.aioredis")
+    from aiogram.fsm.storage.redis import RedisStorage
+    
+    redis = fakeredis.FakeRedis()
+    storage = RedisStorage(
+        redis,
+        state_ttl=60,
+        data_ttl=60,
+        json_dumps=dumps_state_data,
+        json_loads=loads_state_data
+    )
+    
+    await storage.set_state(storage_key, AddCardStates.waiting_for_price)
+    await storage.set_data(storage_key, {'price': Decimal('10.00')})
+    
+    assert await storage.get_state(storage_key) == AddCardStates.waiting_for_price.state
+    assert await storage.get_data(storage_key) == {'price': Decimal('10.00')}
+    assert 0 < await redis.ttl(storage.key_builder.build(storage_key, "data")) <= 60
+    
+    await storage.close()
\ No newline at end of file
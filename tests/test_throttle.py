@@ -0,0 +1,146 @@
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage, AnswerCallbackQuery
+
+from bot.utils import throttle
+from bot.utils.metrics import registry
+from bot.utils.throttle import (
+    TokenBucket,
+    SendScheduler,
+    ThrottlingMiddleware,
+    Priority,
+    send_priority,
+    current_priority
+)
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_scheduler(**overrides) -> SendScheduler:
+    settings = dict(global_rate=1000, chat_rate=1000, chat_burst=1, group_rate=1000, max_retries=3)
+    settings.update(overrides)
+    return SendScheduler(**settings)
+
+
+def test_token_bucket_reserves_in_order():
+    timer = FakeTimer()
+    bucket = TokenBucket(rate=1, capacity=3, timer=timer)
+    
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 1, 2]
+    
+    timer.now = 10
+    assert bucket.wait_time() == 0
+    
+    bucket.penalize(5)
+    assert bucket.wait_time() == 6
+
+
+def test_send_priority_is_scoped():
+    assert current_priority.get() is Priority.INTERACTIVE
+    
+    with send_priority(Priority.BROADCAST):
+        assert current_priority.get() is Priority.BROADCAST
+    
+    assert current_priority.get() is Priority.INTERACTIVE
+
+
+@pytest.mark.asyncio
+async def test_interactive_sends_overtake_queued_broadcasts():
+    scheduler = make_scheduler(global_rate=20)
+    scheduler.global_bucket.tokens = 0
+    order = []
+    
+    async def send(name, priority):
+        await scheduler.acquire(None, priority)
+        order.append(name)
+    
+    tasks = [asyncio.create_task(send(f"broadcast{index}", Priority.BROADCAST)) for index in range(5)]
+    await asyncio.sleep(0.01)
+    tasks.append(asyncio.create_task(send("interactive", Priority.INTERACTIVE)))
+    await asyncio.gather(*tasks)
+    await scheduler.close()
+    
+    assert order.index("interactive") <= 1
+    assert [name for name in order if name != "interactive"] == [f"broadcast{index}" for index in range(5)]
+    assert scheduler.stats()['sent'] == 6
+
+
+@pytest.mark.asyncio
+async def test_queue_metrics_are_exported(monkeypatch):
+    scheduler = make_scheduler(global_rate=50)
+    scheduler.global_bucket.tokens = 0
+    monkeypatch.setattr(throttle, "send_scheduler", scheduler)
+    waits = throttle.send_wait.series("broadcast")
+    waits_before = waits.count if waits else 0
+    
+    tasks = [asyncio.create_task(scheduler.acquire(None, Priority.BROADCAST)) for _ in range(3)]
+    await asyncio.sleep(0)
+    
+    assert throttle.send_queue_depth.value("broadcast") == 3
+    assert throttle.send_queue_depth.value("interactive") == 0
+    assert 'bot_send_queue_depth{priority="broadcast"} 3' in registry.render()
+    assert "bot_send_chat_waiting 0" in registry.render()
+    
+    await asyncio.gather(*tasks)
+    await scheduler.close()
+    
+    assert throttle.send_queue_depth.value("broadcast") == 0
+    assert throttle.send_wait.series("broadcast").count == waits_before + 3
+
+
+@pytest.mark.asyncio
+async def test_chat_limit_does_not_block_other_chats():
+    scheduler = make_scheduler(chat_rate=10)
+    
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.acquire(1) for _ in range(3)))
+    same_chat = time.monotonic() - started
+    
+    started = time.monotonic()
+    await asyncio.gather(*(scheduler.acquire(chat_id) for chat_id in range(100, 110)))
+    other_chats = time.monotonic() - started
+    await scheduler.close()
+    
+    assert same_chat >= 0.18
+    assert other_chats < 0.05
+
+
+@pytest.mark.asyncio
+async def test_middleware_retries_after_flood_limit():
+    scheduler = make_scheduler()
+    middleware = ThrottlingMiddleware(scheduler)
+    method = SendMessage(chat_id=1, text="hi")
+    make_request = AsyncMock(side_effect=[TelegramRetryAfter(method, "Flood control", 0), "ok"])
+    
+    assert await middleware(make_request, None, method) == "ok"
+    assert make_request.await_count == 2
+    assert scheduler.retries == 1
+    
+    make_request = AsyncMock(side_effect=TelegramRetryAfter(method, "Flood control", 0))
+    
+    with pytest.raises(TelegramRetryAfter):
+        await middleware(make_request, None, method)
+    
+    assert make_request.await_count == scheduler.max_retries + 1
+    await scheduler.close()
+
+
+@pytest.mark.asyncio
+async def test_middleware_skips_query_answers():
+    scheduler = make_scheduler()
+    middleware = ThrottlingMiddleware(scheduler)
+    make_request = AsyncMock(return_value=True)
+    
+    await middleware(make_request, None, AnswerCallbackQuery(callback_query_id="1"))
+    
+    assert make_request.await_count == 1
+    assert scheduler.sent == 0
\ No newline at end of file
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Message
+
+from bot.webhook import BoundedRequestHandler
+
+
+class FakeSession(BaseSession):
+    async def make_request(self, bot, method, timeout=None):
+        return True
+    
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+    
+    async def close(self):
+        pass
+
+
+def make_update(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Test"},
+            "text": "ping"
+        }
+    }
+
+
+@pytest.fixture
+def tracker():
+    return {'active': 0, 'peak': 0, 'done': 0}
+
+
+@pytest.fixture
+def dispatcher(tracker):
+    dp = Dispatcher()
+    
+    @dp.message(F.text == "ping")
+    async def ping(message: Message):
+        tracker['active'] += 1
+        tracker['peak'] = max(tracker['peak'], tracker['active'])
+        await asyncio.sleep(0.05)
+        tracker['active'] -= 1
+        tracker['done'] += 1
+    
+    return dp
+
+
+async def make_client(dispatcher, max_concurrency):
+    from aiohttp import web
+    
+    app = web.Application()
+    handler = BoundedRequestHandler(
+        dispatcher,
+        Bot(token="42:TEST", session=FakeSession()),
+        max_concurrency=max_concurrency,
+        drain_timeout=5
+    )
+    handler.register(app, path="/webhook")
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    return client, handler
+
+
+@pytest.mark.asyncio
+async def test_webhook_caps_concurrency(dispatcher, tracker):
+    client, handler = await make_client(dispatcher, max_concurrency=3)
+    
+    responses = await asyncio.gather(*[
+        client.post("/webhook", json=make_update(i)) for i in range(12)
+    ])
+    
+    assert all(response.status == 200 for response in responses)
+    
+    await handler.drain()
+    await client.close()
+    
+    assert tracker['done'] == 12
+    assert tracker['peak'] <= 3
+
+
+@pytest.mark.asyncio
+async def test_webhook_drains_and_rejects_after_shutdown(dispatcher, tracker):
+    client, handler = await make_client(dispatcher, max_concurrency=10)
+    
+    await asyncio.gather(*[client.post("/webhook", json=make_update(i)) for i in range(5)])
+    await handler.drain()
+    
+    assert tracker['done'] == 5
+    assert handler.in_flight == 0
+    
+    response = await client.post("/webhook", json=make_update(100))
+    assert response.status == 503
+    
+    await client.close()
\ No newline at end of file